@@ -7,31 +7,182 @@ from core.session import MultiMCP
 from core.context import MemoryItem, AgentContext
 from modules.heuristics import validate_query, validate_response
 from modules.conversation_index import initialize_conversation_index, search_past_conversations
+from modules.perception import run_perception
+from modules.fast_path import match_fast_path
+from modules.memory import writer as memory_writer
+from modules.cassette import cassette
+from modules.metrics import registry
+from modules.sandbox_pool import sandbox_pool
+from modules.tracing import NULL_SPAN, tracer
 import datetime
 from pathlib import Path
 import json
 import re
+import time
+from typing import Dict, Optional
+
+query_seconds = registry.histogram("agent_query_seconds", "End-to-end query latency by result status")
 
 def log(stage: str, msg: str):
     """Simple timestamped console logger."""
     now = datetime.datetime.now().strftime("%H:%M:%S")
     print(f"[{now}] [{stage}] {msg}")
 
-async def main():
-    print("🧠 Cortex-R Agent Ready")
-    current_session = None
+class SessionState:
+    """Per-user conversation state carried across queries: the memory session and its perception cache"""
+
+    def __init__(self, memory_dir: str = "memory"):
+        self.session_id: Optional[str] = None
+        self.memory_dir = memory_dir  # where the session's memory files are kept
+        self.perception_cache = {}  # shared by every AgentContext of the session
+
+
+async def run_query(
+    user_input: str,
+    state: SessionState,
+    multi_mcp: MultiMCP,
+    mcp_servers: Dict[str, dict],
+    conv_index,
+) -> Dict[str, Optional[str]]:
+    """
+    Validate a query and run AgentLoop on it within a session, re-running while
+    the agent asks for FURTHER_PROCESSING_REQUIRED.
+    Returns {"status", "answer", "message", "steps", "trace_id"}; status is
+    "answer", "invalid" (query rejected), "unsafe" (response rejected), "raw"
+    or "unexpected", and steps counts the AgentLoop steps taken across re-runs.
+    """
+    start = time.perf_counter()
+    with tracer.trace("query", query=user_input[:120]) as span:
+        outcome = await _run_query(user_input, state, multi_mcp, mcp_servers, conv_index)
+        span.set(status=outcome["status"], steps=outcome["steps"])
+    query_seconds.observe(time.perf_counter() - start, status=outcome["status"])
+    if span is not NULL_SPAN:
+        log("trace", f"⏱️ {tracer.format_summary(span.trace_id)}")
+        outcome["trace_id"] = span.trace_id
+    return outcome
+
+
+async def _run_query(
+    user_input: str,
+    state: SessionState,
+    multi_mcp: MultiMCP,
+    mcp_servers: Dict[str, dict],
+    conv_index,
+) -> Dict[str, Optional[str]]:
+    # === HEURISTIC VALIDATION: Query Input ===
+    is_valid, cleaned_input, error_msg = validate_query(user_input)
+    if not is_valid:
+        return {"status": "invalid", "answer": None, "message": error_msg, "steps": 0}
+
+    if cleaned_input != user_input:
+        print(f"⚠️  Query cleaned: {error_msg}")
+
+    user_input = cleaned_input
+    steps = 0
+
+    while True:
+        context = AgentContext(
+            user_input=user_input,
+            session_id=state.session_id,
+            dispatcher=multi_mcp,
+            mcp_server_descriptions=mcp_servers,
+            perception_cache=state.perception_cache,
+            memory_dir=state.memory_dir,
+        )
+        strategy = context.agent_profile.strategy
+
+        # === Search Past Conversations for Context ===
+        # (blocking embedding + FAISS lookup, so it runs in a worker thread)
+        async def search_history():
+            with tracer.span("history_search"):
+                return await asyncio.to_thread(
+                    search_past_conversations,
+                    conv_index,
+                    user_input,
+                    current_session=state.session_id
+                )
+
+        if strategy.fast_path and match_fast_path(user_input):
+            # Routed locally by AgentLoop — no planning, so no history needed,
+            # unless the routed tool fails and AgentLoop falls back to planning
+            past_convs, past_context = [], ""
+            context.search_history = search_history
+        elif strategy.parallel_context_search and strategy.cache_perception:
+            # Perception doesn't need past context, so warm the perception cache
+            # while the history search runs
+            (past_convs, past_context), _ = await asyncio.gather(
+                search_history(),
+                run_perception(context, user_input),
+            )
+        else:
+            past_convs, past_context = await search_history()
+        
+        if past_convs:
+            print(f"📚 Found {len(past_convs)} relevant past conversation(s)")
+        
+        # Add past context to agent context
+        if past_context:
+            context.past_context = past_context
+        
+        agent = AgentLoop(context)
+        if not state.session_id:
+            state.session_id = context.session_id
+
+        with tracer.span("agent_loop"):
+            result = await agent.run()
+        if context.task_progress:  # fast-path answers take no planning step
+            steps += context.step + 1
+
+        # Make this run's answer searchable without blocking the next prompt
+        conv_index.index_session_in_background(context.memory)
+
+        if isinstance(result, dict):
+            answer = result["result"]
+            if "FINAL_ANSWER:" in answer:
+                final_answer = answer.split('FINAL_ANSWER:')[1].strip()
+                
+                # === HEURISTIC VALIDATION: Response Output ===
+                is_valid, cleaned_answer, warning_msg = validate_response(final_answer, user_input)
+                
+                if not is_valid:
+                    return {"status": "unsafe", "answer": None, "message": warning_msg, "steps": steps}
+                
+                if warning_msg and "warning" in warning_msg.lower():
+                    print(f"⚠️  {warning_msg}")
+                
+                return {"status": "answer", "answer": cleaned_answer, "message": warning_msg, "steps": steps}
+            elif "FURTHER_PROCESSING_REQUIRED:" in answer:
+                user_input = answer.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
+                print(f"\n🔁 Further Processing Required: {user_input}")
+                continue  # 🧠 Re-run agent with updated input
+            else:
+                return {"status": "raw", "answer": answer, "message": None, "steps": steps}
+        else:
+            return {"status": "unexpected", "answer": str(result), "message": None, "steps": steps}
 
+
+def load_mcp_servers() -> Dict[str, dict]:
     with open("config/profiles.yaml", "r") as f:
         profile = yaml.safe_load(f)
         mcp_servers_list = profile.get("mcp_servers", [])
-        mcp_servers = {server["id"]: server for server in mcp_servers_list}
+        return {server["id"]: server for server in mcp_servers_list}
+
+
+async def main():
+    print("🧠 Cortex-R Agent Ready")
+    state = SessionState()
+
+    mcp_servers = load_mcp_servers()
 
     multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
     await multi_mcp.initialize()
     
     # === Initialize Conversation History Index ===
     print("📚 Initializing conversation history index...")
-    conv_index = initialize_conversation_index(auto_index=True)
+    # The startup scan runs in the background so the prompt is ready immediately;
+    # searches meanwhile see whatever is already indexed
+    conv_index = initialize_conversation_index(auto_index=True, background=True)
+    registry.start_exporters()
 
     try:
         while True:
@@ -39,78 +190,33 @@ async def main():
             if user_input.lower() == 'exit':
                 break
             if user_input.lower() == 'new':
-                current_session = None
-                continue
-            
-            # === HEURISTIC VALIDATION: Query Input ===
-            is_valid, cleaned_input, error_msg = validate_query(user_input)
-            if not is_valid:
-                print(f"❌ {error_msg}")
+                state = SessionState()
                 continue
-            
-            if cleaned_input != user_input:
-                print(f"⚠️  Query cleaned: {error_msg}")
-            
-            user_input = cleaned_input
-
-            while True:
-                # === Search Past Conversations for Context ===
-                past_convs, past_context = search_past_conversations(
-                    conv_index,
-                    user_input,
-                    current_session=current_session
-                )
-                
-                if past_convs:
-                    print(f"📚 Found {len(past_convs)} relevant past conversation(s)")
-                
-                context = AgentContext(
-                    user_input=user_input,
-                    session_id=current_session,
-                    dispatcher=multi_mcp,
-                    mcp_server_descriptions=mcp_servers,
-                )
-                
-                # Add past context to agent context
-                if past_context:
-                    context.past_context = past_context
-                
-                agent = AgentLoop(context)
-                if not current_session:
-                    current_session = context.session_id
-
-                result = await agent.run()
-
-                if isinstance(result, dict):
-                    answer = result["result"]
-                    if "FINAL_ANSWER:" in answer:
-                        final_answer = answer.split('FINAL_ANSWER:')[1].strip()
-                        
-                        # === HEURISTIC VALIDATION: Response Output ===
-                        is_valid, cleaned_answer, warning_msg = validate_response(final_answer, user_input)
-                        
-                        if not is_valid:
-                            print(f"❌ Response validation failed: {warning_msg}")
-                            print(f"\n💡 Final Answer: Unable to provide a safe response. Please rephrase your query.")
-                            break
-                        
-                        if warning_msg and "warning" in warning_msg.lower():
-                            print(f"⚠️  {warning_msg}")
-                        
-                        print(f"\n💡 Final Answer: {cleaned_answer}")
-                        break
-                    elif "FURTHER_PROCESSING_REQUIRED:" in answer:
-                        user_input = answer.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
-                        print(f"\n🔁 Further Processing Required: {user_input}")
-                        continue  # 🧠 Re-run agent with updated input
-                    else:
-                        print(f"\n💡 Final Answer (raw): {answer}")
-                        break
-                else:
-                    print(f"\n💡 Final Answer (unexpected): {result}")
-                    break
+
+            outcome = await run_query(user_input, state, multi_mcp, mcp_servers, conv_index)
+
+            if outcome["status"] == "invalid":
+                print(f"❌ {outcome['message']}")
+            elif outcome["status"] == "unsafe":
+                print(f"❌ Response validation failed: {outcome['message']}")
+                print(f"\n💡 Final Answer: Unable to provide a safe response. Please rephrase your query.")
+            elif outcome["status"] == "answer":
+                print(f"\n💡 Final Answer: {outcome['answer']}")
+            elif outcome["status"] == "raw":
+                print(f"\n💡 Final Answer (raw): {outcome['answer']}")
+            else:
+                print(f"\n💡 Final Answer (unexpected): {outcome['answer']}")
     except KeyboardInterrupt:
         print("\n👋 Received exit signal. Shutting down...")
+    finally:
+        # Pending conversation indexing and session memory must reach disk before the process exits
+        conv_index.wait()
+        memory_writer.shutdown()
+        await sandbox_pool.close()
+        log("memory", f"💾 Memory writer: {memory_writer.get_stats()}")
+        log("metrics", f"📈 Metrics written to {registry.dump()}")
+        if cassette.active:
+            log("cassette", f"📼 {cassette.get_stats()}")
 
 if __name__ == "__main__":
     asyncio.run(main())
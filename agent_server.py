@@ -0,0 +1,321 @@
+# agent_server.py
+
+"""
+Multi-session agent server
+Serves many users from one process: newline-delimited JSON-RPC 2.0 over a
+local TCP socket (default) or stdin/stdout (--stdio). Every request runs
+agent.run_query on the shared event loop, so all sessions share one MultiMCP
+dispatcher, the model clients and the conversation index, while each session
+keeps its own memory and perception cache.
+
+Methods:
+  solve        {"query": str, "session": str?} → {"session", "status", "answer", "message", "steps"}
+  end_session  {"session": str}                → {"ended": bool}
+  stats        {}                              → admission and session counters
+  metrics      {}                              → {"text": Prometheus text exposition}
+
+Admission control: at most max_concurrent queries run at once and at most
+max_queued more wait; beyond that requests fail fast with SERVER_BUSY.
+Queries of one session run one at a time, in arrival order. Backpressure: a
+connection's next request is not read while it has
+max_inflight_per_connection requests outstanding.
+
+Run with: python agent_server.py [--host H] [--port P] [--stdio]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import yaml
+
+from agent import SessionState, load_mcp_servers, log, run_query
+from core.session import MultiMCP
+from modules.conversation_index import initialize_conversation_index
+from modules.memory import writer as memory_writer
+from modules.metrics import registry
+from modules.sandbox_pool import sandbox_pool
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_BUSY = -32000
+
+MAX_LINE_BYTES = 1 << 20
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class ServerSession(SessionState):
+    """SessionState plus what the server needs to serialise and expire it"""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class AgentServer:
+    """Runs queries from many sessions concurrently with admission control"""
+
+    def __init__(
+        self,
+        run: Callable[[str, SessionState], Awaitable[Dict]],
+        max_concurrent: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_inflight_per_connection: Optional[int] = None,
+        session_idle_seconds: Optional[float] = None,
+    ):
+        config = self._load_config()
+        self.run = run
+        self.max_concurrent = max_concurrent or config.get("max_concurrent", 8)
+        self.max_queued = max_queued if max_queued is not None else config.get("max_queued", 32)
+        self.max_inflight_per_connection = max_inflight_per_connection or config.get("max_inflight_per_connection", 4)
+        self.session_idle_seconds = session_idle_seconds or config.get("session_idle_seconds", 1800)
+        self.sessions: Dict[str, ServerSession] = {}
+        self._running = asyncio.Semaphore(self.max_concurrent)
+        self._admitted = 0  # running + waiting
+        self._active = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "connections": 0}
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            with open("config/profiles.yaml", "r") as f:
+                return yaml.safe_load(f).get("server", {}) or {}
+        except Exception:
+            return {}
+
+    # === Sessions ===
+    def _session(self, name: Optional[str]) -> tuple:
+        self._expire_sessions()
+        name = name or uuid.uuid4().hex
+        if name not in self.sessions:
+            self.sessions[name] = ServerSession()
+        session = self.sessions[name]
+        session.last_used = time.monotonic()
+        return name, session
+
+    def _expire_sessions(self):
+        cutoff = time.monotonic() - self.session_idle_seconds
+        for name, session in list(self.sessions.items()):
+            if session.last_used < cutoff and not session.lock.locked():
+                del self.sessions[name]
+
+    # === Methods ===
+    async def solve(self, query: str, session: Optional[str] = None) -> Dict:
+        if not isinstance(query, str) or not query.strip():
+            raise RpcError(INVALID_PARAMS, "params.query must be a non-empty string")
+        if self._admitted >= self.max_concurrent + self.max_queued:
+            self.stats["rejected"] += 1
+            raise RpcError(SERVER_BUSY, f"Server busy ({self._admitted} queries admitted), retry later")
+
+        name, state = self._session(session)
+        self._admitted += 1
+        try:
+            async with state.lock, self._running:  # session order first, then a run slot
+                self._active += 1
+                try:
+                    outcome = await self.run(query, state)
+                finally:
+                    self._active -= 1
+            state.last_used = time.monotonic()
+            self.stats["completed"] += 1
+            return {"session": name, **outcome}
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self._admitted -= 1
+
+    async def end_session(self, session: str) -> Dict:
+        state = self.sessions.get(session)
+        if state is None or state.lock.locked():
+            return {"ended": False}
+        del self.sessions[session]
+        return {"ended": True}
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "admitted": self._admitted,
+            "running": self._active,
+            "sessions": len(self.sessions),
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+        }
+
+    # === JSON-RPC ===
+    async def dispatch(self, request: Any) -> Optional[Dict]:
+        """Response for one request object (None for notifications)"""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": INVALID_REQUEST, "message": "Invalid request"}}
+        request_id = request.get("id")
+        params = request.get("params") or {}
+        try:
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+            if request["method"] == "solve":
+                result = await self.solve(params.get("query"), params.get("session"))
+            elif request["method"] == "end_session":
+                result = await self.end_session(params.get("session"))
+            elif request["method"] == "stats":
+                result = self.get_stats()
+            elif request["method"] == "metrics":
+                result = {"text": registry.render()}
+            else:
+                raise RpcError(METHOD_NOT_FOUND, f"Unknown method: {request['method']}")
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": e.message}}
+        except Exception as e:
+            log("server", f"⚠️ {request['method']} failed: {e}")
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": INTERNAL_ERROR, "message": str(e)}}
+        return response if "id" in request else None
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Read requests line by line; each runs as its own task, responses go out as they finish"""
+        self.stats["connections"] += 1
+        inflight = asyncio.Semaphore(self.max_inflight_per_connection)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(payload: Dict):
+            async with write_lock:
+                writer.write(json.dumps(payload).encode("utf-8") + b"\n")
+                await writer.drain()
+
+        async def handle(line: bytes):
+            try:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await respond({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}})
+                    return
+                response = await self.dispatch(request)
+                if response is not None:
+                    await respond(response)
+            except (ConnectionError, RuntimeError):
+                pass  # client went away
+            finally:
+                inflight.release()
+
+        try:
+            while True:
+                await inflight.acquire()  # backpressure: stop reading while this client has too much in flight
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):  # ValueError: line over MAX_LINE_BYTES
+                    inflight.release()
+                    break
+                if not line:
+                    inflight.release()
+                    break
+                if not line.strip():
+                    inflight.release()
+                    continue
+                task = asyncio.create_task(handle(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+
+class StdoutWriter:
+    """The StreamWriter calls serve_connection makes, on stdout (which may be a file, not a pipe)"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data: bytes):
+        self.stream.write(data)
+        self.stream.flush()
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+async def open_stdio() -> tuple:
+    """Request stream on stdin, responses on stdout (print() output is moved to stderr)"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    writer = StdoutWriter(sys.stdout.buffer)
+    sys.stdout = sys.stderr  # the protocol owns stdout; logs go to stderr
+    return reader, writer
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Multi-session agent server (JSON-RPC)")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--stdio", action="store_true", help="serve one JSON-RPC stream on stdin/stdout")
+    args = parser.parse_args()
+
+    if args.stdio:
+        reader, writer = await open_stdio()
+
+    mcp_servers = load_mcp_servers()
+    multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
+    await multi_mcp.initialize()
+    conv_index = initialize_conversation_index(auto_index=True, background=True)
+
+    async def run(query: str, state: SessionState) -> Dict:
+        return await run_query(query, state, multi_mcp, mcp_servers, conv_index)
+
+    server = AgentServer(run)
+    for name, help, key in (
+        ("server_admitted_queries", "Queries running or waiting for a slot", "admitted"),
+        ("server_running_queries", "Queries running", "running"),
+        ("server_sessions", "Live sessions", "sessions"),
+    ):
+        registry.callback(name, help, lambda key=key: server.get_stats()[key])
+    registry.callback(
+        "server_requests_total", "solve requests by result",
+        lambda: {(("result", k),): server.stats[k] for k in ("completed", "failed", "rejected")},
+        type="counter",
+    )
+    registry.start_exporters()
+    try:
+        if args.stdio:
+            log("server", "🧠 Serving JSON-RPC on stdio")
+            await server.serve_connection(reader, writer)
+        else:
+            config = AgentServer._load_config()
+            host = args.host or config.get("host", "127.0.0.1")
+            port = args.port or config.get("port", 8765)
+            tcp = await asyncio.start_server(server.serve_connection, host, port, limit=MAX_LINE_BYTES)
+            log("server", f"🧠 Serving JSON-RPC on {host}:{port} "
+                          f"(max_concurrent={server.max_concurrent}, max_queued={server.max_queued})")
+            async with tcp:
+                await tcp.serve_forever()
+    finally:
+        conv_index.wait()
+        memory_writer.shutdown()
+        await sandbox_pool.close()
+        log("server", f"📊 {server.get_stats()}")
+        registry.dump()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n👋 Received exit signal. Shutting down...")
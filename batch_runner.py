@@ -0,0 +1,215 @@
+# batch_runner.py
+
+"""
+Batch query runner
+Streams queries from a JSONL file through the agent with bounded concurrency
+and appends one result line per query (id, query, status, answer, steps,
+elapsed seconds) to an output JSONL file as each finishes. Re-running with the
+same output resumes the batch: queries that already have a result are
+skipped; ones that raised errors are retried.
+
+Input lines are objects carrying the query under --field (default "query") and
+an optional id under --id-field (default "id"; the line number otherwise), or
+bare JSON strings.
+
+Run with: python batch_runner.py queries.jsonl [-o results.jsonl] [-c 4] [--no-resume]
+                                [--record cassette.jsonl | --replay cassette.jsonl]
+
+--record captures every LLM, MCP and embedding call of the run in a cassette;
+--replay answers them from one instead (no model, network or MCP processes),
+which makes a recorded batch a fast, deterministic regression run. Calls are
+matched by request within their query (cassette scope = query id), so -c may
+differ between recording and replay. Both modes run with the plan cache off
+and keep session memory and the conversation index in a temporary directory,
+so neither reads nor changes the real history and prompts come out the same.
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, Set, Tuple
+
+from agent import SessionState, load_mcp_servers, log, run_query
+from core.session import MultiMCP
+from modules import decision
+from modules.conversation_index import initialize_conversation_index
+from modules.cassette import cassette
+from modules.memory import writer as memory_writer
+from modules.metrics import registry
+from modules.sandbox_pool import sandbox_pool
+
+Runner = Callable[[str, SessionState], Awaitable[Dict]]
+
+
+def read_queries(path: Path, field: str = "query", id_field: str = "id") -> Iterator[Tuple[str, str]]:
+    """(id, query) per input line, read lazily"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                log("batch", f"⚠️ Skipping line {line_no}: {e}")
+                continue
+            if isinstance(record, str):
+                yield str(line_no), record
+            elif isinstance(record, dict) and isinstance(record.get(field), str):
+                yield str(record.get(id_field, line_no)), record[field]
+            else:
+                log("batch", f"⚠️ Skipping line {line_no}: no '{field}' string")
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids with a result in an earlier run's output (errors are retried)"""
+    done = set()
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted run
+                if record.get("status") != "error":
+                    done.add(str(record["id"]))
+    return done
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def run_batch(
+    input_path: Path,
+    output_path: Path,
+    run: Runner,
+    concurrency: int = 4,
+    field: str = "query",
+    id_field: str = "id",
+    resume: bool = True,
+) -> Dict:
+    """Run every pending query; returns a summary with counts and latency percentiles"""
+    done = completed_ids(output_path) if resume else set()
+    if done:
+        log("batch", f"⏩ Resuming: {len(done)} queries already have results")
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)  # reader stays just ahead of the workers
+    summary = {"completed": 0, "errors": 0, "skipped": 0, "elapsed": []}
+
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        if resume and out.tell():
+            with open(output_path, "rb") as f:
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    out.write("\n")  # close a line torn by an interruption
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                query_id, query = item
+                start = time.perf_counter()
+                record = {"id": query_id, "query": query}
+                try:
+                    with cassette.scope(query_id):
+                        outcome = await run(query, SessionState())  # one session per query
+                    record.update(outcome)
+                    summary["completed"] += 1
+                except Exception as e:
+                    record.update({"status": "error", "answer": None, "message": str(e), "steps": 0})
+                    summary["errors"] += 1
+                record["elapsed_s"] = round(time.perf_counter() - start, 3)
+                summary["elapsed"].append(record["elapsed_s"])
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()  # every finished query survives an interruption
+                log("batch", f"✅ {query_id}: {record['status']} in {record['elapsed_s']}s")
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for query_id, query in read_queries(input_path, field, id_field):
+                if query_id in done:
+                    summary["skipped"] += 1
+                    continue
+                await queue.put((query_id, query))
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+    elapsed = summary.pop("elapsed")
+    summary["p50_s"] = percentile(elapsed, 0.5)
+    summary["p95_s"] = percentile(elapsed, 0.95)
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of queries through the agent")
+    parser.add_argument("input", type=Path)
+    parser.add_argument("-o", "--output", type=Path, default=None, help="default: <input>.results.jsonl")
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("--field", default="query", help="key holding the query in each input line")
+    parser.add_argument("--id-field", default="id", help="key holding the query id (line number otherwise)")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    tape = parser.add_mutually_exclusive_group()
+    tape.add_argument("--record", type=Path, metavar="CASSETTE", help="record LLM/MCP/embedding calls to a cassette")
+    tape.add_argument("--replay", type=Path, metavar="CASSETTE", help="answer LLM/MCP/embedding calls from a cassette")
+    args = parser.parse_args()
+    output = args.output or args.input.with_suffix(".results.jsonl")
+    if args.record or args.replay:
+        cassette.configure("record" if args.record else "replay", args.record or args.replay)
+
+    history = None
+    if cassette.active:
+        decision.plan_cache.enabled = False  # a plan cached earlier would skip a recorded LLM call
+        history = tempfile.mkdtemp(prefix="batch_history_")
+        log("batch", f"📼 Plan cache off; session memory and conversation index kept in {history}")
+
+    mcp_servers = load_mcp_servers()
+    multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
+    await multi_mcp.initialize()
+    if history is None:
+        conv_index = initialize_conversation_index(auto_index=True, background=True)
+    else:
+        conv_index = initialize_conversation_index(
+            auto_index=True, background=True, memory_dir=history, index_dir=str(Path(history) / "conversation_index"),
+        )
+
+    async def run(query: str, state: SessionState) -> Dict:
+        if history is not None:
+            state.memory_dir = history
+        return await run_query(query, state, multi_mcp, mcp_servers, conv_index)
+
+    registry.start_exporters()
+    start = time.perf_counter()
+    try:
+        summary = await run_batch(
+            args.input, output, run,
+            concurrency=args.concurrency, field=args.field, id_field=args.id_field, resume=not args.no_resume,
+        )
+        log("batch", f"📊 {summary} in {time.perf_counter() - start:.1f}s → {output}")
+    finally:
+        conv_index.wait()
+        memory_writer.shutdown()
+        await sandbox_pool.close()
+        log("batch", f"📈 Metrics written to {registry.dump()}")
+        if cassette.active:
+            log("batch", f"📼 Cassette: {cassette.get_stats()}")
+        if history is not None:
+            shutil.rmtree(history, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n👋 Interrupted — re-run the same command to resume")
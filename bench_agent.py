@@ -0,0 +1,437 @@
+# bench_agent.py
+
+"""
+Offline end-to-end benchmark of the agent
+Run with: python bench_agent.py [--iterations N] [--llm-latency S] [--plan-cache] [--tool-cache] [--save-baseline]
+
+Runs the real agent.run_query (MultiMCP, AgentLoop, sandbox, memory writer,
+conversation index) over a fixed query set with nothing outside the machine:
+  LLM         ScriptedModel, a ModelManager backend answering perception and
+              planning prompts from SCRIPT (optionally sleeping --llm-latency)
+  embeddings  hashed bag-of-words vectors instead of Ollama
+  MCP         the real mcp_server_1.py (math) plus stub documents and
+              websearch servers returning canned pages
+Everything the agent writes (memory, conversation index, plan cache) goes to
+a temporary working directory. The plan cache is off unless --plan-cache and
+the tool result cache unless --tool-cache, so every iteration plans and calls
+its tools.
+
+Reports p50/p95 latency, LLM calls, MCP tool calls and the server processes
+spawned for them (in-process servers spawn none) per query, plus peak RSS of
+the agent and of its server processes, and compares them with the baseline
+file: exits 1 when a count grows or latency / memory regress beyond --tolerance.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import textwrap
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import yaml
+
+REPO = Path(__file__).resolve().parent
+BASELINE = REPO / "bench_agent_baseline.json"
+
+PERCEPTION_MARKER = "You are a perception engine"
+FOLLOW_UP_PREFIX = "Original user task: "  # how AgentLoop words FURTHER_PROCESSING_REQUIRED follow-ups
+CURRENT_QUERY_MARKER = "🎯 Current Query:"
+
+# Query → what the model answers. "answer" is the final answer given once a
+# FURTHER_PROCESSING_REQUIRED result comes back; queries without "plan" are
+# handled by the fast path and never reach the model.
+SCRIPT: List[Dict] = [
+    {"query": "add 5 and 7"},
+    {
+        "query": "What is the factorial of 5 multiplied by 3?",
+        "intent": "arithmetic",
+        "servers": ["math"],
+        "plan": '''
+            import json
+            async def solve():
+                result = await mcp.call_tool('factorial', {"input": {"a": 5}})
+                value = json.loads(result.content[0].text)["result"]
+                result = await mcp.call_tool('multiply', {"input": {"a": value, "b": 3}})
+                return f"FINAL_ANSWER: The factorial of 5 multiplied by 3 is {json.loads(result.content[0].text)['result']}"
+        ''',
+    },
+    {
+        "query": "Give the first 8 Fibonacci numbers and the cube root of 27",
+        "intent": "arithmetic",
+        "servers": ["math"],
+        "plan": '''
+            import json
+            async def solve():
+                result = await mcp.call_tool('fibonacci_numbers', {"input": {"n": 8}})
+                numbers = json.loads(result.content[0].text)["result"]
+                result = await mcp.call_tool('cbrt', {"input": {"a": 27}})
+                root = round(json.loads(result.content[0].text)["result"], 3)
+                return f"FINAL_ANSWER: Fibonacci {numbers}, cube root {root}"
+        ''',
+    },
+    {
+        "query": "How tall is the tallest building in the world?",
+        "intent": "web lookup",
+        "servers": ["websearch"],
+        "plan": '''
+            async def solve():
+                result = await mcp.call_tool('duckduckgo_search_results', {"input": {"query": "tallest building in the world", "max_results": 3}})
+                return f"FURTHER_PROCESSING_REQUIRED: {result.content[0].text}"
+        ''',
+        "answer": "The Burj Khalifa in Dubai is the tallest building in the world at 828 metres.",
+    },
+    {
+        "query": "Summarize the webpage https://example.com/agents",
+        "intent": "summarise page",
+        "servers": ["documents"],
+        "plan": '''
+            import json
+            async def solve():
+                result = await mcp.call_tool('convert_webpage_url_into_markdown', {"input": {"url": "https://example.com/agents"}})
+                page = json.loads(result.content[0].text)["markdown"]
+                return f"FURTHER_PROCESSING_REQUIRED: {page}"
+        ''',
+        "answer": "The page describes agents that perceive a task, plan tool calls and remember past sessions.",
+    },
+]
+
+STUB_SERVERS = {
+    "websearch": '''
+        import sys
+        sys.path.insert(0, {repo!r})
+        from mcp.server.fastmcp import FastMCP
+        from models import SearchInput, UrlInput
+
+        mcp = FastMCP("stub-websearch")
+
+        @mcp.tool()
+        async def duckduckgo_search_results(input: SearchInput) -> str:
+            """Search DuckDuckGo. Usage: input={{"input": {{"query": "latest AI developments", "max_results": 5}} }} result = await mcp.call_tool('duckduckgo_search_results', input)"""
+            return "\\n".join(
+                f"{{i}}. {{title}} - https://example.com/{{i}}" for i, title in enumerate([
+                    "Burj Khalifa: 828 m, tallest building in the world since 2010",
+                    "Merdeka 118: 679 m, second tallest",
+                    "Shanghai Tower: 632 m",
+                ][: input.max_results], 1)
+            )
+
+        @mcp.tool()
+        async def download_raw_html_from_url(input: UrlInput) -> str:
+            """Fetch webpage content. Usage: input={{"input": {{"url": "https://example.com"}} }} result = await mcp.call_tool('download_raw_html_from_url', input)"""
+            return f"<html><body><h1>{{input.url}}</h1><p>Canned page.</p></body></html>"
+
+        if __name__ == "__main__":
+            mcp.run(transport="stdio")
+    ''',
+    "documents": '''
+        import sys
+        sys.path.insert(0, {repo!r})
+        from mcp.server.fastmcp import FastMCP
+        from models import FilePathInput, MarkdownOutput, SearchDocumentsInput, UrlInput
+
+        mcp = FastMCP("stub-documents")
+        PAGE = "# Agents\\n\\nAgents perceive a task, plan tool calls and remember past sessions."
+
+        @mcp.tool()
+        def search_stored_documents(input: SearchDocumentsInput) -> list[str]:
+            """Search documents to get relevant extracts. Usage: input={{"input": {{"query": "your query"}} }} result = await mcp.call_tool('search_stored_documents', input)"""
+            return [PAGE]
+
+        @mcp.tool()
+        def convert_webpage_url_into_markdown(input: UrlInput) -> MarkdownOutput:
+            """Return clean webpage content. Usage: input={{"input": {{"url": "https://example.com"}} }} result = await mcp.call_tool('convert_webpage_url_into_markdown', input)"""
+            return MarkdownOutput(markdown=PAGE)
+
+        @mcp.tool()
+        def extract_pdf(input: FilePathInput) -> MarkdownOutput:
+            """Convert PDF to markdown. Usage: input={{"input": {{"file_path": "documents/sample.pdf"}} }} result = await mcp.call_tool('extract_pdf', input)"""
+            return MarkdownOutput(markdown=PAGE)
+
+        if __name__ == "__main__":
+            mcp.run(transport="stdio")
+    ''',
+}
+
+
+def hashed_embedding(text: str, dims: int = 256) -> np.ndarray:
+    """Deterministic bag-of-words vector (md5 buckets, unlike hash() which is salted per process)"""
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % dims] += 1.0
+    return vector
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def prepare_workdir(root: Path) -> Dict[str, dict]:
+    """Working directory for the run (config and prompts linked from the repo); returns server configs"""
+    for name in ("config", "prompts"):
+        (root / name).symlink_to(REPO / name, target_is_directory=True)
+    with open(REPO / "config" / "profiles.yaml", "r") as f:
+        servers = {server["id"]: dict(server) for server in yaml.safe_load(f).get("mcp_servers", [])}
+    servers["math"].update(script=str(REPO / "mcp_server_1.py"), cwd=str(REPO))
+    for server_id, source in STUB_SERVERS.items():
+        script = root / f"stub_{server_id}.py"
+        script.write_text(textwrap.dedent(source).format(repo=str(REPO)), encoding="utf-8")
+        servers[server_id].update(script=str(script), cwd=str(root))
+    return servers
+
+
+class ServerRSSSampler:
+    """
+    Largest VmHWM among live server processes, polled from /proc in a thread.
+    RUSAGE_CHILDREN can't be used: a child's ru_maxrss includes the agent's own
+    RSS, inherited at fork before the server is exec'd. Linux only; a server that
+    lives shorter than one interval is missed (None when nothing was seen).
+    """
+
+    def __init__(self, scripts: List[str], interval: float = 0.01):
+        self.scripts = set(scripts)
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+
+    def __enter__(self):
+        if Path("/proc/self/task").is_dir():
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+    def _children(self) -> List[str]:
+        pids = []
+        for children in Path("/proc/self/task").glob("*/children"):
+            with contextlib.suppress(OSError):
+                pids.extend(children.read_text().split())
+        return pids
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for pid in self._children():
+                with contextlib.suppress(OSError):
+                    argv = Path(f"/proc/{pid}/cmdline").read_bytes().decode(errors="replace").split("\0")
+                    if not self.scripts.intersection(argv):
+                        continue  # sandbox workers and other helpers
+                    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+                        if line.startswith("VmHWM:"):
+                            self.peak_kb = max(self.peak_kb, int(line.split()[1]))
+
+
+async def run_benchmark(args, mcp_servers: Dict[str, dict]) -> Dict:
+    # Imported only now: module-level state (plan cache, memory paths) resolves against the working directory
+    from agent import SessionState, run_query
+    from core import strategy
+    from core.session import MultiMCP
+    from modules import decision, perception
+    from modules.conversation_index import ConversationIndex
+    from modules.memory import writer as memory_writer
+    from modules.metrics import registry
+    from modules.model_manager import ModelManager
+    from modules.sandbox_pool import sandbox_pool
+    from modules.tool_cache import tool_cache
+
+    class ScriptedModel(ModelManager):
+        """Deterministic model: answers from SCRIPT by the query found in the prompt"""
+
+        def __init__(self, latency: float = 0.0):
+            self.model_type = "scripted"
+            self.model_info = {"model": "scripted"}
+            self.latency = latency
+
+        def _scripted_generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+            if self.latency:
+                time.sleep(self.latency)  # stands in for the network round trip (runs in a worker thread)
+            current = prompt.rsplit(CURRENT_QUERY_MARKER, 1)[-1]  # skip any past-conversation context
+            entry = next((e for e in SCRIPT if "plan" in e and e["query"] in current), None)
+            if PERCEPTION_MARKER in prompt:
+                if entry is None:
+                    return '{"intent": "unknown", "entities": []}'
+                return json.dumps({"intent": entry["intent"], "entities": [], "tool_hint": None,
+                                   "selected_servers": entry["servers"]})
+            if entry is None:
+                return 'async def solve():\n    return "FINAL_ANSWER: [no scripted plan]"'
+            if FOLLOW_UP_PREFIX + entry["query"] in current:
+                return f"async def solve():\n    return {('FINAL_ANSWER: ' + entry['answer'])!r}"
+            return textwrap.dedent(entry["plan"]).strip()
+
+    class OfflineIndex(ConversationIndex):
+        """ConversationIndex with hashed bag-of-words embeddings instead of the Ollama server"""
+
+        def _get_embedding(self, text: str) -> np.ndarray:
+            return hashed_embedding(text)
+
+    def counter_total(name: str) -> float:
+        metric = registry.metrics.get(name)
+        return sum(metric.values.values()) if metric is not None else 0
+
+    model = ScriptedModel(latency=args.llm_latency)
+    for module in (perception, decision, strategy):
+        module.model = model
+    decision.plan_cache.enabled = args.plan_cache
+    tool_cache.enabled = args.tool_cache
+
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    results = {
+        entry["query"]: {"latency_ms": [], "llm_calls": 0, "tool_calls": 0, "spawns": 0, "status": set()}
+        for entry in SCRIPT
+    }
+    sampler = ServerRSSSampler([server["script"] for server in mcp_servers.values()])
+    with quiet, sampler:
+        start = time.perf_counter()
+        multi_mcp = MultiMCP(server_configs=list(mcp_servers.values()))
+        await multi_mcp.initialize()
+        conv_index = OfflineIndex()
+        startup_ms = (time.perf_counter() - start) * 1000
+
+        try:
+            for iteration in range(args.warmup + args.iterations):
+                for entry in SCRIPT:
+                    llm_before = counter_total("llm_calls_total")
+                    tools_before = counter_total("mcp_tool_calls_total")
+                    spawns_before = counter_total("mcp_server_spawns_total")
+                    start = time.perf_counter()
+                    outcome = await run_query(entry["query"], SessionState(), multi_mcp, mcp_servers, conv_index)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    if iteration < args.warmup:
+                        continue
+                    result = results[entry["query"]]
+                    result["latency_ms"].append(elapsed_ms)
+                    result["llm_calls"] += counter_total("llm_calls_total") - llm_before
+                    result["tool_calls"] += counter_total("mcp_tool_calls_total") - tools_before
+                    result["spawns"] += counter_total("mcp_server_spawns_total") - spawns_before
+                    result["status"].add(outcome["status"])
+        finally:
+            conv_index.wait()
+            memory_writer.shutdown()
+            await sandbox_pool.close()
+
+    queries = {}
+    for query, result in results.items():
+        samples = result["latency_ms"]
+        queries[query] = {
+            "p50_ms": round(percentile(samples, 0.5), 1),
+            "p95_ms": round(percentile(samples, 0.95), 1),
+            "llm_calls": round(result["llm_calls"] / len(samples), 2),
+            "tool_calls": round(result["tool_calls"] / len(samples), 2),
+            "spawns": round(result["spawns"] / len(samples), 2),
+            "status": ",".join(sorted(result["status"])),
+        }
+    everything = [ms for result in results.values() for ms in result["latency_ms"]]
+    return {
+        "config": {"iterations": args.iterations, "llm_latency": args.llm_latency, "plan_cache": args.plan_cache,
+                   "tool_cache": args.tool_cache},
+        "startup_ms": round(startup_ms, 1),
+        "queries": queries,
+        "total": {
+            "p50_ms": round(percentile(everything, 0.5), 1),
+            "p95_ms": round(percentile(everything, 0.95), 1),
+            "llm_calls": round(sum(q["llm_calls"] for q in queries.values()), 2),
+            "tool_calls": round(sum(q["tool_calls"] for q in queries.values()), 2),
+            "spawns": round(sum(q["spawns"] for q in queries.values()), 2),
+        },
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "server_peak_rss_mb": sampler.peak_mb,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, noise_ms: float) -> List[str]:
+    """Regressions of current against baseline (empty list if none)"""
+    if current["config"] != baseline.get("config"):
+        return [f"baseline was recorded with {baseline.get('config')}, this run used {current['config']}"]
+    problems = []
+    rows = dict(current["queries"], TOTAL=current["total"])
+    base_rows = dict(baseline.get("queries", {}), TOTAL=baseline.get("total", {}))
+    for name, row in rows.items():
+        base = base_rows.get(name)
+        if base is None:
+            continue
+        for key in ("llm_calls", "tool_calls", "spawns"):
+            if key in base and row[key] > base[key]:
+                problems.append(f"{name}: {key} {base[key]} → {row[key]}")
+        if row["p95_ms"] > base["p95_ms"] * (1 + tolerance) + noise_ms:
+            problems.append(f"{name}: p95 {base['p95_ms']} ms → {row['p95_ms']} ms")
+    for key in ("peak_rss_mb", "server_peak_rss_mb"):
+        if baseline.get(key) and current[key] and current[key] > baseline[key] * (1 + tolerance):
+            problems.append(f"{key} {baseline[key]} → {current[key]}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end agent benchmark")
+    parser.add_argument("--iterations", type=int, default=5, help="measured runs of every query")
+    parser.add_argument("--warmup", type=int, default=1, help="unmeasured runs of every query first")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds each scripted LLM call sleeps")
+    parser.add_argument("--plan-cache", action="store_true", help="let repeated queries reuse cached plans")
+    parser.add_argument("--tool-cache", action="store_true", help="let repeated tool calls reuse memoised results")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 / RSS growth")
+    parser.add_argument("--noise-ms", type=float, default=25.0, help="absolute p95 slack on top of --tolerance")
+    parser.add_argument("--verbose", action="store_true", help="show the agent's own output")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")  # client is built, never called
+    root = Path(tempfile.mkdtemp(prefix="bench_agent_"))
+    cwd = os.getcwd()
+    try:
+        mcp_servers = prepare_workdir(root)
+        os.chdir(root)
+        sys.path.insert(0, str(REPO))
+        current = asyncio.run(run_benchmark(args, mcp_servers))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root, ignore_errors=True)
+
+    print("=" * 60)
+    print(f"OFFLINE AGENT BENCHMARK ({args.iterations} iterations, LLM latency {args.llm_latency}s)")
+    print("=" * 60)
+    print(f"\n  MultiMCP startup {current['startup_ms']} ms\n")
+    for name, row in dict(current["queries"], TOTAL=current["total"]).items():
+        label = name if len(name) <= 40 else name[:37] + "..."
+        print(f"  {label:<40} p50={row['p50_ms']:8.1f} ms  p95={row['p95_ms']:8.1f} ms  "
+              f"llm={row['llm_calls']:<5} tools={row['tool_calls']:<5} spawns={row['spawns']:<5} {row.get('status', '')}")
+    print(f"\n  Peak RSS: agent {current['peak_rss_mb']} MB, largest MCP server {current['server_peak_rss_mb']} MB")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+        print(f"\n💾 Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"\nℹ️ No baseline at {args.baseline} (run with --save-baseline to record one)")
+        return
+    problems = compare(current, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance, args.noise_ms)
+    if problems:
+        print("\n❌ Regressions against baseline:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# bench_conversation_index.py
+
+"""
+Startup benchmark for ConversationIndex change detection
+Run with: python bench_conversation_index.py [--sessions N]
+
+Builds a synthetic memory tree (MemoryManager's date layout) of N sessions,
+indexes it once with a stand-in embedder, then times warm startups:
+  legacy      index load + rglob + md5 of every file (previous behaviour)
+  stat        rglob + size/mtime_ns per file (directory manifest cleared)
+  manifest    directory manifest + stat (default path)
+  +1 session  manifest path after one new session was written
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from modules.conversation_index import ConversationIndex
+
+
+class OfflineIndex(ConversationIndex):
+    """ConversationIndex with a local stand-in for the embedding server"""
+
+    def _get_embedding(self, text: str) -> np.ndarray:
+        return np.full(8, len(text) % 97, dtype=np.float32)
+
+
+def session_path(memory_dir: Path, session_id: str) -> Path:
+    a, b, c = session_id.split('-')[:3]
+    return memory_dir / a / b / c / f"session-{session_id}.json"
+
+
+def write_session(memory_dir: Path, n: int):
+    day = n % 365
+    session_id = f"2025/{day // 28 + 1:02}/{day % 28 + 1:02}/session-{1735689600 + n}-{n:06x}"
+    items = [
+        {"timestamp": 1735689600 + n, "type": "run_metadata", "text": f"Started new session with input: question {n}"},
+        {"timestamp": 1735689601 + n, "type": "tool_output", "text": "Output of solve_sandbox",
+         "tool_result": {"result": f"FINAL_ANSWER: answer {n}"}},
+    ]
+    path = session_path(memory_dir, session_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(items, indent=2), encoding="utf-8")
+
+
+def legacy_startup(memory_dir: Path, index_dir: Path, md5_cache: dict) -> int:
+    OfflineIndex(memory_dir=str(memory_dir), index_dir=str(index_dir))
+    skipped = 0
+    for path in memory_dir.rglob("session-*.json"):
+        with open(path, "rb") as f:
+            if md5_cache.get(str(path)) == hashlib.md5(f.read()).hexdigest():
+                skipped += 1
+    return skipped
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=100_000)
+    args = parser.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="bench_conv_index_"))
+    memory_dir, index_dir = root / "memory", root / "index"
+    try:
+        print("=" * 60)
+        print(f"CONVERSATION INDEX STARTUP BENCHMARK ({args.sessions:,} sessions)")
+        print("=" * 60)
+
+        start = time.perf_counter()
+        for n in range(args.sessions):
+            write_session(memory_dir, n)
+        print(f"\n  Generated tree in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = OfflineIndex(memory_dir=str(memory_dir), index_dir=str(index_dir))
+        index.index_all_conversations()
+        print(f"  Initial indexing in {time.perf_counter() - start:.1f}s\n")
+
+        md5_cache = {}
+        for path in memory_dir.rglob("session-*.json"):
+            md5_cache[str(path)] = hashlib.md5(path.read_bytes()).hexdigest()
+
+        def warm(clear_manifest: bool):
+            warm_index = OfflineIndex(memory_dir=str(memory_dir), index_dir=str(index_dir))
+            if clear_manifest:
+                warm_index.manifest = {}
+            warm_index.index_all_conversations()
+
+        load = timed(OfflineIndex, str(memory_dir), str(index_dir))
+        print(f"  Index load alone (included below): {load * 1000:.1f} ms")
+        results = {
+            "legacy": timed(legacy_startup, memory_dir, index_dir, md5_cache),
+            "stat": timed(warm, True),
+            "manifest": timed(warm, False),
+        }
+        write_session(memory_dir, args.sessions)
+        results["+1 session"] = timed(warm, False)
+
+        print()
+        for label, seconds in results.items():
+            scan = seconds - load
+            print(f"  {label:<12} {seconds * 1000:10.1f} ms   scan {scan * 1000:10.1f} ms   x{(results['legacy'] - load) / scan:.1f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# bench_fast_path.py
+
+"""
+Latency benchmark: fast-path router vs the normal agent path
+Run with: python bench_fast_path.py [--iterations N] [--llm]
+
+Without --llm the comparison path replays each routed tool chain through a
+fresh mcp_server_1.py stdio subprocess per call (what the sandbox does), which
+is the floor of the LLM path. With --llm the full AgentLoop runs with the fast
+path disabled (needs GEMINI_API_KEY and the MCP servers).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+
+import yaml
+
+from core.session import MCP, MultiMCP
+from modules.fast_path import PREVIOUS_RESULT, FastPathRouter
+
+QUERIES = [
+    "add 5 and 7",
+    "factorial of 10",
+    "What is 2 to the power of 10?",
+    "first 10 fibonacci numbers",
+    "Find the ASCII values of characters in INDIA and then return sum of exponentials of those values.",
+]
+
+
+def summarize(label: str, samples_ms: list) -> None:
+    samples = sorted(samples_ms)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {label:<12} p50={statistics.median(samples):10.3f} ms  p95={p95:10.3f} ms  n={len(samples)}")
+
+
+def bench_routed(router: FastPathRouter, query: str, iterations: int) -> list:
+    router.answer(query)  # warm up: import mcp_server_1 once
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):  # keep tool/log prints out of the timings
+        for _ in range(iterations):
+            start = time.perf_counter()
+            router.answer(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def bench_subprocess(router: FastPathRouter, query: str, iterations: int) -> list:
+    routed = router.match(query)
+    mcp = MCP(server_script="mcp_server_1.py")
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        previous = None
+        for tool_name, arguments in routed.steps:
+            args = {k: (previous if v == PREVIOUS_RESULT else v) for k, v in arguments.items()}
+            result = await mcp.call_tool(tool_name, {"input": args})
+            previous = json.loads(result.content[0].text)["result"]
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def bench_llm(query: str, iterations: int) -> list:
+    from core.context import AgentContext
+    from core.loop import AgentLoop
+
+    with open("config/profiles.yaml", "r") as f:
+        servers = {s["id"]: s for s in yaml.safe_load(f).get("mcp_servers", [])}
+    multi_mcp = MultiMCP(server_configs=list(servers.values()))
+    await multi_mcp.initialize()
+
+    samples = []
+    for _ in range(iterations):
+        context = AgentContext(user_input=query, dispatcher=multi_mcp, mcp_server_descriptions=servers)
+        context.agent_profile.strategy.fast_path = False
+        start = time.perf_counter()
+        await AgentLoop(context).run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--llm", action="store_true", help="compare against the full AgentLoop instead of stdio tool calls")
+    args = parser.parse_args()
+
+    router = FastPathRouter()
+    print("=" * 60)
+    print("FAST PATH BENCHMARK")
+    print("=" * 60)
+
+    for query in QUERIES:
+        print(f"\n🔹 {query}")
+        routed = bench_routed(router, query, max(args.iterations, 100))
+        summarize("routed", routed)
+        if args.llm:
+            other = await bench_llm(query, args.iterations)
+            summarize("agent loop", other)
+        else:
+            other = await bench_subprocess(router, query, args.iterations)
+            summarize("stdio tools", other)
+        print(f"  speed-up     x{statistics.median(other) / statistics.median(routed):,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+# bench_mcp_modes.py
+
+"""
+Per-call overhead of MCP tool calls: subprocess (stdio) vs in-process
+Run with: python bench_mcp_modes.py [--server math] [--iterations N]
+
+Calls the same tools of one Python MCP server from profiles.yaml through
+MultiMCP twice: once spawning the server per call over stdio JSON-RPC (the
+default) and once with `in_process: true`. Reports tool discovery time and
+p50/p95 per call for each mode, and checks both modes return the same
+CallToolResult. The tool result cache is off so every call reaches the server.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import yaml
+
+from core.session import MultiMCP
+from modules.tool_cache import tool_cache
+
+REPO = Path(__file__).parent.resolve()
+
+# Tools called per server, with their arguments; other servers have nothing to benchmark
+CALLS = {
+    "math": [
+        ("add", {"input": {"a": 2, "b": 3}}),
+        ("factorial", {"input": {"a": 10}}),
+        ("fibonacci_numbers", {"input": {"n": 20}}),
+        ("strings_to_chars_to_int", {"input": {"string": "INDIA"}}),
+        ("divide", {"input": {"a": 1, "b": 0}}),  # error path
+    ],
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def measure(config: dict, calls, iterations: int) -> Dict:
+    start = time.perf_counter()
+    multi = MultiMCP([config])
+    await multi.initialize()
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    samples: Dict[str, List[float]] = {tool: [] for tool, _ in calls}
+    results = {}
+    for _ in range(iterations):
+        for tool, arguments in calls:
+            begin = time.perf_counter()
+            result = await multi.call_tool(tool, arguments)
+            samples[tool].append((time.perf_counter() - begin) * 1000)
+            results[tool] = result.model_dump(mode="json")
+    return {"in_process": bool(multi.apps), "startup_ms": startup_ms, "samples": samples, "results": results}
+
+
+async def run(args) -> int:
+    with open(REPO / "config" / "profiles.yaml", "r") as f:
+        servers = {server["id"]: server for server in yaml.safe_load(f).get("mcp_servers", [])}
+    base = dict(servers[args.server])
+    base.update(script=str(REPO / base["script"]), cwd=str(REPO))  # profiles.yaml cwd may be another machine's
+    calls = CALLS.get(args.server, [])
+    if not calls:
+        print(f"❌ No benchmark calls defined for server {args.server!r}")
+        return 1
+    tool_cache.enabled = False
+
+    modes = {}
+    for mode, in_process in (("subprocess", False), ("in-process", True)):
+        print(f"⏱️ {mode}: {args.iterations} × {len(calls)} calls...")
+        modes[mode] = await measure({**base, "in_process": in_process}, calls, args.iterations)
+
+    print(f"\n  {'tool':<26}" + "".join(f"{mode + ' p50/p95 ms':>30}" for mode in modes))
+    print(f"  {'(tool discovery)':<26}" + "".join(f"{m['startup_ms']:>30.1f}" for m in modes.values()))
+    for tool, _ in calls:
+        row = "".join(
+            f"{percentile(m['samples'][tool], 0.5):>21.2f} / {percentile(m['samples'][tool], 0.95):>6.2f}"
+            for m in modes.values()
+        )
+        print(f"  {tool:<26}{row}")
+    everything = {mode: [ms for s in m["samples"].values() for ms in s] for mode, m in modes.items()}
+    sub, local = statistics.median(everything["subprocess"]), statistics.median(everything["in-process"])
+    print(f"\n  Median per call: subprocess {sub:.1f} ms, in-process {local:.2f} ms ({sub / max(local, 1e-6):.0f}× less overhead)")
+
+    if not modes["in-process"]["in_process"]:
+        print("\n❌ The server could not be loaded in-process")
+        return 1
+    different = [tool for tool, _ in calls if modes["subprocess"]["results"][tool] != modes["in-process"]["results"][tool]]
+    if different:
+        print(f"\n❌ Results differ between modes for: {', '.join(different)}")
+        return 1
+    print("\n✅ Both modes return identical results")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP tool call overhead: subprocess vs in-process")
+    parser.add_argument("--server", default="math", help="server id from profiles.yaml")
+    parser.add_argument("--iterations", type=int, default=10, help="calls of every tool per mode")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
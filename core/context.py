@@ -13,9 +13,13 @@ from pydantic import BaseModel
 class StrategyProfile(BaseModel):
     planning_mode: str
     exploration_mode: Optional[str] = None
+    speculative_candidates: int = 3
     memory_fallback_enabled: bool
     max_steps: int
     max_lifelines_per_step: int
+    cache_perception: bool = True
+    parallel_context_search: bool = False
+    fast_path: bool = True
 
 
 class AgentProfile:
@@ -45,6 +49,8 @@ class AgentContext:
         session_id: Optional[str] = None,
         dispatcher: Optional[MultiMCP] = None,
         mcp_server_descriptions: Optional[List[Any]] = None,
+        perception_cache: Optional[Dict[tuple, Any]] = None,
+        memory_dir: str = "memory",
     ):
         if session_id is None:
             today = datetime.now()
@@ -54,14 +60,14 @@ class AgentContext:
 
         self.user_input = user_input
         self.agent_profile = AgentProfile()
-        self.memory = MemoryManager(session_id=session_id)
+        self.memory = MemoryManager(session_id=session_id, memory_dir=memory_dir)
         self.session_id = self.memory.session_id
         self.dispatcher = dispatcher  # 🆕 Added formally
         self.mcp_server_descriptions = mcp_server_descriptions  # 🆕 Added formally
         self.step = 0
         self.task_progress = []  # 🆕 Will track tool executions
         self.final_answer = None
-        
+        self.perception_cache = perception_cache if perception_cache is not None else {}  # 🆕 (input, servers) → PerceptionResult
 
         # Log session start
         self.add_memory(MemoryItem(
@@ -2,13 +2,15 @@
 
 import asyncio
 from modules.perception import run_perception
-from modules.decision import generate_plan
+from modules.decision import generate_plan, plan_cache
 from modules.action import run_python_sandbox
 from modules.model_manager import ModelManager
 from core.session import MultiMCP
-from core.strategy import select_decision_prompt_path
+from core.strategy import select_decision_prompt_path, is_speculative, run_speculative_plans
 from core.context import AgentContext
 from modules.tools import summarize_tools
+from modules.fast_path import router
+from modules.metrics import registry
 import re
 
 try:
@@ -19,18 +21,73 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
+runs = registry.counter("agent_runs_total", "Agent loop runs by outcome (fast_path, answered, max_steps, error)")
+steps = registry.counter("agent_steps_total", "Agent loop steps started")
+lifelines = registry.counter("agent_lifelines_consumed_total", "Retries spent by reason (sandbox_failure, invalid_plan)")
+
 class AgentLoop:
     def __init__(self, context: AgentContext):
         self.context = context
         self.mcp = self.context.dispatcher
         self.model = ModelManager()
+        self.steps_run = 0
+
+    def _remember_plan(self, plan: str, success: bool):
+        """Feed the plan cache: keep plans that worked (FURTHER_PROCESSING_REQUIRED included), drop cached ones that failed."""
+        if getattr(self.context, "user_input_override", None):
+            return  # only the user's own query has a reusable template
+        if success:
+            plan_cache.store(self.context.user_input, plan)
+        else:
+            plan_cache.invalidate(self.context.user_input, plan)
 
     async def run(self):
+        outcome = "error"
+        try:
+            result = await self._run()
+            if self.context.final_answer == "FINAL_ANSWER: [Max steps reached]":
+                outcome = "max_steps"
+            else:
+                outcome = "answered" if self.steps_run else "fast_path"
+            return result
+        finally:
+            runs.inc(outcome=outcome)
+            # Fold the memory journal into the session JSON for readers of past sessions
+            self.context.memory.close()
+
+    async def _run(self):
         max_steps = self.context.agent_profile.strategy.max_steps
 
+        # === Fast Path ===
+        if self.context.agent_profile.strategy.fast_path and not getattr(self.context, "user_input_override", None):
+            routed = router.match(self.context.user_input)
+            answer = router.run(routed) if routed else None
+            if answer:
+                self.context.final_answer = answer
+                self.context.memory.add_tool_output(
+                    tool_name="fast_path",
+                    tool_args={"steps": routed.steps},
+                    tool_result={"result": answer},
+                    success=True,
+                    tags=["fast_path"],
+                )
+                return {"status": "done", "result": self.context.final_answer}
+
+        # The caller skipped the history search for a fast-path query; planning needs it after all
+        search_history = getattr(self.context, "search_history", None)
+        if search_history is not None:
+            self.context.search_history = None
+            past_convs, past_context = await search_history()
+            if past_convs:
+                print(f"📚 Found {len(past_convs)} relevant past conversation(s)")
+            if past_context:
+                self.context.past_context = past_context
+
         for step in range(max_steps):
             print(f"🔁 Step {step+1}/{max_steps} starting...")
             self.context.step = step
+            self.steps_run += 1
+            steps.inc()
             lifelines_left = self.context.agent_profile.strategy.max_lifelines_per_step
 
             while lifelines_left >= 0:
@@ -39,6 +96,7 @@ class AgentLoop:
                 perception = await run_perception(context=self.context, user_input=user_input_override or self.context.user_input)
 
                 print(f"[perception] {perception}")
+                self.context.memory.set_intent(perception.intent)
 
                 selected_servers = perception.selected_servers
                 selected_tools = self.mcp.get_tools_from_servers(selected_servers)
@@ -56,16 +114,33 @@ class AgentLoop:
                 # Get past context if available
                 past_context = getattr(self.context, "past_context", None)
                 
-                plan = await generate_plan(
-                    user_input=user_input_override or self.context.user_input,
-                    perception=perception,
-                    memory_items=self.context.memory.get_session_items(),
-                    tool_descriptions=tool_descriptions,
-                    prompt_path=prompt_path,
-                    step_num=step + 1,
-                    max_steps=max_steps,
-                    past_context=past_context,
-                )
+                result = None
+                tool_log = []  # per-call timing, kept with the plan's memory item
+                strategy = self.context.agent_profile.strategy
+                if is_speculative(strategy):
+                    # Race several plans through their own sandboxes; result is already computed
+                    plan, result, tool_log = await run_speculative_plans(
+                        k=strategy.speculative_candidates,
+                        user_input=user_input_override or self.context.user_input,
+                        perception=perception,
+                        memory_items=self.context.memory.get_session_items(),
+                        tool_descriptions=tool_descriptions,
+                        step_num=step + 1,
+                        max_steps=max_steps,
+                        dispatcher=self.mcp,
+                        past_context=past_context,
+                    )
+                else:
+                    plan = await generate_plan(
+                        user_input=user_input_override or self.context.user_input,
+                        perception=perception,
+                        memory_items=self.context.memory.get_session_items(),
+                        tool_descriptions=tool_descriptions,
+                        prompt_path=prompt_path,
+                        step_num=step + 1,
+                        max_steps=max_steps,
+                        past_context=past_context,
+                    )
                 print(f"[plan] {plan}")
 
                 # === Execution ===
@@ -73,13 +148,15 @@ class AgentLoop:
                     print("[loop] Detected solve() plan — running sandboxed...")
 
                     self.context.log_subtask(tool_name="solve_sandbox", status="pending")
-                    result = await run_python_sandbox(plan, dispatcher=self.mcp)
+                    if result is None:
+                        result = await run_python_sandbox(plan, dispatcher=self.mcp, tool_log=tool_log)
 
                     success = False
                     if isinstance(result, str):
                         result = result.strip()
                         if result.startswith("FINAL_ANSWER:"):
                             success = True
+                            self._remember_plan(plan, success=True)
                             self.context.final_answer = result
                             self.context.update_subtask_status("solve_sandbox", "success")
                             self.context.memory.add_tool_output(
@@ -88,9 +165,11 @@ class AgentLoop:
                                 tool_result={"result": result},
                                 success=True,
                                 tags=["sandbox"],
+                                metadata={"tool_calls": tool_log} if tool_log else None,
                             )
                             return {"status": "done", "result": self.context.final_answer}
                         elif result.startswith("FURTHER_PROCESSING_REQUIRED:"):
+                            self._remember_plan(plan, success=True)
                             content = result.split("FURTHER_PROCESSING_REQUIRED:")[1].strip()
                             self.context.user_input_override  = (
                                 f"Original user task: {self.context.user_input}\n\n"
@@ -116,6 +195,7 @@ class AgentLoop:
                         self.context.update_subtask_status("solve_sandbox", "success")
                     else:
                         self.context.update_subtask_status("solve_sandbox", "failure")
+                    self._remember_plan(plan, success=success)
 
                     self.context.memory.add_tool_output(
                         tool_name="solve_sandbox",
@@ -123,17 +203,20 @@ class AgentLoop:
                         tool_result={"result": result},
                         success=success,
                         tags=["sandbox"],
+                        metadata={"tool_calls": tool_log} if tool_log else None,
                     )
 
                     if success and "FURTHER_PROCESSING_REQUIRED:" not in result:
                         return {"status": "done", "result": self.context.final_answer}
                     else:
                         lifelines_left -= 1
+                        lifelines.inc(reason="sandbox_failure")
                         log("loop", f"🛠 Retrying... Lifelines left: {lifelines_left}")
                         continue
                 else:
                     log("loop", f"⚠️ Invalid plan detected — retrying... Lifelines left: {lifelines_left-1}")
                     lifelines_left -= 1
+                    lifelines.inc(reason="invalid_plan")
                     continue
 
         log("loop", "⚠️ Max steps reached without finding final answer.")
@@ -1,10 +1,89 @@
 # core/session.py
 
+import asyncio
+import importlib.util
 import os
 import sys
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from pathlib import Path
 from typing import Optional, Any, List, Dict
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.server.fastmcp import FastMCP
+from mcp.types import CallToolResult, TextContent, Tool
+
+from modules.cassette import cassette
+from modules.metrics import registry
+from modules.tool_cache import tool_cache
+from modules.tracing import tracer
+
+tool_calls = registry.counter("mcp_tool_calls_total", "MCP tool calls by server, tool and outcome (ok, tool_error, error)")
+server_spawns = registry.counter("mcp_server_spawns_total", "Server processes started for tool calls, by server")
+tool_seconds = registry.histogram("mcp_tool_call_seconds", "MCP tool call latency including server spawn, by server and tool")
+
+_in_process_apps: Dict[str, FastMCP] = {}  # resolved script path → FastMCP app imported into this process
+IN_PROCESS_TIMEOUT = 30  # seconds, unless the server config sets `in_process_timeout`
+IN_PROCESS_WORKERS = 4   # threads per server, unless the server config sets `in_process_workers`
+
+# Each in-process server gets its own bounded thread pool, so tools that hang can't take the
+# threads of the loop's default executor (LLM calls, history search) or of other servers
+_in_process_executors: Dict[str, ThreadPoolExecutor] = {}
+_in_process_busy: Dict[str, int] = defaultdict(int)  # server id → threads running a call (timed-out ones included)
+_in_process_lock = threading.Lock()
+
+
+def _reserve_in_process(config: dict) -> Optional[ThreadPoolExecutor]:
+    """The server's executor with one thread reserved, or None while all of them are busy"""
+    server, size = config["id"], config.get("in_process_workers", IN_PROCESS_WORKERS)
+    with _in_process_lock:
+        if _in_process_busy[server] >= size:
+            return None
+        _in_process_busy[server] += 1
+        if server not in _in_process_executors:
+            _in_process_executors[server] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"mcp-{server}")
+        return _in_process_executors[server]
+
+
+def _release_in_process(server: str):
+    with _in_process_lock:
+        _in_process_busy[server] -= 1
+
+
+def load_in_process_app(config: dict) -> Optional[FastMCP]:
+    """
+    The FastMCP app of a server configured with `in_process: true`, imported
+    into this process (once per script), or None to keep spawning it: the
+    server is not a Python script, has no FastMCP app or fails to import.
+    """
+    if not config.get("in_process"):
+        return None
+    script = Path(config.get("cwd", os.getcwd())) / config["script"]
+    if not script.exists():
+        script = Path(config["script"])  # cwd from another machine: resolve against ours
+    if script.suffix != ".py":
+        print(f"⚠️ {config['script']} is not a Python script — using a subprocess")
+        return None
+    key = str(script.resolve())
+    if key in _in_process_apps:
+        return _in_process_apps[key]
+    try:
+        if str(script.resolve().parent) not in sys.path:
+            sys.path.insert(0, str(script.resolve().parent))  # for the server's own imports
+        spec = importlib.util.spec_from_file_location(f"mcp_in_process_{config['id']}", script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)  # `if __name__ == "__main__"` keeps mcp.run() from starting
+        app = next((value for value in vars(module).values() if isinstance(value, FastMCP)), None)
+        if app is None:
+            raise ValueError("no FastMCP app found")
+    except Exception as e:
+        print(f"⚠️ Could not load {config['script']} in-process ({e}) — using a subprocess")
+        return None
+    app.in_process = True  # instrument_server skips its per-call state file
+    _in_process_apps[key] = app
+    return app
 
 
 class MCP:
@@ -52,12 +131,15 @@ class MultiMCP:
     """
     Stateless version: discovers tools from multiple MCP servers, but reconnects per tool call.
     Each call_tool() uses a fresh session based on tool-to-server mapping.
+    Servers configured with `in_process: true` are imported once instead and
+    their tools called directly (see load_in_process_app).
     """
 
     def __init__(self, server_configs: List[dict]):
         self.server_configs = server_configs
         self.tool_map: Dict[str, Dict[str, Any]] = {}  # tool_name → {config, tool}
         self.server_tools: Dict[str, List[Any]] = {}  # server_name -> list of tools
+        self.apps: Dict[str, FastMCP] = {}  # server id → app called in-process instead of spawned
 
 
     async def initialize(self):
@@ -69,35 +151,53 @@ class MultiMCP:
                     args=[config["script"]],
                     cwd=config.get("cwd", os.getcwd())
                 )
-                print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
-                async with stdio_client(params) as (read, write):
-                    print("Connection established, creating session...")
-                    try:
-                        async with ClientSession(read, write) as session:
-                            print("[agent] Session created, initializing...")
-                            await session.initialize()
-                            print("[agent] MCP session initialized")
-                            tools = await session.list_tools()
-                            print(f"→ Tools received: {[tool.name for tool in tools.tools]}")
-                            for tool in tools.tools:
-                                self.tool_map[tool.name] = {
-                                    "config": config,
-                                    "tool": tool
-                                }
-                                server_key = config["id"]  # fallback to script name if no key
-                                if server_key not in self.server_tools:
-                                    self.server_tools[server_key] = []
-                                self.server_tools[server_key].append(tool)
-                    except Exception as se:
-                        print(f"❌ Session error: {se}")
+                app = None if cassette.mode == "replay" else load_in_process_app(config)
+                if app is not None:
+                    self.apps[config["id"]] = app
+                    print(f"→ Scanning tools from: {config['script']} (in-process)")
+                else:
+                    print(f"→ Scanning tools from: {config['script']} in {params.cwd}")
+                tools = await cassette.call(
+                    "tools", f"tools:{config['id']}", {"server": config["id"]},
+                    (lambda: app.list_tools()) if app is not None else (lambda: self._list_tools(params)),
+                    encode=lambda tools: [tool.model_dump(mode="json") for tool in tools],
+                    decode=lambda data: [Tool.model_validate(tool) for tool in data],
+                )
+                print(f"→ Tools received: {[tool.name for tool in tools]}")
+                for tool in tools:
+                    self.tool_map[tool.name] = {
+                        "config": config,
+                        "tool": tool
+                    }
+                    server_key = config["id"]  # fallback to script name if no key
+                    if server_key not in self.server_tools:
+                        self.server_tools[server_key] = []
+                    self.server_tools[server_key].append(tool)
             except Exception as e:
                 print(f"❌ Error initializing MCP server {config['script']}: {e}")
 
+    async def _list_tools(self, params: StdioServerParameters) -> List[Tool]:
+        async with stdio_client(params) as (read, write):
+            print("Connection established, creating session...")
+            try:
+                async with ClientSession(read, write) as session:
+                    print("[agent] Session created, initializing...")
+                    await session.initialize()
+                    print("[agent] MCP session initialized")
+                    return (await session.list_tools()).tools
+            except Exception as se:
+                print(f"❌ Session error: {se}")
+                return []
+
     async def call_tool(self, tool_name: str, arguments: dict) -> Any:
         entry = self.tool_map.get(tool_name)
         if not entry:
             raise ValueError(f"Tool '{tool_name}' not found on any server.")
 
+        cached = tool_cache.lookup(tool_name, arguments, entry["tool"])
+        if cached is not None:
+            return cached
+
         config = entry["config"]
         params = StdioServerParameters(
             command=sys.executable,
@@ -105,11 +205,64 @@ class MultiMCP:
             cwd=config.get("cwd", os.getcwd())
         )
 
-        async with stdio_client(params) as (read, write):
-            async with ClientSession(read, write) as session:
+        server = config.get("id")
+        app = self.apps.get(server)
+        outcome = "error"
+        try:
+            with tracer.span("mcp.call_tool", tool=tool_name, server=server), \
+                    tool_seconds.time(server=server, tool=tool_name):
+                result = await cassette.call(
+                    "tool", f"tool:{tool_name}", {"tool": tool_name, "arguments": arguments},
+                    (lambda: self._call_in_process(app, tool_name, arguments, config, params)) if app is not None
+                    else (lambda: self._spawn_and_call(params, tool_name, arguments, server)),
+                    encode=lambda result: result.model_dump(mode="json"),
+                    decode=CallToolResult.model_validate,
+                )
+            outcome = "tool_error" if getattr(result, "isError", False) else "ok"
+            tool_cache.store(tool_name, arguments, result, entry["tool"])
+            return result
+        finally:
+            tool_calls.inc(server=server, tool=tool_name, outcome=outcome)
+
+    async def _spawn_and_call(
+        self, params: StdioServerParameters, tool_name: str, arguments: dict, server: str
+    ) -> CallToolResult:
+        # Same as nested `async with`s, entered one by one so each phase gets its own span
+        async with AsyncExitStack() as stack:
+            with tracer.span("mcp.spawn"):
+                server_spawns.inc(server=server)
+                read, write = await stack.enter_async_context(stdio_client(params))
+                session = await stack.enter_async_context(ClientSession(read, write))
+            with tracer.span("mcp.initialize"):
                 await session.initialize()
+            with tracer.span("mcp.call"):
                 return await session.call_tool(tool_name, arguments)
 
+    async def _call_in_process(
+        self, app: FastMCP, tool_name: str, arguments: dict, config: dict, params: StdioServerParameters
+    ) -> CallToolResult:
+        # Same result shape as the stdio path: the MCP server turns a raised exception into isError.
+        # The tool runs on one of the server's own threads (with its own event loop for async
+        # tools) so a blocking tool can't stall the agent's loop; past the timeout the call is
+        # reported as an error and the thread is left to finish, still holding its slot. While
+        # every slot is taken, calls go to a subprocess instead.
+        executor = _reserve_in_process(config)
+        if executor is None:
+            print(f"⚠️ In-process threads of {config['id']} are all busy — calling {tool_name} in a subprocess")
+            return await self._spawn_and_call(params, tool_name, arguments, config["id"])
+        timeout = config.get("in_process_timeout", IN_PROCESS_TIMEOUT)
+        with tracer.span("mcp.in_process"):
+            try:
+                future = executor.submit(lambda: asyncio.run(app.call_tool(tool_name, arguments)))
+                future.add_done_callback(lambda _: _release_in_process(config["id"]))
+                content = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+                return CallToolResult(content=list(content), isError=False)
+            except asyncio.TimeoutError:
+                text = f"Error executing tool {tool_name}: timed out after {timeout}s"
+                return CallToolResult(content=[TextContent(type="text", text=text)], isError=True)
+            except Exception as e:
+                return CallToolResult(content=[TextContent(type="text", text=str(e))], isError=True)
+
     async def list_all_tools(self) -> List[str]:
         return list(self.tool_map.keys())
 
@@ -1,11 +1,15 @@
 # modules/strategy.py
 
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Tuple
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
 from modules.model_manager import ModelManager
+from modules import decision
+from modules.action import run_python_sandbox
 from core.context import AgentContext
 from modules.tools import filter_tools_by_hint, summarize_tools, load_prompt
+import asyncio
+import re
 
 # Optional fallback logger
 try:
@@ -29,6 +33,29 @@ def select_decision_prompt_path(planning_mode: str, exploration_mode: Optional[s
 
 model = ModelManager()
 
+# Prompt variants cycled through by speculative candidates (diversity beyond temperature alone)
+SPECULATIVE_PROMPTS = [
+    "prompts/decision_prompt_exploratory_parallel.txt",
+    "prompts/decision_prompt_exploratory_sequential.txt",
+    "prompts/decision_prompt_conservative_short.txt",
+]
+
+def is_speculative(strategy: Any) -> bool:
+    """True when the profile asks for parallel exploratory planning with more than one candidate."""
+    return (
+        strategy.planning_mode == "exploratory"
+        and strategy.exploration_mode == "parallel"
+        and strategy.speculative_candidates > 1
+    )
+
+def speculative_variants(k: int) -> List[Tuple[str, float]]:
+    """(prompt_path, temperature) per candidate; temperatures spread evenly over 0.2–1.0."""
+    variants = []
+    for i in range(k):
+        temperature = round(0.2 + 0.8 * i / max(k - 1, 1), 2)
+        variants.append((SPECULATIVE_PROMPTS[i % len(SPECULATIVE_PROMPTS)], temperature))
+    return variants
+
 async def decide_next_action(
     context: AgentContext,
     perception: PerceptionResult,
@@ -192,7 +219,7 @@ async def generate_plan(
         user_input=perception.user_input
     )
 
-    raw = (await model.generate_text(final_prompt)).strip()
+    raw = (await model.generate_text(final_prompt, site="strategy")).strip()
     log("plan", f"Generated solve():\n{raw}")
 
     return raw
@@ -210,3 +237,98 @@ def find_recent_successful_tools(memory_items: List[MemoryItem], limit: int = 5)
             break
 
     return successful_tools
+
+
+# === SPECULATIVE PARALLEL MODE ===
+async def run_speculative_plans(
+    k: int,
+    user_input: str,
+    perception: PerceptionResult,
+    memory_items: List[MemoryItem],
+    tool_descriptions: str,
+    step_num: int,
+    max_steps: int,
+    dispatcher: Any,
+    past_context: Optional[str] = None,
+) -> Tuple[str, Optional[str], List[dict]]:
+    """
+    Generate k solve() candidates concurrently and run each in its own sandbox.
+    The first candidate whose sandbox returns an answer (FINAL_ANSWER or a plain
+    value, as the loop treats it) wins and the others are cancelled.
+
+    Returns (plan, result, tool_log), tool_log being the chosen plan's per-call
+    timings as run_python_sandbox records them. Without a winner, the first
+    FURTHER_PROCESSING_REQUIRED outcome is preferred, then a failed execution.
+    result is None when no candidate produced a valid solve().
+    """
+
+    async def candidate(index: int, prompt_path: str, temperature: float) -> Tuple[str, Optional[str], List[dict]]:
+        plan = await decision.generate_plan(
+            user_input=user_input,
+            perception=perception,
+            memory_items=memory_items,
+            tool_descriptions=tool_descriptions,
+            prompt_path=prompt_path,
+            step_num=step_num,
+            max_steps=max_steps,
+            past_context=past_context,
+            temperature=temperature,
+            use_plan_cache=False,
+        )
+        if not re.search(r"^\s*(async\s+)?def\s+solve\s*\(", plan, re.MULTILINE):
+            return plan, None, []
+
+        log("strategy", f"🏁 Candidate {index + 1} ({prompt_path}, t={temperature}) running in sandbox")
+        # Each call builds a fresh module scope, so candidates cannot see each other's state
+        tool_log: List[dict] = []
+        result = await run_python_sandbox(plan, dispatcher=dispatcher, tool_log=tool_log)
+        return plan, result.strip() if isinstance(result, str) else result, tool_log
+
+    # A cached plan for this query template beats any race
+    cached = decision.plan_cache.lookup(user_input)
+    if cached:
+        log("strategy", "♻️ Running cached plan before speculating")
+        tool_log: List[dict] = []
+        result = await run_python_sandbox(cached, dispatcher=dispatcher, tool_log=tool_log)
+        result = result.strip() if isinstance(result, str) else result
+        # FURTHER_PROCESSING_REQUIRED counts as working, as in AgentLoop._remember_plan
+        if not str(result).startswith("[sandbox error:"):
+            return cached, result, tool_log
+        decision.plan_cache.invalidate(user_input)
+
+    tasks = [
+        asyncio.create_task(candidate(i, prompt_path, temperature))
+        for i, (prompt_path, temperature) in enumerate(speculative_variants(k))
+    ]
+
+    fallback: Optional[Tuple[str, Optional[str], List[dict]]] = None
+    try:
+        for finished in asyncio.as_completed(tasks):
+            try:
+                plan, result, tool_log = await finished
+            except Exception as e:
+                log("strategy", f"⚠️ Speculative candidate failed: {e}")
+                continue
+
+            if result is None:
+                fallback = fallback or (plan, None, [])
+                continue
+
+            result_text = str(result)
+            if result_text.startswith("FURTHER_PROCESSING_REQUIRED:"):
+                if fallback is None or not str(fallback[1]).startswith("FURTHER_PROCESSING_REQUIRED:"):
+                    fallback = (plan, result, tool_log)
+            elif result_text.startswith("[sandbox error:"):
+                if fallback is None or fallback[1] is None:
+                    fallback = (plan, result, tool_log)
+            else:
+                log("strategy", "✅ Speculative candidate produced an answer — cancelling the rest")
+                return plan, result, tool_log
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    log("strategy", "⚠️ No speculative candidate produced FINAL_ANSWER")
+    return fallback or ("FINAL_ANSWER: [Could not generate valid solve()]", None, [])
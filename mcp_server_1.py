@@ -16,6 +16,7 @@ import sqlite3
 from io import StringIO
 from tqdm import tqdm
 import hashlib
+from modules.metrics import instrument_server
 
 # Models
 from models import (
@@ -40,6 +41,7 @@ from models import (
 )
 
 mcp = FastMCP("Calculator")
+instrument_server(mcp, "math")
 
 # ------------------- Tools -------------------
 
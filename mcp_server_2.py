@@ -23,9 +23,11 @@ import trafilatura
 import pymupdf4llm
 import re
 import base64 # ollama needs base64-encoded-image
+from modules.metrics import instrument_server
 
 
 mcp = FastMCP("Calculator")
+instrument_server(mcp, "documents")
 
 EMBED_URL = "http://localhost:11434/api/embeddings"
 OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
@@ -13,6 +13,7 @@ import re
 from pydantic import BaseModel, Field
 from models import SearchInput, UrlInput
 from models import PythonCodeOutput  # Import the models we need
+from modules.metrics import instrument_server
 
 
 @dataclass
@@ -210,6 +211,7 @@ class WebContentFetcher:
 
 # Initialize FastMCP server
 mcp = FastMCP("ddg-search")
+instrument_server(mcp, "websearch")
 searcher = DuckDuckGoSearcher()
 fetcher = WebContentFetcher()
 
@@ -0,0 +1,67 @@
+# mcp_test_servers.py
+
+"""
+Throwaway MCP servers shared by the test suites
+write_server() puts a server script in a fresh temporary directory (the
+server's cwd) and returns its path; echo_config() does that for the echo
+server and returns a MultiMCP server config for it.
+"""
+
+import tempfile
+import textwrap
+from pathlib import Path
+from typing import Optional
+
+MODULES_DIR = Path(__file__).parent / "modules"
+
+ECHO_SERVER = textwrap.dedent('''
+    import sys
+    from mcp.server.fastmcp import FastMCP
+    server = FastMCP("Echo")
+    {instrument}
+
+    @server.tool()
+    def echo(text: str) -> str:
+        """Return text unchanged"""
+        return text
+
+    @server.tool()
+    async def shout(text: str) -> dict:
+        """Upper-case text"""
+        return {{"text": text.upper()}}
+
+    @server.tool()
+    def fail(text: str) -> str:
+        """Always raises"""
+        raise ValueError(text)
+
+    if __name__ == "__main__":
+        server.run(transport="stdio")
+''')
+
+# Records the server's calls the way mcp_server_*.py do, into its own state directory
+INSTRUMENT = (
+    "sys.path.insert(0, {modules!r}); "
+    "from metrics import Registry, instrument_server; "
+    "instrument_server(server, 'echo', Registry(state_dir={state_dir!r}))"
+)
+
+
+def write_server(source: str, name: str = "echo_server.py", work: Optional[Path] = None) -> Path:
+    """Write a server script into work (a new temporary directory by default)"""
+    work = work or Path(tempfile.mkdtemp())
+    script = work / name
+    script.write_text(source, encoding="utf-8")
+    return script
+
+
+def echo_server(metrics_dir: Optional[Path] = None) -> str:
+    """Source of the echo server (tools echo, shout, fail), instrumented when metrics_dir is given"""
+    instrument = INSTRUMENT.format(modules=str(MODULES_DIR), state_dir=str(metrics_dir)) if metrics_dir else ""
+    return ECHO_SERVER.format(instrument=instrument)
+
+
+def echo_config(server_id: str = "echo", metrics_dir: Optional[Path] = None, **extra) -> dict:
+    """MultiMCP config for an echo server written to a new temporary directory"""
+    script = write_server(echo_server(metrics_dir))
+    return {"id": server_id, "script": str(script), "cwd": str(script.parent), **extra}
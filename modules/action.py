@@ -1,10 +1,17 @@
 # modules/action.py
 
-from typing import Dict, Any, Union
+from typing import Dict, Any, List, Optional, Union
 from pydantic import BaseModel
 import asyncio
 import types
 import json
+import time
+
+from pathlib import Path
+import yaml
+
+from modules.sandbox_pool import sandbox_pool
+from modules.tracing import tracer
 
 
 # Optional logging fallback
@@ -22,75 +29,199 @@ class ToolCallResult(BaseModel):
     result: Union[str, list, dict]
     raw_response: Any
 
-MAX_TOOL_CALLS_PER_PLAN = 5
+PROFILE_YAML = Path(__file__).parent.parent / "config" / "profiles.yaml"
 
-async def run_python_sandbox(code: str, dispatcher: Any) -> str:
-    print("[action] 🔍 Entered run_python_sandbox()")
 
-    # Create a fresh module scope
-    sandbox = types.ModuleType("sandbox")
+def _load_config() -> Dict:
+    try:
+        return yaml.safe_load(PROFILE_YAML.read_text()).get("sandbox", {}) or {}
+    except Exception:
+        return {}
+
+
+SANDBOX_CONFIG = _load_config()
+SANDBOX_MODE = SANDBOX_CONFIG.get("mode", "pool")  # "pool": worker processes (modules/sandbox_pool.py), "inline": this process
+SANDBOX_FALLBACK = SANDBOX_CONFIG.get("fallback", "none")  # "inline": run in this process when the pool is unavailable
+MAX_TOOL_CALLS_PER_PLAN = SANDBOX_CONFIG.get("max_tool_calls_per_plan", 5)
+
+
+class PlanDispatcher:
+    """
+    Tool calls of one solve() plan, on their way to the real dispatcher (MultiMCP).
+    Calls a plan makes concurrently (asyncio.gather) run concurrently, at most
+    `server_concurrency` at a time per MCP server across all running plans.
+    An identical call (same tool and arguments) already in flight in the same
+    plan is awaited instead of made again. Every call is timed into `calls`.
+    """
+
+    _limits: Dict[str, asyncio.Semaphore] = {}
+    _limits_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __init__(self, dispatcher: Any):
+        self.dispatcher = dispatcher
+        self.tool_map = getattr(dispatcher, "tool_map", {})
+        self.calls: List[Dict] = []
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._started = time.perf_counter()
+
+    def _server(self, tool_name: str) -> str:
+        entry = self.tool_map.get(tool_name)
+        if isinstance(entry, dict) and "config" in entry:
+            return entry["config"].get("id", "default")
+        return "default"
+
+    @classmethod
+    def _limit(cls, server: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if cls._limits_loop is not loop:  # semaphores are bound to the loop that first waits on them
+            cls._limits, cls._limits_loop = {}, loop
+        if server not in cls._limits:
+            limits = SANDBOX_CONFIG.get("server_concurrency", {}) or {}
+            cls._limits[server] = asyncio.Semaphore(limits.get(server, limits.get("default", 4)))
+        return cls._limits[server]
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> Any:
+        key = json.dumps([tool_name, arguments], sort_keys=True, default=str)
+        record = {"tool": tool_name, "server": self._server(tool_name), "arguments": arguments,
+                  "start_ms": round((time.perf_counter() - self._started) * 1000, 1)}
+        self.calls.append(record)
+
+        if key in self._in_flight:
+            record["deduplicated"] = True
+            shared = self._in_flight[key]
+            begin = time.perf_counter()
+            try:
+                return await asyncio.shield(shared)
+            finally:
+                record["duration_ms"] = round((time.perf_counter() - begin) * 1000, 1)
+                record["ok"] = shared.done() and not shared.cancelled() and shared.exception() is None
+
+        task = asyncio.ensure_future(self._call(tool_name, arguments, record))
+        self._in_flight[key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._in_flight.pop(key, None)
+            else:  # this caller was cancelled; the call finishes for anyone else awaiting it
+                task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def _call(self, tool_name: str, arguments: dict, record: Dict) -> Any:
+        limit = self._limit(record["server"])
+        queued = time.perf_counter()
+        async with limit:
+            begin = time.perf_counter()
+            record["queued_ms"] = round((begin - queued) * 1000, 1)
+            try:
+                result = await self.dispatcher.call_tool(tool_name, arguments)
+                record["ok"] = not getattr(result, "isError", False)
+                return result
+            except Exception:
+                record["ok"] = False
+                raise
+            finally:
+                record["duration_ms"] = round((time.perf_counter() - begin) * 1000, 1)
+
+    def summary(self) -> Dict:
+        deduplicated = sum(1 for call in self.calls if call.get("deduplicated"))
+        made = [call for call in self.calls if not call.get("deduplicated")]
+        return {
+            "calls": len(self.calls),
+            "deduplicated": deduplicated,
+            "tool_ms": round(sum(call.get("duration_ms", 0) for call in made), 1),
+            "wall_ms": round((time.perf_counter() - self._started) * 1000, 1),
+        }
+
+
+async def run_python_sandbox(code: str, dispatcher: Any, tool_log: Optional[List[Dict]] = None) -> str:
+    """Run a solve() plan; the timing of each tool call it made is appended to tool_log"""
+    print("[action] 🔍 Entered run_python_sandbox()")
 
+    plan_dispatcher = PlanDispatcher(dispatcher)
     try:
-        # Patch MCP client with real dispatcher
-        class SandboxMCP:
-            def __init__(self, dispatcher):
-                self.dispatcher = dispatcher
-                self.call_count = 0
-                # Get list of available tools
-                self.available_tools = set(dispatcher.tool_map.keys()) if hasattr(dispatcher, 'tool_map') else set()
-
-            async def call_tool(self, tool_name: str, input_dict: dict):
-                self.call_count += 1
-                if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
-                    raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
+        return await _run_plan(code, plan_dispatcher)
+    finally:
+        if plan_dispatcher.calls:
+            log("sandbox", f"🔀 Tool calls: {plan_dispatcher.summary()}")
+        if tool_log is not None:
+            tool_log.extend(plan_dispatcher.calls)
+
+
+async def _run_plan(code: str, dispatcher: "PlanDispatcher") -> str:
+    with tracer.span("sandbox", plan_chars=len(code), mode=SANDBOX_MODE):
+        if SANDBOX_MODE == "pool":
+            try:
+                return await sandbox_pool.run(code, dispatcher, MAX_TOOL_CALLS_PER_PLAN)
+            except Exception as e:  # pool could not start workers
+                if SANDBOX_FALLBACK != "inline":
+                    log("sandbox", f"⚠️ Sandbox pool unavailable ({e}), plan not run")
+                    return f"[sandbox error: sandbox pool unavailable ({e})]"
+                log("sandbox", f"⚠️ Sandbox pool unavailable ({e}), running plan inline without limits")
+
+        # Create a fresh module scope
+        sandbox = types.ModuleType("sandbox")
+
+        try:
+            # Patch MCP client with real dispatcher
+            class SandboxMCP:
+                def __init__(self, dispatcher):
+                    self.dispatcher = dispatcher
+                    self.call_count = 0
+                    # Get list of available tools
+                    self.available_tools = set(dispatcher.tool_map.keys()) if hasattr(dispatcher, 'tool_map') else set()
+
+                async def call_tool(self, tool_name: str, input_dict: dict):
+                    self.call_count += 1
+                    if self.call_count > MAX_TOOL_CALLS_PER_PLAN:
+                        raise RuntimeError(f"Exceeded max tool calls ({MAX_TOOL_CALLS_PER_PLAN}) in solve() plan.")
                 
-                # Validate tool exists
-                if self.available_tools and tool_name not in self.available_tools:
-                    available_list = ', '.join(sorted(list(self.available_tools)[:10]))
-                    raise ValueError(
-                        f"Tool '{tool_name}' not found on any server.\n"
-                        f"Available tools include: {available_list}...\n"
-                        f"Please use only tools from the Tool Catalog."
-                    )
+                    # Validate tool exists
+                    if self.available_tools and tool_name not in self.available_tools:
+                        available_list = ', '.join(sorted(list(self.available_tools)[:10]))
+                        raise ValueError(
+                            f"Tool '{tool_name}' not found on any server.\n"
+                            f"Available tools include: {available_list}...\n"
+                            f"Please use only tools from the Tool Catalog."
+                        )
                 
-                # REAL tool call now
-                result = await self.dispatcher.call_tool(tool_name, input_dict)
-                return result
+                    # REAL tool call now
+                    result = await self.dispatcher.call_tool(tool_name, input_dict)
+                    return result
 
-        sandbox.mcp = SandboxMCP(dispatcher)
+            sandbox.mcp = SandboxMCP(dispatcher)
 
-        # Preload safe built-ins into the sandbox
-        import json, re
-        sandbox.__dict__["json"] = json
-        sandbox.__dict__["re"] = re
+            # Preload safe built-ins into the sandbox
+            import json, re
+            sandbox.__dict__["json"] = json
+            sandbox.__dict__["re"] = re
 
-        # Execute solve fn dynamically
-        exec(compile(code, "<solve_plan>", "exec"), sandbox.__dict__)
+            # Execute solve fn dynamically
+            exec(compile(code, "<solve_plan>", "exec"), sandbox.__dict__)
 
-        solve_fn = sandbox.__dict__.get("solve")
-        if solve_fn is None:
-            raise ValueError("No solve() function found in plan.")
+            solve_fn = sandbox.__dict__.get("solve")
+            if solve_fn is None:
+                raise ValueError("No solve() function found in plan.")
 
-        if asyncio.iscoroutinefunction(solve_fn):
-            result = await solve_fn()
-        else:
-            result = solve_fn()
+            if asyncio.iscoroutinefunction(solve_fn):
+                result = await solve_fn()
+            else:
+                result = solve_fn()
 
-        # Clean result formatting
-        if isinstance(result, dict) and "result" in result:
-            return f"{result['result']}"
-        elif isinstance(result, dict):
-            return f"{json.dumps(result)}"
-        elif isinstance(result, list):
-            return f"{' '.join(str(r) for r in result)}"
-        else:
-            return f"{result}"
+            # Clean result formatting
+            if isinstance(result, dict) and "result" in result:
+                return f"{result['result']}"
+            elif isinstance(result, dict):
+                return f"{json.dumps(result)}"
+            elif isinstance(result, list):
+                return f"{' '.join(str(r) for r in result)}"
+            else:
+                return f"{result}"
 
 
 
 
 
 
-    except Exception as e:
-        log("sandbox", f"⚠️ Execution error: {e}")
-        return f"[sandbox error: {str(e)}]"
+        except Exception as e:
+            log("sandbox", f"⚠️ Execution error: {e}")
+            return f"[sandbox error: {str(e)}]"
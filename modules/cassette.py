@@ -0,0 +1,230 @@
+# modules/cassette.py
+
+"""
+Record and replay of external interactions
+In "record" mode every LLM call (ModelManager.generate_text), MCP tool call
+and tool listing (MultiMCP) and embedding request (ConversationIndex) is
+appended to a JSONL cassette as it happens. In "replay" mode the same calls
+are answered from the cassette without touching Gemini, Ollama or any MCP
+server process, so a recorded session re-runs in milliseconds.
+
+Replay matching: an interaction is keyed by a hash of its request (model,
+site and prompt; tool name and arguments; ...). Requests seen again after
+their recordings are used up get the last recording back. A request with no
+recording at all (a prompt that drifted, e.g. because past-conversation
+context differs) takes the next unused recording of the same group (same
+LLM call site or tool) in recorded order, unless strict is set; embeddings
+only ever match exactly.
+
+Calls made inside `with cassette.scope(name)` (batch_runner uses the query
+id) are recorded with that scope, and replay matches them within it first:
+a drifted request only takes recordings of its own scope (or unscoped ones),
+so queries recorded and replayed concurrently can't trade answers.
+"""
+
+import contextvars
+import hashlib
+import json
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+MODES = ("off", "record", "replay")
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+class CassetteMiss(LookupError):
+    """Replay found no recording for a request"""
+
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("cassette_scope", default=None)
+
+
+class Cassette:
+    def __init__(self, path: Optional[str] = None, mode: Optional[str] = None, strict: Optional[bool] = None):
+        config = self._load_config()
+        self.path = Path(path or config.get("path", "cassettes/session.jsonl"))
+        self.mode = "off"
+        self.strict = config.get("strict", False) if strict is None else strict
+        self._lock = threading.Lock()
+        self.configure(mode or config.get("mode") or "off", self.path)
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("cassette", {}) or {}
+        except Exception:
+            return {}
+
+    def configure(self, mode: str, path: Optional[str] = None, strict: Optional[bool] = None):
+        """Switch mode (and cassette file); replay loads the file, record starts a new one"""
+        if mode not in MODES:
+            raise ValueError(f"Cassette mode must be one of {MODES}, got {mode!r}")
+        with self._lock:
+            self.mode = mode
+            self.path = Path(path) if path else self.path
+            if strict is not None:
+                self.strict = strict
+            self._entries: List[Dict] = []
+            self._by_key: Dict[str, List[int]] = defaultdict(list)
+            self._by_group: Dict[str, List[int]] = defaultdict(list)
+            self._used: set = set()
+            self._last: Dict[str, int] = {}
+            self.stats = {"recorded": 0, "replayed": 0, "repeated": 0, "drifted": 0, "missed": 0}
+            if mode == "record":
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text("", encoding="utf-8")
+            elif mode == "replay":
+                self._load()
+        if mode != "off":
+            log("cassette", f"📼 {mode.capitalize()} mode: {self.path}")
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted recording
+                position = len(self._entries)
+                self._entries.append(entry)
+                self._by_key[entry["key"]].append(position)
+                self._by_group[entry["group"]].append(position)
+
+    @property
+    def active(self) -> bool:
+        return self.mode != "off"
+
+    # === Matching ===
+    @staticmethod
+    def _key(kind: str, request: Dict) -> str:
+        payload = json.dumps({"kind": kind, **request}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+    def _in_scope(self, position: int, scope: Optional[str]) -> bool:
+        recorded = self._entries[position].get("scope")
+        return scope is None or recorded is None or recorded == scope
+
+    def _take(self, group: str, key: str, fallback: bool) -> Dict:
+        scope = _scope.get()
+        with self._lock:
+            positions = self._by_key.get(key, ())
+            for position in sorted(positions, key=lambda p: not self._in_scope(p, scope)):
+                if position not in self._used:
+                    self.stats["replayed"] += 1
+                    return self._use(position, key)
+            if key in self._last:
+                self.stats["repeated"] += 1
+                return self._entries[self._last[key]]
+            if fallback and not self.strict:
+                for position in self._by_group.get(group, ()):
+                    if position not in self._used and self._in_scope(position, scope):
+                        self.stats["drifted"] += 1
+                        log("cassette", f"⚠️ No exact recording for {group}, replaying the next one recorded")
+                        return self._use(position, key)
+            self.stats["missed"] += 1
+        raise CassetteMiss(f"No recording for {group} in {self.path}")
+
+    def _use(self, position: int, key: str) -> Dict:
+        self._used.add(position)
+        self._last[key] = position
+        return self._entries[position]
+
+    def _record(self, kind: str, group: str, key: str, request: Dict, response: Any = None, error: Optional[str] = None):
+        entry = {"kind": kind, "group": group, "key": key, "request": request}
+        if _scope.get() is not None:
+            entry["scope"] = _scope.get()
+        if error is None:
+            entry["response"] = response
+        else:
+            entry["error"] = error
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)  # appended as it happens: an interrupted run keeps what it recorded
+            self.stats["recorded"] += 1
+
+    @staticmethod
+    def _replayed(entry: Dict, decode: Callable) -> Any:
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return decode(entry["response"])
+
+    # === Public API ===
+    @contextmanager
+    def scope(self, name: Any):
+        """Record and match the calls made inside (in this task and those it starts) under name"""
+        token = _scope.set(str(name))
+        try:
+            yield
+        finally:
+            _scope.reset(token)
+
+    async def call(
+        self,
+        kind: str,
+        group: str,
+        request: Dict,
+        fn: Callable[[], Awaitable[Any]],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        fallback: bool = True,
+    ) -> Any:
+        """Run fn (off), run and record it (record) or answer from the cassette (replay)"""
+        if self.mode == "off":
+            return await fn()
+        key = self._key(kind, request)
+        if self.mode == "replay":
+            return self._replayed(self._take(group, key, fallback), decode)
+        try:
+            result = await fn()
+        except Exception as e:
+            self._record(kind, group, key, request, error=f"{type(e).__name__}: {e}")
+            raise
+        self._record(kind, group, key, request, encode(result))
+        return result
+
+    def call_sync(
+        self,
+        kind: str,
+        group: str,
+        request: Dict,
+        fn: Callable[[], Any],
+        encode: Callable[[Any], Any] = lambda value: value,
+        decode: Callable[[Any], Any] = lambda value: value,
+        fallback: bool = True,
+    ) -> Any:
+        """call() for blocking callers"""
+        if self.mode == "off":
+            return fn()
+        key = self._key(kind, request)
+        if self.mode == "replay":
+            return self._replayed(self._take(group, key, fallback), decode)
+        try:
+            result = fn()
+        except Exception as e:
+            self._record(kind, group, key, request, error=f"{type(e).__name__}: {e}")
+            raise
+        self._record(kind, group, key, request, encode(result))
+        return result
+
+    def get_stats(self) -> Dict:
+        return {"mode": self.mode, "path": str(self.path), "entries": len(self._entries), **self.stats}
+
+
+cassette = Cassette()
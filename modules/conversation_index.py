@@ -2,11 +2,19 @@
 
 """
 Conversation History Indexing System
-Indexes past conversations and provides relevant context to the agent
+Indexes past conversations and provides relevant context to the agent.
+Vectors are L2-normalised and stored in an inner-product index, so scores are
+cosine similarities (higher is closer). Session and timestamp filters are
+applied inside FAISS through an ID selector built from columnar metadata.
+The index is bounded: past max_entries the least recent / least used
+conversations are evicted, and ranking blends similarity with recency.
 """
 
 import os
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 import faiss
 import numpy as np
 import requests
@@ -14,6 +22,12 @@ from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import hashlib
+import weakref
+
+from modules.memory import _load_memory_config, load_payloads
+from modules.cassette import cassette
+from modules.metrics import registry
+from modules.tracing import tracer
 
 
 class ConversationIndex:
@@ -28,13 +42,23 @@ class ConversationIndex:
         index_dir: str = "conversation_index",
         embed_url: str = "http://localhost:11434/api/embeddings",
         embed_model: str = "nomic-embed-text",
-        top_k: int = 3
+        top_k: int = 3,
+        min_similarity: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        half_life_days: Optional[float] = None,
+        recency_weight: Optional[float] = None
     ):
         self.memory_dir = Path(memory_dir)
         self.index_dir = Path(index_dir)
         self.embed_url = embed_url
         self.embed_model = embed_model
         self.top_k = top_k
+        config = _load_memory_config().get("conversation_index", {}) or {}
+        self.min_similarity = min_similarity if min_similarity is not None else config.get("min_similarity", 0.0)
+        # Capacity policy (max_entries 0 = unbounded) and age weighting of scores
+        self.max_entries = max_entries if max_entries is not None else config.get("max_entries", 0)
+        self.half_life_days = half_life_days if half_life_days is not None else config.get("half_life_days", 0)
+        self.recency_weight = recency_weight if recency_weight is not None else config.get("recency_weight", 0.0)
         
         # Create index directory
         self.index_dir.mkdir(exist_ok=True)
@@ -43,13 +67,29 @@ class ConversationIndex:
         self.index_file = self.index_dir / "conversations.index"
         self.metadata_file = self.index_dir / "conversations_metadata.json"
         self.cache_file = self.index_dir / "index_cache.json"
+        self.manifest_file = self.index_dir / "dir_manifest.json"
         
         # Load or initialize
         self.index = None
         self.metadata = []
         self.cache = {}
+        self.manifest = {}  # dir → [mtime_ns, subdirs, session files] as of the last scan
+        self._cache_dirty = False
+        self._known = set()  # conversation keys already in the index
+        # Columnar copies of the metadata the search filters read (row i ↔ FAISS id i)
+        self._session_codes: Dict[str, int] = {}
+        self._session_column = np.zeros(0, dtype=np.int32)
+        self._timestamp_column = np.zeros(0, dtype=np.float64)
+        self._lock = threading.RLock()  # index/metadata are shared with the background indexer
+        self._executor: Optional[ThreadPoolExecutor] = None
         
         self._load_or_create_index()
+
+        ref = weakref.ref(self)  # the registry must not keep a discarded index alive
+        registry.callback(
+            "conversation_index_entries", "Conversations in the FAISS history index",
+            lambda: ref().index.ntotal if ref() is not None and ref().index is not None else None,
+        )
     
     def _load_or_create_index(self):
         """Load existing index or create new one"""
@@ -61,7 +101,17 @@ class ConversationIndex:
                 if self.cache_file.exists():
                     with open(self.cache_file, 'r') as f:
                         self.cache = json.load(f)
+                if self.manifest_file.exists():
+                    with open(self.manifest_file, 'r') as f:
+                        self.manifest = json.load(f)
+                self._known = {self._conversation_key(conv) for conv in self.metadata}
+                self._rebuild_columns()
                 print(f"✅ Loaded conversation index with {len(self.metadata)} entries")
+                if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+                    self._convert_to_cosine()
+                if self.max_entries and len(self.metadata) > self.max_entries:
+                    self._evict()
+                    self._save_index()
             except Exception as e:
                 print(f"⚠️ Error loading index: {e}. Creating new index.")
                 self._create_new_index()
@@ -73,32 +123,146 @@ class ConversationIndex:
         self.index = None
         self.metadata = []
         self.cache = {}
+        self.manifest = {}
+        self._known = set()
+        self._rebuild_columns()
         print("📝 Created new conversation index")
     
+    def _convert_to_cosine(self):
+        """Rebuild an index saved by older versions (raw vectors, L2 distance)"""
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        faiss.normalize_L2(vectors)
+        self.index = faiss.IndexFlatIP(vectors.shape[1])
+        self.index.add(vectors)
+        print("🔁 Converted conversation index to cosine similarity")
+        self._save_index()
+    
+    def _rebuild_columns(self):
+        self._session_codes = {}
+        self._session_column = np.zeros(0, dtype=np.int32)
+        self._timestamp_column = np.zeros(0, dtype=np.float64)
+        self._append_columns(self.metadata)
+    
+    def _append_columns(self, conversations: List[Dict]):
+        codes = [self._session_codes.setdefault(conv['session_id'], len(self._session_codes)) for conv in conversations]
+        self._session_column = np.concatenate([self._session_column, np.array(codes, dtype=np.int32)])
+        self._timestamp_column = np.concatenate([
+            self._timestamp_column,
+            np.array([float(conv.get('timestamp') or 0) for conv in conversations], dtype=np.float64),
+        ])
+    
     def _get_embedding(self, text: str) -> np.ndarray:
         """Get embedding vector for text"""
         try:
-            response = requests.post(
-                self.embed_url,
-                json={"model": self.embed_model, "prompt": text},
-                timeout=10
-            )
-            response.raise_for_status()
-            embedding = response.json()["embedding"]
+            with tracer.span("embed", chars=len(text)):
+                # Replayed runs only reuse vectors of the exact same text (a miss falls back to zeros below)
+                embedding = cassette.call_sync(
+                    "embed", "embed", {"model": self.embed_model, "text": text},
+                    lambda: self._request_embedding(text),
+                    fallback=False,
+                )
             return np.array(embedding, dtype=np.float32)
         except Exception as e:
             print(f"⚠️ Embedding error: {e}")
             # Return zero vector as fallback
             return np.zeros(768, dtype=np.float32)
     
+    def _request_embedding(self, text: str) -> List[float]:
+        response = requests.post(
+            self.embed_url,
+            json={"model": self.embed_model, "prompt": text},
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]
+    
     def _file_hash(self, filepath: Path) -> str:
         """Calculate hash of file for change detection"""
         try:
             with open(filepath, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
         except:
             return ""
     
+    def _fingerprint(self, filepath: Path, file_hash: Optional[str] = None) -> Dict:
+        """Cache entry for a file: stat signature plus content hash"""
+        stat = filepath.stat()
+        return {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': file_hash if file_hash is not None else self._file_hash(filepath),
+        }
+    
+    def _is_unchanged(self, filepath: Path) -> bool:
+        """
+        Whether a file is unchanged since it was indexed. Matching size and
+        mtime_ns decide without reading the file; only when the stat differs is
+        the content hashed (a touched but identical file keeps its entry).
+        """
+        entry = self.cache.get(str(filepath))
+        if entry is None:
+            return False
+        try:
+            stat = filepath.stat()
+        except OSError:
+            return False
+        if isinstance(entry, dict):
+            if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return True
+            file_hash = self._file_hash(filepath)
+            unchanged = file_hash == entry['hash']
+        else:
+            # Entry written by an older version: a bare md5 of the content
+            with open(filepath, 'rb') as f:
+                unchanged = hashlib.md5(f.read()).hexdigest() == entry
+            file_hash = None
+        if unchanged:
+            self.cache[str(filepath)] = self._fingerprint(filepath, file_hash)
+            self._cache_dirty = True
+        return unchanged
+    
+    def _changed_session_files(self, force: bool = False) -> Tuple[List[Path], Dict]:
+        """
+        Session files in directories whose mtime changed since the last scan,
+        plus the updated manifest (committed by the caller once indexed).
+        Unchanged directories are not listed again: their children come from the
+        manifest, so a scan costs one stat per directory plus a listing per
+        directory that gained, lost or replaced an entry (MemoryManager writes
+        snapshots via rename, which bumps the directory mtime).
+        """
+        manifest = {}
+        changed = []
+        unchanged_dirs = 0
+        root = str(self.memory_dir)
+        stack = [root]
+        while stack:  # plain str paths: this loop runs once per directory of history
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            entry = self.manifest.get(directory)
+            if not force and isinstance(entry, list) and entry[0] == mtime_ns:
+                unchanged_dirs += 1
+            else:
+                dirs, files = [], []
+                with os.scandir(directory) as it:
+                    for e in it:
+                        if e.is_dir():
+                            if not (directory == root and e.name == "blobs"):
+                                dirs.append(e.name)
+                        elif e.name.startswith("session-") and e.name.endswith(".json"):
+                            files.append(e.name)
+                entry = [mtime_ns, dirs, files]
+                changed.extend(Path(directory, name) for name in files)
+            manifest[directory] = entry
+            for name in entry[1]:
+                stack.append(os.path.join(directory, name))
+
+        if unchanged_dirs:
+            print(f"📂 {unchanged_dirs} unchanged directories skipped")
+        return changed, manifest
+
     def index_all_conversations(self, force: bool = False):
         """
         Index all conversations from memory directory
@@ -114,68 +278,167 @@ class ConversationIndex:
         
         indexed_count = 0
         skipped_count = 0
+        self._cache_dirty = False
         
-        # Find all session JSON files
-        session_files = list(self.memory_dir.rglob("session-*.json"))
+        # Session JSON files in directories changed since the last scan
+        session_files, manifest = self._changed_session_files(force=force)
         
         for session_file in session_files:
-            file_hash = self._file_hash(session_file)
-            
             # Skip if already indexed and unchanged
-            if not force and str(session_file) in self.cache:
-                if self.cache[str(session_file)] == file_hash:
-                    skipped_count += 1
-                    continue
+            if not force and self._is_unchanged(session_file):
+                skipped_count += 1
+                continue
             
-            # Index this session
-            if self._index_session_file(session_file):
-                self.cache[str(session_file)] = file_hash
+            # Index this session (conversations already added live are skipped)
+            added = self._index_session_file(session_file)
+            if added is not None:
+                self.cache[str(session_file)] = self._fingerprint(session_file)
+                self._cache_dirty = True
+            if added:
                 indexed_count += 1
         
         # Save index
+        manifest_changed = manifest != self.manifest
+        self.manifest = manifest
         if indexed_count > 0:
             self._save_index()
             print(f"✅ Indexed {indexed_count} conversations, skipped {skipped_count}")
         else:
+            if self._cache_dirty:
+                self._save_cache()
+            if manifest_changed:
+                self._save_manifest()
             print(f"ℹ️ No new conversations to index (skipped {skipped_count})")
     
-    def _index_session_file(self, filepath: Path) -> bool:
-        """Index a single session file"""
+    def _index_session_file(self, filepath: Path) -> Optional[int]:
+        """Index a single session file; returns conversations added, None on error"""
         try:
             with open(filepath, 'r') as f:
                 session_data = json.load(f)
             
             # Extract relevant conversations
-            conversations = self._extract_conversations(session_data, filepath)
+            conversations = self._extract_conversations(session_data, filepath.stem)
+            return self._add_conversations(conversations)
             
-            if not conversations:
-                return False
+        except Exception as e:
+            print(f"⚠️ Error indexing {filepath}: {e}")
+            return None
+    
+    @staticmethod
+    def _conversation_key(conv: Dict) -> Tuple:
+        return (conv['session_id'], conv['timestamp'], conv['query'])
+    
+    @staticmethod
+    def session_key(session_id: str) -> str:
+        """A MemoryManager session id as stored in metadata: its session file's stem"""
+        return Path(f"session-{session_id}.json").stem
+    
+    def _add_conversations(self, conversations: List[Dict]) -> int:
+        """Embed and append conversations not yet in the index"""
+        new = [conv for conv in conversations if self._conversation_key(conv) not in self._known]
+        
+        # Generate embeddings (outside the lock: searches keep running)
+        embeddings = [self._get_embedding(conv['text']) for conv in new]
+        
+        with self._lock:
+            rows = []
+            for conv, embedding in zip(new, embeddings):
+                key = self._conversation_key(conv)
+                if key not in self._known:
+                    self._known.add(key)
+                    rows.append((conv, embedding))
+            if not rows:
+                return 0
             
-            # Generate embeddings and add to index
-            for conv in conversations:
-                embedding = self._get_embedding(conv['text'])
-                
-                # Initialize index if needed
-                if self.index is None:
-                    dim = len(embedding)
-                    self.index = faiss.IndexFlatL2(dim)
-                
-                # Add to index
-                self.index.add(embedding.reshape(1, -1))
-                self.metadata.append(conv)
+            vectors = np.stack([embedding for _, embedding in rows]).astype(np.float32)
+            faiss.normalize_L2(vectors)  # zero (failed) embeddings stay zero
             
-            return True
+            # Initialize index if needed
+            if self.index is None:
+                self.index = faiss.IndexFlatIP(vectors.shape[1])
             
-        except Exception as e:
-            print(f"⚠️ Error indexing {filepath}: {e}")
-            return False
+            # Add to index
+            self.index.add(vectors)
+            conversations = [conv for conv, _ in rows]
+            self.metadata.extend(conversations)
+            self._append_columns(conversations)
+            
+            if self.max_entries and len(self.metadata) > self.max_entries:
+                self._evict()
+        
+        return len(rows)
+    
+    # === Capacity policy ===
+    EVICT_TO = 0.9  # evict down to this fraction of max_entries, so eviction runs once per batch
+    
+    def _decay(self, timestamps: np.ndarray, now: float) -> np.ndarray:
+        """0.5 ** (age / half-life): 1 for new conversations, 1/2 after half_life_days"""
+        if not self.half_life_days:
+            return np.ones(len(timestamps))
+        age_days = np.maximum(now - timestamps, 0) / 86400
+        return np.power(0.5, age_days / self.half_life_days)
+    
+    def _evict(self):
+        """Drop the conversations least worth keeping and compact the index (caller holds the lock)"""
+        keep_count = int(self.max_entries * self.EVICT_TO)
+        used = np.maximum(
+            self._timestamp_column,
+            np.array([float(conv.get('last_used') or 0) for conv in self.metadata]),
+        )
+        hits = np.array([conv.get('hits', 0) for conv in self.metadata], dtype=np.float64)
+        # Recently added or recently returned, weighted by how often search returned them
+        retention = self._decay(used, time.time()) * (1 + hits)
+        order = np.lexsort((used, retention))  # ascending: least worth keeping first
+        evicted = np.sort(order[:len(self.metadata) - keep_count])
+        
+        self.index.remove_ids(faiss.IDSelectorBatch(evicted.astype(np.int64)))  # flat index: later ids shift down
+        evicted_set = set(evicted.tolist())
+        for i in evicted_set:
+            self._known.discard(self._conversation_key(self.metadata[i]))
+        self.metadata = [conv for i, conv in enumerate(self.metadata) if i not in evicted_set]
+        self._rebuild_columns()
+        print(f"🧹 Evicted {len(evicted)} old conversation(s), {len(self.metadata)} kept")
+    
+    def index_session_items(self, items: List[Dict], session_id: str) -> int:
+        """Incrementally index the finished conversations of a live session"""
+        added = self._add_conversations(self._extract_conversations(items, self.session_key(session_id)))
+        if added:
+            self._save_index()
+            print(f"✅ Indexed {added} new conversation(s) from the current session")
+        return added
+    
+    # === Background indexing ===
+    def _submit(self, fn, *args) -> Future:
+        """Run on the single indexing worker (scan and incremental updates stay ordered)"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-index")
+            return self._executor.submit(fn, *args)
     
-    def _extract_conversations(self, session_data: List[Dict], filepath: Path) -> List[Dict]:
+    def start_background_scan(self, force: bool = False) -> Future:
+        """index_all_conversations off the caller's critical path"""
+        return self._submit(self.index_all_conversations, force)
+    
+    def index_session_in_background(self, memory) -> Future:
+        """Index a MemoryManager's finished conversations after an AgentLoop run"""
+        def run():
+            # resolve() loads spilled payloads (and waits for the memory writer if needed)
+            items = [memory.resolve(item).model_dump() for item in list(memory.get_session_items())]
+            return self.index_session_items(items, memory.session_id)
+        return self._submit(run)
+    
+    def wait(self):
+        """Block until queued background indexing has finished"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+    
+    def _extract_conversations(self, session_data: List[Dict], session_id: str) -> List[Dict]:
         """Extract meaningful conversations from session data"""
         conversations = []
         
-        # Extract session ID from filepath
-        session_id = filepath.stem  # e.g., "session-2025-01-15-1736950000-abc123"
+        # session_id is the session file's stem, e.g. "session-1736950000-abc123"
         
         # Group by user query and final answer
         current_query = None
@@ -192,7 +455,7 @@ class ConversationIndex:
             
             # Track final answers
             if item_type == 'tool_output':
-                tool_result = item.get('tool_result', {})
+                tool_result = load_payloads(item, str(self.memory_dir)).get('tool_result') or {}
                 result_text = tool_result.get('result', '')
                 
                 if 'FINAL_ANSWER:' in result_text:
@@ -221,58 +484,128 @@ class ConversationIndex:
     def _save_index(self):
         """Save index, metadata, and cache to disk"""
         try:
-            if self.index is not None:
-                faiss.write_index(self.index, str(self.index_file))
+            with self._lock:
+                if self.index is not None:
+                    faiss.write_index(self.index, str(self.index_file))
+                metadata = json.dumps(self.metadata, indent=2)
             
             with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+                f.write(metadata)
             
-            with open(self.cache_file, 'w') as f:
-                json.dump(self.cache, f, indent=2)
+            self._save_cache()
+            self._save_manifest()
             
             print(f"💾 Saved conversation index ({len(self.metadata)} entries)")
         except Exception as e:
             print(f"⚠️ Error saving index: {e}")
     
-    def search(self, query: str, exclude_session: Optional[str] = None) -> List[Dict]:
+    def _save_cache(self):
+        """Save the file change-detection cache"""
+        try:
+            with open(self.cache_file, 'w') as f:
+                f.write(json.dumps(self.cache, indent=2))
+        except Exception as e:
+            print(f"⚠️ Error saving index cache: {e}")
+    
+    def _save_manifest(self):
+        """Save the directory manifest (separately: it changes even when nothing is indexed)"""
+        try:
+            with open(self.manifest_file, 'w') as f:
+                f.write(json.dumps(self.manifest, separators=(',', ':')))
+        except Exception as e:
+            print(f"⚠️ Error saving directory manifest: {e}")
+    
+    def _allowed(
+        self,
+        exclude_session: Optional[str],
+        since: Optional[float],
+        until: Optional[float],
+    ) -> Optional[np.ndarray]:
+        """Mask of searchable rows, or None when nothing is filtered out"""
+        mask = None
+        if exclude_session:
+            # Accept either form of the current session id
+            codes = [self._session_codes[key] for key in {exclude_session, self.session_key(exclude_session)}
+                     if key in self._session_codes]
+            if codes:
+                mask = ~np.isin(self._session_column, codes)
+        if since is not None:
+            mask = (self._timestamp_column >= since) if mask is None else mask & (self._timestamp_column >= since)
+        if until is not None:
+            mask = (self._timestamp_column < until) if mask is None else mask & (self._timestamp_column < until)
+        return mask
+    
+    def search(
+        self,
+        query: str,
+        exclude_session: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        min_similarity: Optional[float] = None,
+    ) -> List[Dict]:
         """
         Search for relevant past conversations
         
         Args:
             query: Current user query
             exclude_session: Session ID to exclude (current session)
+            since, until: Only conversations with since <= timestamp < until
+            min_similarity: Cosine similarity cut-off (defaults to self.min_similarity)
         
         Returns:
-            List of relevant past conversations
+            Up to top_k relevant past conversations, best first
         """
         if self.index is None or len(self.metadata) == 0:
             return []
+        if min_similarity is None:
+            min_similarity = self.min_similarity
         
         try:
             # Get query embedding
-            query_embedding = self._get_embedding(query)
+            query_vector = self._get_embedding(query).reshape(1, -1).astype(np.float32)
+            faiss.normalize_L2(query_vector)
             
-            # Search index
-            distances, indices = self.index.search(
-                query_embedding.reshape(1, -1),
-                min(self.top_k * 2, len(self.metadata))  # Get more to filter
-            )
-            
-            # Collect results
-            results = []
-            for idx, distance in zip(indices[0], distances[0]):
-                if idx < len(self.metadata):
-                    conv = self.metadata[idx].copy()
-                    conv['similarity_score'] = float(distance)
-                    
-                    # Exclude current session
-                    if exclude_session and conv['session_id'] == exclude_session:
-                        continue
+            # Search index (the background indexer may be appending)
+            with self._lock:
+                mask = self._allowed(exclude_session, since, until)
+                params = None
+                if mask is not None:
+                    allowed = int(mask.sum())
+                    if allowed == 0:
+                        return []
+                    bitmap = np.packbits(mask, bitorder='little')  # must outlive the search call
+                    params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)))
+                else:
+                    allowed = self.index.ntotal
+                
+                now = time.time()
+                k = min(self.top_k * (2 if self.recency_weight else 1), allowed)
+                while True:
+                    with tracer.span("faiss.search", k=k, rows=self.index.ntotal):
+                        scores, indices = self.index.search(query_vector, k, params=params)
+                    found = indices[0] >= 0
+                    scores, indices = scores[0][found], indices[0][found]
+                    relevant = scores >= min_similarity
+                    scores, indices = scores[relevant], indices[relevant]
                     
-                    results.append(conv)
+                    # Age-weighted score: similarity * ((1 - w) + w * decay), never above the similarity
+                    weights = (1 - self.recency_weight) + self.recency_weight * self._decay(self._timestamp_column[indices], now)
+                    ranked = scores * weights
                     
-                    if len(results) >= self.top_k:
+                    # Done once nothing unfetched (similarity <= the last fetched) could outrank the top_k
+                    if k >= allowed or not relevant.all() or not self.recency_weight:
+                        break
+                    if len(ranked) >= self.top_k and np.sort(ranked)[-self.top_k] >= scores[-1]:
                         break
+                    k = min(k * 2, allowed)
+                
+                # Materialise only the returned rows; count the hit for the capacity policy
+                results = []
+                for i in np.argsort(-ranked, kind='stable')[:self.top_k]:
+                    conv = self.metadata[indices[i]]
+                    conv['hits'] = conv.get('hits', 0) + 1
+                    conv['last_used'] = now
+                    results.append({**conv, 'similarity_score': float(scores[i]), 'score': float(ranked[i])})
             
             return results
             
@@ -300,6 +633,7 @@ class ConversationIndex:
         return {
             'total_conversations': len(self.metadata),
             'index_size': self.index.ntotal if self.index else 0,
+            'max_entries': self.max_entries,
             'cached_files': len(self.cache),
             'index_file_exists': self.index_file.exists(),
             'metadata_file_exists': self.metadata_file.exists(),
@@ -307,20 +641,31 @@ class ConversationIndex:
 
 
 # Convenience functions
-def initialize_conversation_index(auto_index: bool = True) -> ConversationIndex:
+def initialize_conversation_index(
+    auto_index: bool = True,
+    background: bool = False,
+    memory_dir: str = "memory",
+    index_dir: str = "conversation_index",
+) -> ConversationIndex:
     """
     Initialize conversation index
     
     Args:
         auto_index: If True, automatically index all conversations on startup
+        background: Run that scan on the indexing worker instead of blocking
+        memory_dir: Session memory to index
+        index_dir: Where the FAISS index and its metadata are kept
     
     Returns:
         ConversationIndex instance
     """
-    index = ConversationIndex()
+    index = ConversationIndex(memory_dir=memory_dir, index_dir=index_dir)
     
     if auto_index:
-        index.index_all_conversations()
+        if background:
+            index.start_background_scan()
+        else:
+            index.index_all_conversations()
     
     return index
 
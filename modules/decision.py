@@ -1,8 +1,12 @@
+import atexit
 from typing import List, Optional
 from modules.perception import PerceptionResult
 from modules.memory import MemoryItem
 from modules.model_manager import ModelManager
-from modules.tools import load_prompt
+from modules.plan_cache import PlanCache
+from modules.prompt_builder import PromptBuilder
+from modules.metrics import registry
+from modules.tracing import tracer
 import re
 
 # Optional logging fallback
@@ -15,6 +19,14 @@ except ImportError:
         print(f"[{now}] [{stage}] {msg}")
 
 model = ModelManager()
+plan_cache = PlanCache()
+atexit.register(plan_cache.flush)  # lookups keep hit counts in memory
+registry.callback(
+    "plan_cache_lookups_total", "Plan cache lookups by result",
+    lambda: {(("result", "hit"),): plan_cache.hits, (("result", "miss"),): plan_cache.misses},
+    type="counter",
+)
+prompt_builder = PromptBuilder()
 
 
 # prompt_path = "prompts/decision_prompt.txt"
@@ -28,43 +40,52 @@ async def generate_plan(
     step_num: int = 1,
     max_steps: int = 3,
     past_context: Optional[str] = None,
+    temperature: Optional[float] = None,
+    use_plan_cache: bool = True,
 ) -> str:
 
     """Generates the full solve() function plan for the agent."""
 
-    memory_texts = "\n".join(f"- {m.text}" for m in memory_items) or "None"
+    # A structurally identical query already has a working plan — skip the LLM
+    if use_plan_cache:
+        cached = plan_cache.lookup(user_input)
+        if cached:
+            log("plan", "♻️ Reusing cached plan for query template")
+            return cached
 
-    prompt_template = load_prompt(prompt_path)
-    
-    # Add past context if available
-    if past_context:
-        user_input_with_context = f"{past_context}\n\n🎯 Current Query:\n{user_input}"
-    else:
-        user_input_with_context = user_input
-
-    prompt = prompt_template.format(
+    # Template + tools + current input + ranked past context, within the token budget
+    prompt, report = prompt_builder.build(
+        prompt_path=prompt_path,
+        user_input=user_input,
         tool_descriptions=tool_descriptions,
-        user_input=user_input_with_context
+        past_context=past_context,
     )
+    log("plan", (
+        f"📏 Prompt ~{report['tokens']} tokens (template {report['template_tokens']}, "
+        f"tools {report['tool_tokens']}, input {report['input_tokens']}"
+        f"{' truncated' if report['input_truncated'] else ''}, past context {report['context_tokens']}"
+        f"{', ' + str(report['context_dropped']) + ' dropped' if report['context_dropped'] else ''})"
+    ))
 
 
-    try:
-        raw = (await model.generate_text(prompt)).strip()
-        log("plan", f"LLM output: {raw}")
+    with tracer.span("plan", prompt_tokens=report["tokens"]):
+        try:
+            raw = (await model.generate_text(prompt, temperature=temperature, site="plan")).strip()
+            log("plan", f"LLM output: {raw}")
 
-        # If fenced in ```python ... ```, extract
-        if raw.startswith("```"):
-            raw = raw.strip("`").strip()
-            if raw.lower().startswith("python"):
-                raw = raw[len("python"):].strip()
+            # If fenced in ```python ... ```, extract
+            if raw.startswith("```"):
+                raw = raw.strip("`").strip()
+                if raw.lower().startswith("python"):
+                    raw = raw[len("python"):].strip()
 
-        if re.search(r"^\s*(async\s+)?def\s+solve\s*\(", raw, re.MULTILINE):
-            return raw  # ✅ Correct, it's a full function
-        else:
-            log("plan", "⚠️ LLM did not return a valid solve(). Defaulting to FINAL_ANSWER")
-            return "FINAL_ANSWER: [Could not generate valid solve()]"
+            if re.search(r"^\s*(async\s+)?def\s+solve\s*\(", raw, re.MULTILINE):
+                return raw  # ✅ Correct, it's a full function
+            else:
+                log("plan", "⚠️ LLM did not return a valid solve(). Defaulting to FINAL_ANSWER")
+                return "FINAL_ANSWER: [Could not generate valid solve()]"
 
 
-    except Exception as e:
-        log("plan", f"⚠️ Planning failed: {e}")
-        return "FINAL_ANSWER: [unknown]"
+        except Exception as e:
+            log("plan", f"⚠️ Planning failed: {e}")
+            return "FINAL_ANSWER: [unknown]"
@@ -0,0 +1,201 @@
+# modules/fast_path.py
+
+"""
+Deterministic fast path for simple math queries.
+Recognises direct requests for the math tools in mcp_server_1.py (and the
+ASCII → exponential-sum chain) and runs them in-process, skipping the
+perception LLM, the planning LLM, the sandbox and the MCP subprocess spawn.
+"""
+
+import importlib
+import re
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp.server.fastmcp import FastMCP
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+TOOLS_MODULE = "mcp_server_1"
+PREVIOUS_RESULT = "$previous"  # placeholder argument: output of the previous step
+
+# Guard rails: anything bigger goes to the normal agent path
+MAX_FACTORIAL = 5000
+MAX_EXPONENT = 1000
+MAX_FIBONACCI = 10000
+
+NUM = r"(-?\d+)"
+PREFIX = r"^\s*(?:please\s+)?(?:(?:what\s+is|what's|compute|calculate|find|evaluate|get|give\s+me)\s+)?(?:the\s+)?"
+SUFFIX = r"\s*[?.!]*\s*$"
+
+
+@dataclass
+class RoutedQuery:
+    """A query the router can answer without the LLM"""
+    intent: str
+    steps: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)  # (tool_name, arguments)
+
+
+def _binary(tool: str, swap: bool = False) -> Callable[[re.Match], Optional[RoutedQuery]]:
+    def build(m: re.Match) -> RoutedQuery:
+        a, b = int(m.group(1)), int(m.group(2))
+        if swap:
+            a, b = b, a
+        return RoutedQuery(intent=tool, steps=[(tool, {"a": a, "b": b})])
+    return build
+
+
+def _unary(tool: str) -> Callable[[re.Match], Optional[RoutedQuery]]:
+    def build(m: re.Match) -> RoutedQuery:
+        return RoutedQuery(intent=tool, steps=[(tool, {"a": int(m.group(1))})])
+    return build
+
+
+def _power(m: re.Match) -> Optional[RoutedQuery]:
+    a, b = int(m.group(1)), int(m.group(2))
+    if not 0 <= b <= MAX_EXPONENT:
+        return None
+    return RoutedQuery(intent="power", steps=[("power", {"a": a, "b": b})])
+
+
+def _factorial(m: re.Match) -> Optional[RoutedQuery]:
+    a = int(m.group(1))
+    if not 0 <= a <= MAX_FACTORIAL:
+        return None
+    return RoutedQuery(intent="factorial", steps=[("factorial", {"a": a})])
+
+
+def _trig(m: re.Match) -> RoutedQuery:
+    name = {"sine": "sin", "cosine": "cos", "tangent": "tan"}.get(m.group(1).lower(), m.group(1).lower())
+    return RoutedQuery(intent=name, steps=[(name, {"a": int(m.group(2))})])
+
+
+def _fibonacci(m: re.Match) -> Optional[RoutedQuery]:
+    n = int(m.group(1))
+    if not 1 <= n <= MAX_FIBONACCI:
+        return None
+    return RoutedQuery(intent="fibonacci_numbers", steps=[("fibonacci_numbers", {"n": n})])
+
+
+def _ascii(m: re.Match) -> RoutedQuery:
+    return RoutedQuery(intent="strings_to_chars_to_int", steps=[("strings_to_chars_to_int", {"string": m.group(1)})])
+
+
+def _ascii_exp_sum(m: re.Match) -> RoutedQuery:
+    return RoutedQuery(
+        intent="ascii_exponential_sum",
+        steps=[
+            ("strings_to_chars_to_int", {"string": m.group(1)}),
+            ("int_list_to_exponential_sum", {"numbers": PREVIOUS_RESULT}),
+        ],
+    )
+
+
+ASCII_TARGET = r"ascii\s+values?\s+of\s+(?:the\s+)?(?:characters?\s+(?:in|of)\s+)?(?:the\s+)?(?:string\s+|word\s+)?[\"']?([A-Za-z0-9]+)[\"']?"
+EXP_SUM = r"(?:\s*,)?\s+(?:and\s+)?(?:then\s+)?(?:return\s+)?(?:the\s+)?sum\s+of\s+(?:the\s+)?exponentials?(?:\s+of\s+(?:those|these|the|them|its)(?:\s+values)?)?"
+
+# Ordered: the first full match wins, so chains come before their first step
+RULES: List[Tuple[str, Callable[[re.Match], Optional[RoutedQuery]]]] = [
+    (ASCII_TARGET + EXP_SUM, _ascii_exp_sum),
+    (ASCII_TARGET, _ascii),
+    (rf"add\s+{NUM}\s+(?:and|to|with)\s+{NUM}", _binary("add")),
+    (rf"sum\s+of\s+{NUM}\s+and\s+{NUM}", _binary("add")),
+    (rf"{NUM}\s*(?:\+|plus)\s*{NUM}", _binary("add")),
+    (rf"subtract\s+{NUM}\s+from\s+{NUM}", _binary("subtract", swap=True)),
+    (rf"difference\s+between\s+{NUM}\s+and\s+{NUM}", _binary("subtract")),
+    (rf"{NUM}\s*(?:-|minus)\s*{NUM}", _binary("subtract")),
+    (rf"multiply\s+{NUM}\s+(?:and|by|with)\s+{NUM}", _binary("multiply")),
+    (rf"product\s+of\s+{NUM}\s+and\s+{NUM}", _binary("multiply")),
+    (rf"{NUM}\s*(?:\*|x|×|times)\s*{NUM}", _binary("multiply")),
+    (rf"divide\s+{NUM}\s+by\s+{NUM}", _binary("divide")),
+    (rf"{NUM}\s*(?:/|divided\s+by)\s*{NUM}", _binary("divide")),
+    (rf"remainder\s+(?:of|when)\s+{NUM}\s+(?:is\s+)?(?:divided\s+by|/|by)\s+{NUM}", _binary("remainder")),
+    (rf"{NUM}\s*(?:%|mod|modulo)\s*{NUM}", _binary("remainder")),
+    (rf"{NUM}\s*(?:\^|\*\*)\s*{NUM}", _power),
+    (rf"{NUM}\s+(?:raised\s+)?to\s+the\s+power\s+(?:of\s+)?{NUM}", _power),
+    (rf"factorial\s+(?:of\s+)?{NUM}", _factorial),
+    (rf"{NUM}\s*!", _factorial),
+    (rf"(?:cube\s+root\s+(?:of\s+)?|cbrt\s*\(?\s*){NUM}\s*\)?", _unary("cbrt")),
+    (rf"(sin|sine|cos|cosine|tan|tangent)\s*(?:of\s+)?\(?\s*{NUM}\s*\)?", _trig),
+    (rf"(?:first\s+)?{NUM}\s+fibonacci(?:\s+numbers)?", _fibonacci),
+    (rf"fibonacci(?:\s+numbers)?\s+(?:up\s+to\s+|for\s+|of\s+)?(?:n\s*=\s*)?{NUM}", _fibonacci),
+]
+
+
+class FastPathRouter:
+    """Matches simple math queries and executes the tool chain in-process"""
+
+    def __init__(self, tools_module: str = TOOLS_MODULE):
+        self.tools_module = tools_module
+        self.rules = [(re.compile(PREFIX + pattern + SUFFIX, re.IGNORECASE), build) for pattern, build in RULES]
+        self._tools: Dict[str, Tuple[Callable, type]] = {}
+
+    def match(self, query: str) -> Optional[RoutedQuery]:
+        """Return the routed tool chain for query, or None if it needs the agent"""
+        for pattern, build in self.rules:
+            m = pattern.match(query)
+            if m:
+                return build(m)
+        return None
+
+    def _load_tool(self, tool_name: str) -> Tuple[Callable, type]:
+        """Resolve the tool function and its input model (imported lazily, once)"""
+        if tool_name not in self._tools:
+            module = importlib.import_module(self.tools_module)
+            for value in vars(module).values():
+                if isinstance(value, FastMCP):
+                    value.in_process = True  # local calls: no MCP server state file (metrics.instrument_server)
+            fn = getattr(module, tool_name)
+            input_model = typing.get_type_hints(fn)["input"]
+            self._tools[tool_name] = (fn, input_model)
+        return self._tools[tool_name]
+
+    def execute(self, routed: RoutedQuery) -> Any:
+        """Run each step in order, feeding the previous result where requested"""
+        previous = None
+        for tool_name, arguments in routed.steps:
+            fn, input_model = self._load_tool(tool_name)
+            args = {k: (previous if v == PREVIOUS_RESULT else v) for k, v in arguments.items()}
+            previous = fn(input_model(**args)).result
+        return previous
+
+    def run(self, routed: RoutedQuery) -> Optional[str]:
+        """
+        FINAL_ANSWER string for a routed query, or None when the in-process call
+        fails (the caller then uses the normal agent path).
+        """
+        try:
+            result = self.execute(routed)
+        except Exception as e:
+            log("fast_path", f"⚠️ Routed call failed, falling back to agent: {e}")
+            return None
+
+        log("fast_path", f"⚡ Answered via {' → '.join(tool for tool, _ in routed.steps)}")
+        return f"FINAL_ANSWER: {result}"
+
+    def answer(self, query: str) -> Optional[str]:
+        """FINAL_ANSWER for query, or None if it is not routable or the call fails"""
+        routed = self.match(query)
+        return self.run(routed) if routed else None
+
+
+# Shared instance so tool lookups are cached across queries
+router = FastPathRouter()
+
+
+def match_fast_path(query: str) -> Optional[RoutedQuery]:
+    """Convenience wrapper around the shared router's matcher"""
+    return router.match(query)
+
+
+def try_fast_path(query: str) -> Optional[str]:
+    """Convenience wrapper: FINAL_ANSWER for routable queries, else None"""
+    return router.answer(query)
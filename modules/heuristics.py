@@ -1,9 +1,12 @@
 # modules/heuristics.py
 
 import re
-from typing import Tuple, Optional
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Optional
 from dataclasses import dataclass
 
+PROFILE_YAML = Path(__file__).parent.parent / "config" / "profiles.yaml"
+
 @dataclass
 class ValidationResult:
     """Result of validation check"""
@@ -13,6 +16,171 @@ class ValidationResult:
     severity: str = "info"  # info, warning, error
 
 
+class HeuristicsEngine:
+    """
+    Pattern sets compiled once into combined alternations so each check is a
+    single scan: every sensitive pattern and banned word is redacted in one
+    pass, and injection / leakage detection is one search per text.
+
+    Injection and leakage patterns are matched against the lower-cased text
+    (as before) rather than with re.IGNORECASE, which disables the literal
+    prefix scan and is several times slower on large inputs.
+    """
+
+    WHITESPACE = re.compile(r'\s+')
+    REPEATED_PUNCTUATION = re.compile(r'([!?.]){3,}')
+    KEYWORDS = re.compile(r'\b\w{4,}\b')
+    DOUBLE_SPACES = re.compile(r' {2,}')
+    HTML_TAGS = re.compile(r'<[^>]+>')
+    SENTENCE_END = re.compile(r'[.!?]')
+
+    def __init__(
+        self,
+        banned_words: Iterable[str],
+        injection_patterns: Iterable[str],
+        sensitive_patterns: Dict[str, str],
+        leakage_patterns: Iterable[str],
+        hallucination_patterns: Dict[str, str],
+    ):
+        # Sensitive data first so it wins over a banned word at the same position;
+        # banned words are matched case-insensitively as whole words
+        self._redaction_groups: List[Tuple[str, str]] = []
+        alternatives = []
+        for i, (data_type, pattern) in enumerate(sensitive_patterns.items()):
+            group = f"s{i}"
+            self._redaction_groups.append((group, data_type))
+            alternatives.append((group, pattern))
+        words = sorted({w.lower() for w in banned_words if w}, key=len, reverse=True)
+        self._has_banned = bool(words)
+        if words:
+            alternatives.append(("banned", r"\b(?i:" + "|".join(map(re.escape, words)) + r")\b"))
+        self.redaction_re = self._alternation(alternatives) if alternatives else None
+        self._redaction_order = [data_type for _, data_type in self._redaction_groups] + ["profanity"]
+
+        self.injection_re, self.injection_re_ci = self._combine(injection_patterns)
+        self.leakage_re, self.leakage_re_ci = self._combine(leakage_patterns)
+        self.hallucination_res = {name: re.compile(p, re.IGNORECASE) for name, p in hallucination_patterns.items()}
+
+    @staticmethod
+    def _alternation(named: List[Tuple[str, str]]) -> re.Pattern:
+        """Named-group alternation; a leading \\b shared by every branch is factored out"""
+        if all(p.startswith(r"\b") for _, p in named):
+            return re.compile(r"\b(?:" + "|".join(f"(?P<{g}>{p[2:]})" for g, p in named) + ")")
+        return re.compile("|".join(f"(?P<{g}>{p})" for g, p in named))
+
+    @staticmethod
+    def _combine(patterns: Iterable[str]) -> Tuple[Optional[re.Pattern], Optional[re.Pattern]]:
+        """(for lower-cased text, case-insensitive fallback)"""
+        patterns = list(patterns)
+        if not patterns:
+            return None, None
+        combined = "|".join(f"(?:{p})" for p in patterns)
+        return re.compile(combined), re.compile(combined, re.IGNORECASE)
+
+    @staticmethod
+    def _lowered(text: str) -> Optional[str]:
+        """Lower-cased text, or None when lowering would shift character offsets"""
+        lowered = text.lower()
+        return lowered if len(lowered) == len(text) else None
+
+    def redact(self, text: str) -> Tuple[str, List[str]]:
+        """Replace all sensitive data and banned words in one pass; returns (text, redaction types)"""
+        if self.redaction_re is None:
+            return text, []
+        found = set()
+
+        def replace(m: re.Match) -> str:
+            if self._has_banned and m.group("banned") is not None:
+                found.add("profanity")
+                return "[REDACTED]"
+            for group, data_type in self._redaction_groups:
+                if m.group(group) is not None:
+                    found.add(data_type)
+                    return f"[REDACTED_{data_type.upper()}]"
+            return m.group(0)
+
+        cleaned = self.redaction_re.sub(replace, text)
+        return cleaned, [t for t in self._redaction_order if t in found]
+
+    def has_injection(self, text: str) -> bool:
+        if self.injection_re is None:
+            return False
+        lowered = self._lowered(text)
+        if lowered is None:
+            return self.injection_re_ci.search(text) is not None
+        return self.injection_re.search(lowered) is not None
+
+    def strip_leakage(self, text: str) -> Tuple[str, bool]:
+        """
+        Remove every sentence containing a leakage pattern; returns (text, found).
+        Only sentences closed by . ! or ? are removed.
+        """
+        if self.leakage_re is None:
+            return text, False
+
+        lowered = self._lowered(text)
+        matches = self.leakage_re.finditer(lowered) if lowered is not None else self.leakage_re_ci.finditer(text)
+
+        spans = []
+        found = False
+        for m in matches:
+            found = True
+            if spans and m.start() < spans[-1][1]:
+                continue  # already inside a removed sentence
+            end = self.SENTENCE_END.search(text, m.end())
+            if end is None:
+                continue
+            start = max(text.rfind(c, 0, m.start()) for c in ".!?") + 1
+            spans.append((start, end.end()))
+
+        if not found:
+            return text, False
+        pieces, last = [], 0
+        for start, end in spans:
+            pieces.append(text[last:start])
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces), True
+
+    def hallucination_indicators(self, text: str) -> List[str]:
+        return [name for name, pattern in self.hallucination_res.items() if pattern.search(text)]
+
+
+_engine: Optional[HeuristicsEngine] = None
+
+
+def _load_heuristics_config() -> Dict:
+    """Optional extra patterns from the `heuristics` section of profiles.yaml"""
+    try:
+        import yaml
+        with open(PROFILE_YAML, "r", encoding="utf-8") as f:
+            return (yaml.safe_load(f) or {}).get("heuristics", {}) or {}
+    except Exception:
+        return {}
+
+
+def get_engine() -> HeuristicsEngine:
+    """Build the compiled engine once from the class patterns plus config extensions"""
+    global _engine
+    if _engine is None:
+        config = _load_heuristics_config()
+        _engine = HeuristicsEngine(
+            banned_words=set(QueryHeuristics.BANNED_WORDS) | set(config.get("banned_words", [])),
+            injection_patterns=QueryHeuristics.INJECTION_PATTERNS + list(config.get("injection_patterns", [])),
+            sensitive_patterns={**QueryHeuristics.SENSITIVE_PATTERNS, **config.get("sensitive_patterns", {})},
+            leakage_patterns=ResponseHeuristics.SYSTEM_LEAKAGE_PATTERNS + list(config.get("system_leakage_patterns", [])),
+            hallucination_patterns={**ResponseHeuristics.HALLUCINATION_PATTERNS, **config.get("hallucination_patterns", {})},
+        )
+    return _engine
+
+
+def reload_engine() -> HeuristicsEngine:
+    """Recompile after the class pattern lists or the config changed"""
+    global _engine
+    _engine = None
+    return get_engine()
+
+
 class QueryHeuristics:
     """Pre-processing heuristics for user queries before sending to LLM"""
     
@@ -85,27 +253,7 @@ class QueryHeuristics:
     @classmethod
     def remove_sensitive_data(cls, text: str) -> ValidationResult:
         """Heuristic 1: Remove or mask sensitive information"""
-        cleaned = text
-        redactions = []
-        
-        for data_type, pattern in cls.SENSITIVE_PATTERNS.items():
-            matches = re.findall(pattern, text)
-            if matches:
-                cleaned = re.sub(pattern, f"[REDACTED_{data_type.upper()}]", cleaned)
-                redactions.append(data_type)
-        
-        # Check for banned words
-        text_lower = text.lower()
-        found_banned = [word for word in cls.BANNED_WORDS if word in text_lower]
-        if found_banned:
-            for word in found_banned:
-                cleaned = re.sub(
-                    rf'\b{re.escape(word)}\b',
-                    "[REDACTED]",
-                    cleaned,
-                    flags=re.IGNORECASE
-                )
-            redactions.append("profanity")
+        cleaned, redactions = get_engine().redact(text)
         
         if redactions:
             return ValidationResult(
@@ -120,16 +268,13 @@ class QueryHeuristics:
     @classmethod
     def detect_prompt_injection(cls, text: str) -> ValidationResult:
         """Heuristic 2: Detect and block prompt injection attempts"""
-        text_lower = text.lower()
-        
-        for pattern in cls.INJECTION_PATTERNS:
-            if re.search(pattern, text_lower):
-                return ValidationResult(
-                    is_valid=False,
-                    cleaned_text="",
-                    reason="Potential prompt injection detected. Please rephrase your query.",
-                    severity="error"
-                )
+        if get_engine().has_injection(text):
+            return ValidationResult(
+                is_valid=False,
+                cleaned_text="",
+                reason="Potential prompt injection detected. Please rephrase your query.",
+                severity="error"
+            )
         
         return ValidationResult(is_valid=True, cleaned_text=text)
     
@@ -137,10 +282,10 @@ class QueryHeuristics:
     def normalize_input(cls, text: str) -> str:
         """Heuristic 3: Trim and normalize input"""
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = HeuristicsEngine.WHITESPACE.sub(' ', text)
         
         # Remove excessive punctuation
-        text = re.sub(r'([!?.]){3,}', r'\1\1', text)
+        text = HeuristicsEngine.REPEATED_PUNCTUATION.sub(r'\1\1', text)
         
         # Remove emojis (optional - keep if needed for sentiment)
         # text = re.sub(r'[^\w\s,.!?-]', '', text)
@@ -258,24 +403,15 @@ class ResponseHeuristics:
     @classmethod
     def check_system_leakage(cls, text: str) -> ValidationResult:
         """Heuristic 7: Block system or secret leakage"""
-        text_lower = text.lower()
-        
-        for pattern in cls.SYSTEM_LEAKAGE_PATTERNS:
-            match = re.search(pattern, text_lower)
-            if match:
-                # Remove the leaking sentence
-                cleaned = re.sub(
-                    r'[^.!?]*' + re.escape(match.group(0)) + r'[^.!?]*[.!?]',
-                    '',
-                    text,
-                    flags=re.IGNORECASE
-                )
-                return ValidationResult(
-                    is_valid=True,
-                    cleaned_text=cleaned.strip(),
-                    reason="Removed system information leakage",
-                    severity="warning"
-                )
+        # Remove the leaking sentences
+        cleaned, found = get_engine().strip_leakage(text)
+        if found:
+            return ValidationResult(
+                is_valid=True,
+                cleaned_text=cleaned.strip(),
+                reason="Removed system information leakage",
+                severity="warning"
+            )
         
         return ValidationResult(is_valid=True, cleaned_text=text)
     
@@ -283,8 +419,8 @@ class ResponseHeuristics:
     def check_relevance(cls, response: str, query: str) -> ValidationResult:
         """Heuristic 8: Basic relevance check using keyword overlap"""
         # Extract keywords from query (simple approach)
-        query_words = set(re.findall(r'\b\w{4,}\b', query.lower()))
-        response_words = set(re.findall(r'\b\w{4,}\b', response.lower()))
+        query_words = set(HeuristicsEngine.KEYWORDS.findall(query.lower()))
+        response_words = set(HeuristicsEngine.KEYWORDS.findall(response.lower()))
         
         if not query_words:
             return ValidationResult(is_valid=True, cleaned_text=response)
@@ -305,11 +441,7 @@ class ResponseHeuristics:
     @classmethod
     def check_hallucination(cls, text: str) -> ValidationResult:
         """Heuristic 9: Basic hallucination guard"""
-        warnings = []
-        
-        for indicator, pattern in cls.HALLUCINATION_PATTERNS.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                warnings.append(indicator)
+        warnings = get_engine().hallucination_indicators(text)
         
         if warnings:
             return ValidationResult(
@@ -325,10 +457,10 @@ class ResponseHeuristics:
     def clean_formatting(cls, text: str) -> str:
         """Heuristic 10: Ensure clean output formatting"""
         # Remove double spaces
-        text = re.sub(r' {2,}', ' ', text)
+        text = HeuristicsEngine.DOUBLE_SPACES.sub(' ', text)
         
         # Remove HTML tags (if any leaked through)
-        text = re.sub(r'<[^>]+>', '', text)
+        text = HeuristicsEngine.HTML_TAGS.sub('', text)
         
         # Fix broken markdown (optional)
         # text = re.sub(r'\*\*\s+', '**', text)
@@ -1,8 +1,11 @@
 from mcp.server.fastmcp import FastMCP, Context
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, date, time, timedelta
+from pathlib import Path
 import yaml
-from memory import MemoryManager  # Import MemoryManager to use its path structure
+from memory import MemoryManager, load_payloads, day_dirs  # Import MemoryManager to use its path structure
+from memory_index import get_memory_index, query_from_item, answer_from_item
+from metrics import instrument_server
 import json
 import os
 import sys
@@ -12,6 +15,34 @@ from pydantic import BaseModel  # Add this import
 # Define input model here
 class SearchInput(BaseModel):
     query: str
+    limit: int = 10
+    offset: int = 0
+    date_from: Optional[str] = None  # YYYY-MM-DD, inclusive
+    date_to: Optional[str] = None    # YYYY-MM-DD, inclusive
+    last_days: Optional[int] = None  # only the most recent N days (including today)
+
+class SessionsInput(BaseModel):
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    last_days: Optional[int] = 7
+    max_sessions: int = 20
+
+
+def _date_range(date_from: Optional[str], date_to: Optional[str], last_days: Optional[int]):
+    """(start, end) dates, either bound None when open"""
+    start = date.fromisoformat(date_from) if date_from else None
+    end = date.fromisoformat(date_to) if date_to else None
+    if last_days:
+        recent = date.today() - timedelta(days=last_days - 1)
+        start = max(start, recent) if start else recent
+    return start, end
+
+
+def _timestamp_range(start: Optional[date], end: Optional[date]):
+    """[since, until) epoch seconds for a date range"""
+    since = datetime.combine(start, time.min).timestamp() if start else None
+    until = datetime.combine(end + timedelta(days=1), time.min).timestamp() if end else None
+    return since, until
 
 BASE_MEMORY_DIR = "memory"
 
@@ -26,11 +57,13 @@ try:
         config = yaml.safe_load(f)
         MEMORY_CONFIG = config.get("memory", {}).get("storage", {})
         BASE_MEMORY_DIR = MEMORY_CONFIG.get("base_dir", "memory")
+        INDEX_CONFIG = config.get("memory", {}).get("index", {}) or {}
 except Exception as e:
     print(f"Error loading config from {CONFIG_PATH}: {e}")
     sys.exit(1)
 
 mcp = FastMCP("memory-service")
+instrument_server(mcp, "memory")
 
 class MemoryStore:
     def __init__(self):
@@ -38,40 +71,31 @@ class MemoryStore:
         # self.memory_manager = None
         self.current_session = None  # Track current session
         os.makedirs(self.memory_dir, exist_ok=True)
+        # SQLite/FTS5 index kept current by MemoryManager; back-fill sessions it hasn't seen
+        self.index = get_memory_index(os.path.join(self.memory_dir, INDEX_CONFIG.get("path", "memory_index.sqlite3")))
+        self.index.index_files(self.memory_dir)
 
     def load_session(self, session_id: str):
         """Load memory manager for a specific session."""
         # self.memory_manager = MemoryManager(session_id=session_id, memory_dir=self.memory_dir)
         self.current_session = session_id
 
-    def _list_all_memories(self) -> List[Dict]:
-        """Load all memory files using MemoryManager's date-based structure"""
+    def _session_files(self, date_from: Optional[date] = None, date_to: Optional[date] = None):
+        """Session files (newest first) from the day directories inside the date range only"""
+        for day, day_path in day_dirs(self.memory_dir, date_from, date_to):
+            for path in sorted(Path(day_path).rglob("session-*.json"), reverse=True):
+                yield day, path
+
+    def _list_all_memories(self, date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[Dict]:
+        """Load memory files using MemoryManager's date-based structure, pruned to a date range"""
         all_memories = []
-        base_path = self.memory_dir  # Use the simple memory_dir path
-        
-        for year_dir in os.listdir(base_path):
-            year_path = os.path.join(base_path, year_dir)
-            if not os.path.isdir(year_path):
-                continue
-                
-            for month_dir in os.listdir(year_path):
-                month_path = os.path.join(year_path, month_dir)
-                if not os.path.isdir(month_path):
-                    continue
-                    
-                for day_dir in os.listdir(month_path):
-                    day_path = os.path.join(month_path, day_dir)
-                    if not os.path.isdir(day_path):
-                        continue
-                        
-                    for file in os.listdir(day_path):
-                        if file.endswith('.json'):
-                            try:
-                                with open(os.path.join(day_path, file), 'r') as f:
-                                    session_memories = json.load(f)
-                                    all_memories.extend(session_memories)  # Extend instead of append
-                            except Exception as e:
-                                print(f"Failed to load {file}: {e}")
+        for _, path in self._session_files(date_from, date_to):
+            try:
+                with open(path, 'r') as f:
+                    session_memories = json.load(f)
+                    all_memories.extend(session_memories)  # Extend instead of append
+            except Exception as e:
+                print(f"Failed to load {path.name}: {e}")
         
         return all_memories
 
@@ -154,7 +178,7 @@ async def get_current_conversations(input: Dict) -> Dict[str, Any]:
         return {"result": {
                     "session_id": latest_file.replace(".json", ""),
                     "interactions": [
-                        item for item in data 
+                        load_payloads(item, memory_root) for item in data 
                         if item.get("type") != "run_metadata"
                     ]
                 }}
@@ -164,31 +188,12 @@ async def get_current_conversations(input: Dict) -> Dict[str, Any]:
 
 @mcp.tool()
 async def search_historical_conversations(input: SearchInput) -> Dict[str, Any]:
-    """Search conversation memory between user and YOU. Usage: input={"input": {"query": "anmol singh"}} result = await mcp.call_tool('search_historical_conversations', input)"""
+    """Search conversation memory between user and YOU, best matches first. Optional date_from/date_to (YYYY-MM-DD) or last_days narrow the range. Usage: input={"input": {"query": "anmol singh", "limit": 10, "offset": 0, "last_days": 30}} result = await mcp.call_tool('search_historical_conversations', input)"""
     try:
-        all_memories = memory_store._list_all_memories()
-        search_terms = input.query.lower().split()
-        
-        matches = []
-        for memory in all_memories:
-            # Only search in user query, final answer, and intent
-            memory_content = " ".join([
-                str(memory.get("user_query", "")),
-                str(memory.get("final_answer", "")),
-                str(memory.get("intent", ""))
-            ]).lower()
-            
-            if all(term in memory_content for term in search_terms):
-                # Only keep fields we want to return
-                matches.append({
-                    "user_query": memory.get("user_query", ""),
-                    "final_answer": memory.get("final_answer", ""),
-                    "timestamp": memory.get("timestamp", ""),
-                    "intent": memory.get("intent", "")
-                })
-
-        # Sort by timestamp (most recent last)
-        matches.sort(key=lambda x: x.get("timestamp", ""), reverse=False)
+        # Ranked FTS5 lookup over user_query / final_answer / intent (timestamp-indexed range)
+        since, until = _timestamp_range(*_date_range(input.date_from, input.date_to, input.last_days))
+        page = memory_store.index.search(input.query, limit=input.limit, offset=input.offset, since=since, until=until)
+        matches = page["matches"]
         
         # Count total words in matches
         total_words = 0
@@ -209,12 +214,35 @@ async def search_historical_conversations(input: SearchInput) -> Dict[str, Any]:
                 break
         
         return {"result": {
-                    "status": "error",
-                    "message": str(e)
+                    "matches": filtered_matches,
+                    "total": page["total"],
+                    "offset": input.offset,
+                    "next_offset": input.offset + len(filtered_matches) if input.offset + len(filtered_matches) < page["total"] else None
                 }}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@mcp.tool()
+async def list_recent_sessions(input: SessionsInput) -> Dict[str, Any]:
+    """List past sessions (newest first) with their queries and final answers, reading only the requested days. Usage: input={"input": {"last_days": 7, "max_sessions": 20}} result = await mcp.call_tool('list_recent_sessions', input)"""
+    try:
+        start, end = _date_range(input.date_from, input.date_to, input.last_days)
+        sessions = []
+        for day, path in memory_store._session_files(start, end):
+            if len(sessions) >= input.max_sessions:
+                break
+            with open(path, 'r') as f:
+                items = [load_payloads(item, memory_store.memory_dir) for item in json.load(f)]
+            sessions.append({
+                "session_id": memory_store.index.session_id_for(path, memory_store.memory_dir),
+                "date": day.isoformat(),
+                "queries": [q for q in map(query_from_item, items) if q],
+                "final_answers": [a for a in map(answer_from_item, items) if a],
+            })
+        return {"result": {"sessions": sessions}}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
 if __name__ == "__main__":
     print("Memory MCP server starting...")
     
@@ -1,10 +1,27 @@
 # modules/memory.py
 
+import atexit
+import hashlib
 import json
 import os
+import queue
+import sys
+import threading
 import time
-from typing import List, Optional
+import weakref
+from collections import deque
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from pydantic import BaseModel
+import yaml
+
+try:
+    from modules.memory_index import get_memory_index, query_from_item
+    from modules.metrics import registry
+except ImportError:  # imported as a top-level module by modules/mcp_server_memory.py
+    from memory_index import get_memory_index, query_from_item
+    from metrics import registry
 
 # Optional fallback logger
 try:
@@ -15,6 +32,273 @@ except ImportError:
         now = datetime.datetime.now().strftime("%H:%M:%S")
         print(f"[{now}] [{stage}] {msg}")
 
+PROFILE_YAML = Path(__file__).parent.parent / "config" / "profiles.yaml"
+
+memory_writes = registry.counter("memory_writes_total", "Memory writes by operation and outcome")
+memory_write_seconds = registry.histogram("memory_write_seconds", "Memory write latency, enqueue to on disk, by operation")
+
+_memory_config: Optional[Dict] = None
+
+
+def _load_memory_config() -> Dict:
+    """`memory` section of profiles.yaml (read once)"""
+    global _memory_config
+    if _memory_config is None:
+        try:
+            config = yaml.safe_load(PROFILE_YAML.read_text(encoding="utf-8")) or {}
+            _memory_config = config.get("memory", {}) or {}
+        except Exception:
+            _memory_config = {}
+    return _memory_config
+
+
+def _load_journal_config() -> Dict:
+    """`memory.journal` section of profiles.yaml"""
+    return _load_memory_config().get("journal", {}) or {}
+
+
+def _load_compact_config() -> Dict:
+    """`memory.compact` section of profiles.yaml"""
+    return _load_memory_config().get("compact", {}) or {}
+
+
+def _load_index_config() -> Dict:
+    """`memory.index` section of profiles.yaml"""
+    return _load_memory_config().get("index", {}) or {}
+
+
+class MemoryWriter:
+    """
+    Write-behind queue for session memory files.
+
+    One daemon thread runs submitted writes in FIFO order, so journal appends and
+    compactions for a session land on disk in the order they were issued while
+    the agent loop carries on. Writes submitted with a key (a session's file
+    path) can be waited for on their own with wait(key), which returns at once
+    when nothing for that key is queued; sync() waits for everything queued so
+    far; shutdown() drains the queue and stops the thread.
+    """
+
+    def __init__(self, background: bool = True):
+        self.background = background
+        self.queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.errors = 0
+        self.flush_latencies_ms: deque = deque(maxlen=256)  # enqueue → on disk
+        self._queued_keys: Dict[str, int] = {}  # key → writes submitted but not yet done
+        self._done = threading.Condition()
+
+    def submit(self, fn, *args, key: Optional[str] = None):
+        if not self.background:
+            self._execute(fn, args, time.perf_counter())
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                self._thread.start()
+        if key is not None:
+            with self._done:
+                self._queued_keys[key] = self._queued_keys.get(key, 0) + 1
+        self.queue.put((fn, args, time.perf_counter(), key))
+
+    def _execute(self, fn, args, enqueued: float):
+        op = getattr(fn, "__name__", "write").lstrip("_")
+        try:
+            fn(*args)
+            self.writes += 1
+            memory_writes.inc(op=op, outcome="ok")
+        except Exception as e:
+            self.errors += 1
+            memory_writes.inc(op=op, outcome="error")
+            log("memory", f"⚠️ Memory write failed: {e}")
+        elapsed = time.perf_counter() - enqueued
+        self.flush_latencies_ms.append(elapsed * 1000)
+        memory_write_seconds.observe(elapsed, op=op)
+
+    def _run(self):
+        while True:
+            fn, args, enqueued, key = self.queue.get()
+            try:
+                if fn is None:
+                    return
+                self._execute(fn, args, enqueued)
+            finally:
+                if key is not None:
+                    with self._done:
+                        self._queued_keys[key] -= 1
+                        if not self._queued_keys[key]:
+                            del self._queued_keys[key]
+                        self._done.notify_all()
+                self.queue.task_done()
+
+    def pending(self, key: str) -> bool:
+        """Whether writes submitted with key are still queued"""
+        with self._done:
+            return key in self._queued_keys
+
+    def wait(self, key: str):
+        """Block until the writes submitted with key so far are on disk (not other sessions')."""
+        with self._done:
+            while key in self._queued_keys and self._thread is not None and self._thread.is_alive():
+                self._done.wait(0.5)
+
+    def sync(self):
+        """Block until every write submitted so far is on disk."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.join()
+
+    def shutdown(self):
+        """Drain the queue and stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self.queue.put((None, (), time.perf_counter(), None))
+            self._thread.join()
+
+    def get_stats(self) -> Dict:
+        latencies = sorted(self.flush_latencies_ms)
+        return {
+            "queue_depth": self.queue.qsize(),
+            "writes": self.writes,
+            "errors": self.errors,
+            "flush_latency_p50_ms": round(latencies[len(latencies) // 2], 3) if latencies else None,
+            "flush_latency_max_ms": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+writer = MemoryWriter(background=_load_journal_config().get("background_writer", True))
+registry.callback("memory_writer_queue_depth", "Memory writes waiting for the writer thread", writer.queue.qsize)
+
+# Managers with unflushed journal records, flushed and compacted at interpreter exit
+_open_managers: "weakref.WeakSet[MemoryManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_managers():
+    for manager in list(_open_managers):
+        manager.close()
+    writer.shutdown()
+
+
+def day_dirs(
+    memory_dir: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    newest_first: bool = True,
+) -> Iterator[Tuple[date, str]]:
+    """
+    (day, path) for the memory/YYYY/MM/DD directories within [date_from, date_to].
+    Years and months outside the range are never listed, so cost follows the
+    range, not the total history. Non-date directories (blobs/) are skipped.
+    """
+    def numeric(path: str, lo: int, hi: int) -> List[int]:
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return []
+        values = [int(n) for n in names if n.isdigit() and lo <= int(n) <= hi and os.path.isdir(os.path.join(path, n))]
+        return sorted(values, reverse=newest_first)
+
+    start = date_from or date.min
+    end = date_to or date.max
+    for year in numeric(memory_dir, start.year, end.year):
+        year_path = os.path.join(memory_dir, str(year))
+        for month in numeric(year_path, 1, 12):
+            if not (start.year, start.month) <= (year, month) <= (end.year, end.month):
+                continue
+            month_path = os.path.join(year_path, f"{month:02}")
+            for day in numeric(month_path, 1, 31):
+                try:
+                    current = date(year, month, day)
+                except ValueError:
+                    continue
+                if start <= current <= end:
+                    yield current, os.path.join(month_path, f"{day:02}")
+
+
+BLOB_KEY = "$blob"
+PAYLOAD_FIELDS = ("tool_args", "tool_result", "metadata")
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_KEY in value
+
+
+class BlobStore:
+    """
+    Content-addressed payload store: <root>/<aa>/<sha256>.json.
+    Identical payloads (the same plan re-run, a repeated tool result) are stored
+    once across all sessions.
+    """
+
+    def __init__(self, root: str, cache_size: int = 64):
+        self.root = Path(root)
+        self.cache_size = cache_size
+        self._cache: Dict[str, Any] = {}
+        self._queued: Dict[str, str] = {}  # digest → serialised payload handed to the writer, not yet on disk
+        self.failed: set = set()  # digests whose write failed: kept in _queued and written inline instead
+
+    def queue(self, digest: str, data: str, key: Optional[str] = None):
+        """Write a payload in the background; get() serves it from memory until it is on disk"""
+        self._queued[digest] = data
+        writer.submit(self.write, digest, data, key=key)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.json"
+
+    @staticmethod
+    def encode(value: Any) -> Optional[tuple]:
+        """(digest, serialised) for a JSON-serialisable value, else None"""
+        try:
+            data = json.dumps(value, sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.sha256(data.encode("utf-8")).hexdigest(), data
+
+    def write(self, digest: str, data: str):
+        path = self.path(digest)
+        try:
+            if not path.exists():  # content-addressed: same digest, same bytes
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_suffix(".tmp")
+                tmp_path.write_text(data, encoding="utf-8")
+                os.replace(tmp_path, path)
+        except OSError:
+            self.failed.add(digest)  # disk full, permissions...: the payload stays in memory
+            raise
+        self.failed.discard(digest)
+        self._queued.pop(digest, None)
+
+    def inline(self, payload: Any) -> Any:
+        """payload with references to blobs that failed to write replaced by their values"""
+        if not self.failed or not isinstance(payload, dict):
+            return payload
+        return {
+            k: json.loads(self._queued[v[BLOB_KEY]]) if is_blob_ref(v) and v[BLOB_KEY] in self.failed else v
+            for k, v in payload.items()
+        }
+
+    def get(self, digest: str) -> Any:
+        if digest not in self._cache:
+            if len(self._cache) >= self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            queued = self._queued.get(digest)
+            data = queued if queued is not None else self.path(digest).read_text(encoding="utf-8")
+            self._cache[digest] = json.loads(data)
+        return self._cache[digest]
+
+
+def load_payloads(item: Dict, memory_dir: str = "memory") -> Dict:
+    """Copy of a raw session item with blob references in its payload dicts loaded"""
+    store = BlobStore(os.path.join(memory_dir, "blobs"))
+    resolved = dict(item)
+    for field in PAYLOAD_FIELDS:
+        payload = item.get(field)
+        if isinstance(payload, dict) and any(is_blob_ref(v) for v in payload.values()):
+            resolved[field] = {k: store.get(v[BLOB_KEY]) if is_blob_ref(v) else v for k, v in payload.items()}
+    return resolved
+
+
 class MemoryItem(BaseModel):
     """Represents a single memory entry for a session."""
     timestamp: float
@@ -30,37 +314,232 @@ class MemoryItem(BaseModel):
 
 
 class MemoryManager:
-    """Manages session memory (read/write/append)."""
+    """
+    Manages session memory (read/write/append).
+
+    The session JSON file is a snapshot. New items and success patches go to an
+    append-only JSONL journal next to it (session-<id>.journal.jsonl), written in
+    batches of `flush_every` records; every `compact_every` records (and on
+    close) the journal is folded back into the JSON snapshot and truncated.
+    load() replays whatever journal tail a crash left behind.
+
+    File writes go through the shared background `writer`; items are updated in
+    memory immediately, so the agent loop never waits on disk.
+
+    In compact mode tool names and tags are interned, and payload values
+    (tool_args / tool_result / metadata entries such as solve() plans) of at
+    least `spill_bytes` are moved to the content-addressed BlobStore and kept as
+    {"$blob": digest} references, loaded only through payload() / resolve().
+    """
 
     def __init__(self, session_id: str, memory_dir: str = "memory"):
         self.session_id = session_id
         self.memory_dir = memory_dir
-        self.memory_path = os.path.join('memory', session_id.split('-')[0], session_id.split('-')[1], session_id.split('-')[2], f'session-{session_id}.json')
+        self.memory_path = os.path.join(memory_dir, session_id.split('-')[0], session_id.split('-')[1], session_id.split('-')[2], f'session-{session_id}.json')
+        self.journal_path = self.memory_path[:-len(".json")] + ".journal.jsonl"
         self.items: List[MemoryItem] = []
 
+        config = _load_journal_config()
+        self.journal_enabled = config.get("enabled", True)
+        self.flush_every = max(1, config.get("flush_every", 8))
+        self.compact_every = max(1, config.get("compact_every", 64))
+        self.fsync = config.get("fsync", True)
+
+        compact = _load_compact_config()
+        self.compact = compact.get("enabled", True)
+        self.spill_bytes = compact.get("spill_bytes", 1024)
+        self.text_preview_chars = compact.get("text_preview_chars", 200)
+        self.blobs = BlobStore(os.path.join(memory_dir, "blobs"))
+
+        index = _load_index_config()
+        self.index = get_memory_index(os.path.join(memory_dir, index.get("path", "memory_index.sqlite3"))) if index.get("enabled", True) else None
+        self._current_query: Optional[str] = None  # latest user query, paired with answers in the index
+        self._current_intent: Optional[str] = None  # perception intent of that query (set_intent)
+        self._pending: List[Dict] = []  # records not yet handed to the writer
+        self._journaled = 0             # records in the journal since the last compaction
+
         if not os.path.exists(self.memory_dir):
             os.makedirs(self.memory_dir)
 
         self.load()
 
     def load(self):
+        writer.wait(self.memory_path)  # a previous manager of this session may still be writing (other sessions don't matter)
         if os.path.exists(self.memory_path):
             with open(self.memory_path, "r", encoding="utf-8") as f:
                 raw = json.load(f)
-                self.items = [MemoryItem(**item) for item in raw]
+                self.items = [self._intern(MemoryItem(**item)) for item in raw]
         else:
             self.items = []
+        self._pending = []
+        self._journaled = self._replay_journal()
+        for item in self.items:
+            self._current_query = query_from_item(item.model_dump(include={"type", "text"})) or self._current_query
+        if self._journaled:
+            log("memory", f"♻️ Recovered {self._journaled} journal record(s) for session {self.session_id}")
+
+    def _replay_journal(self) -> int:
+        """Apply journal records newer than the snapshot; returns how many were read"""
+        if not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn write at the tail: everything before it is intact
+                seq = record["seq"]
+                if "item" in record:
+                    # seq < len(items): already compacted (crash between snapshot and truncate)
+                    if seq >= len(self.items):
+                        self.items.append(self._intern(MemoryItem(**record["item"])))
+                elif "patch" in record and seq < len(self.items):
+                    for field, value in record["patch"].items():
+                        setattr(self.items[seq], field, value)
+                count += 1
+        return count
 
     def save(self):
+        """Compact now and wait until the snapshot is on disk."""
+        self._schedule_compaction()
+        writer.wait(self.memory_path)
+
+    def _schedule_compaction(self):
+        """Queue a full snapshot of the current items; the journal is truncated after it."""
+        self._pending = []
+        self._journaled = 0
+        _open_managers.discard(self)
+        writer.submit(self._write_snapshot, list(self.items), key=self.memory_path)
+
+    def _write_snapshot(self, items: List[MemoryItem]):
+        """Write the full JSON snapshot atomically and remove the journal (compaction)."""
         # Before opening the file for writing
         os.makedirs(os.path.dirname(self.memory_path), exist_ok=True)
-        with open(self.memory_path, "w", encoding="utf-8") as f:
-            raw = [item.dict() for item in self.items]
+        tmp_path = self.memory_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            raw = [self._on_disk(item.model_dump()) for item in items]
             json.dump(raw, f, indent=2)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.memory_path)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _append(self, record: Dict):
+        """Queue a journal record; flush per batch, compact once the journal is long"""
+        if not self.journal_enabled:
+            self._schedule_compaction()
+            return
+        self._pending.append(record)
+        _open_managers.add(self)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Hand queued records to the writer as one journal append."""
+        if not self._pending:
+            return
+        records, self._pending = self._pending, []
+        self._journaled += len(records)
+        writer.submit(self._write_journal, records, key=self.memory_path)
+        if self._journaled >= self.compact_every:
+            self._schedule_compaction()
+
+    def _write_journal(self, records: List[Dict]):
+        """Append records to the journal with a single write (+ fsync)."""
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            records = [dict(record, item=self._on_disk(record["item"])) if "item" in record else record for record in records]
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def close(self):
+        """Queue a final compaction so the session JSON is complete (end of a run)."""
+        if self._pending or self._journaled:
+            self._schedule_compaction()
+
+    # === Compact representation ===
+    def _intern(self, item: MemoryItem) -> MemoryItem:
+        if self.compact:
+            if item.tool_name:
+                item.tool_name = sys.intern(item.tool_name)
+            if item.tags:
+                item.tags = [sys.intern(tag) for tag in item.tags]
+        return item
+
+    def _spill(self, item: MemoryItem) -> MemoryItem:
+        """
+        Replace large payload values with blob references (written by the writer
+        first). The text of an item whose payload was spilled is cut to a preview:
+        it repeats the payload, which payload() / resolve() still return in full.
+        """
+        spilled = False
+        for field in PAYLOAD_FIELDS:
+            payload = getattr(item, field)
+            if not isinstance(payload, dict):
+                continue
+            compacted = {}
+            for key, value in payload.items():
+                encoded = None if is_blob_ref(value) else BlobStore.encode(value)
+                if encoded and len(encoded[1]) >= self.spill_bytes:
+                    digest, data = encoded
+                    self.blobs.queue(digest, data, key=self.memory_path)
+                    value = {BLOB_KEY: digest, "bytes": len(data)}
+                    spilled = True
+                compacted[key] = value
+            setattr(item, field, compacted)
+        if spilled and len(item.text) > self.text_preview_chars:
+            item.text = item.text[:self.text_preview_chars] + "…"
+        return item
+
+    def _on_disk(self, raw: Dict) -> Dict:
+        """A dumped item as written: payloads whose blob write failed are kept inline"""
+        if not self.blobs.failed:
+            return raw
+        return {**raw, **{field: self.blobs.inline(raw.get(field)) for field in PAYLOAD_FIELDS}}
+
+    def payload(self, item: MemoryItem, field: str) -> Optional[dict]:
+        """An item's tool_args / tool_result / metadata with spilled values loaded"""
+        value = getattr(item, field)
+        if not isinstance(value, dict) or not any(is_blob_ref(v) for v in value.values()):
+            return value
+        return {k: self.blobs.get(v[BLOB_KEY]) if is_blob_ref(v) else v for k, v in value.items()}
+
+    def resolve(self, item: MemoryItem) -> MemoryItem:
+        """Copy of item with every spilled payload loaded"""
+        return item.model_copy(update={field: self.payload(item, field) for field in PAYLOAD_FIELDS})
+
+    def _index(self, seq: int, item: MemoryItem):
+        """Queue an index update (before spilling, so answers are still inline)"""
+        if self.index is None:
+            return
+        fields = {
+            "type": item.type,
+            "text": item.text,
+            "timestamp": item.timestamp,
+            "final_answer": item.final_answer,
+            "tool_result": item.tool_result,
+        }
+        fields["intent"] = (item.metadata or {}).get("intent")
+        self._current_query = query_from_item(fields) or self._current_query
+        writer.submit(self.index.add, self.session_id, seq, fields, self._current_query)
+
+    def set_intent(self, intent: Optional[str]):
+        """Perception intent of the current query; kept with its outputs and answers (and indexed)"""
+        self._current_intent = intent if intent and intent != "unknown" else None
 
     def add(self, item: MemoryItem):
+        if self._current_intent and item.type in ("tool_output", "final_answer"):
+            item.metadata = {**(item.metadata or {}), "intent": self._current_intent}
+        self._index(len(self.items), item)
+        if self.compact:
+            item = self._spill(self._intern(item))
         self.items.append(item)
-        self.save()
+        self._append({"seq": len(self.items) - 1, "item": item.model_dump()})
 
     def add_tool_call(
         self, tool_name: str, tool_args: dict, tags: Optional[List[str]] = None
@@ -76,7 +555,8 @@ class MemoryManager:
         self.add(item)
 
     def add_tool_output(
-        self, tool_name: str, tool_args: dict, tool_result: dict, success: bool, tags: Optional[List[str]] = None
+        self, tool_name: str, tool_args: dict, tool_result: dict, success: bool, tags: Optional[List[str]] = None,
+        metadata: Optional[dict] = None,
     ):
         item = MemoryItem(
             timestamp=time.time(),
@@ -87,6 +567,7 @@ class MemoryManager:
             tool_result=tool_result,
             success=success,  # 🆕 Track success!
             tags=tags or [],
+            metadata=metadata or {},
         )
         self.add(item)
 
@@ -117,11 +598,12 @@ class MemoryManager:
         """Patch last tool call or output for a given tool with success=True/False."""
 
         # Search backwards for latest matching tool call/output
-        for item in reversed(self.items):
+        for seq in range(len(self.items) - 1, -1, -1):
+            item = self.items[seq]
             if item.tool_name == tool_name and item.type in {"tool_call", "tool_output"}:
                 item.success = success
                 log("memory", f"✅ Marked {tool_name} as success={success}")
-                self.save()
+                self._append({"seq": seq, "patch": {"success": success}})
                 return
 
         log("memory", f"⚠️ Tried to mark {tool_name} as success={success} but no matching memory found.")
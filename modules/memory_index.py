@@ -0,0 +1,308 @@
+# modules/memory_index.py
+
+"""
+Global SQLite index over session memory
+One row per user query / final answer, full-text indexed with FTS5 on
+user_query, final_answer and intent (plus timestamp and session indexes), so
+historical search is a ranked index lookup instead of a walk over every
+session JSON file. MemoryManager keeps it current as it writes; index_files()
+back-fills sessions written before the index existed.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from modules.metrics import registry
+except ImportError:  # imported as a top-level module by modules/mcp_server_memory.py
+    from metrics import registry
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    type TEXT,
+    user_query TEXT NOT NULL DEFAULT '',
+    final_answer TEXT NOT NULL DEFAULT '',
+    intent TEXT NOT NULL DEFAULT '',
+    UNIQUE (session_id, seq)
+);
+CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS entries_session ON entries (session_id, seq);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+    user_query, final_answer, intent, content='entries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_fts (rowid, user_query, final_answer, intent)
+    VALUES (new.id, new.user_query, new.final_answer, new.intent);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_fts (entries_fts, rowid, user_query, final_answer, intent)
+    VALUES ('delete', old.id, old.user_query, old.final_answer, old.intent);
+END;
+
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    listing TEXT NOT NULL
+);
+"""
+
+QUERY_PREFIX = "Started new session with input:"
+
+
+def query_from_item(item: Dict) -> Optional[str]:
+    """The user query an item records, if any (explicit field or run_metadata text)"""
+    if item.get("user_query"):
+        return item["user_query"]
+    text = item.get("text") or ""
+    if item.get("type") == "run_metadata" and QUERY_PREFIX in text:
+        query = text.split(QUERY_PREFIX, 1)[1].strip()
+        return re.sub(r"\s+at \d{4}-\d{2}-\d{2}T[\d:.]+$", "", query)
+    return None
+
+
+def answer_from_item(item: Dict) -> Optional[str]:
+    """The final answer an item records, if any (explicit field or FINAL_ANSWER tool result)"""
+    if item.get("final_answer"):
+        return item["final_answer"]
+    result = (item.get("tool_result") or {}).get("result") if isinstance(item.get("tool_result"), dict) else None
+    if isinstance(result, str) and "FINAL_ANSWER:" in result:
+        return result.split("FINAL_ANSWER:", 1)[1].strip()
+    return None
+
+
+class MemoryIndex:
+    """SQLite/FTS5 store of user queries and final answers across all sessions"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()  # written from the memory writer thread, read by servers
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # === Writes ===
+    @staticmethod
+    def _row(session_id: str, seq: int, item: Dict, current_query: Optional[str]) -> Optional[tuple]:
+        """Entry for an item that carries a query or an answer; answers keep the query they answer"""
+        query = query_from_item(item)
+        answer = answer_from_item(item)
+        if query is None and answer is None:
+            return None
+        return (
+            session_id, seq, float(item.get("timestamp") or 0), item.get("type"),
+            query or current_query or "", answer or "",
+            item.get("intent") or (item.get("metadata") or {}).get("intent") or "",
+        )
+
+    def _insert(self, rows: List[tuple]):
+        # Delete first: REPLACE would skip the FTS delete trigger
+        self.conn.executemany("DELETE FROM entries WHERE session_id = ? AND seq = ?", [row[:2] for row in rows])
+        self.conn.executemany(
+            "INSERT INTO entries (session_id, seq, timestamp, type, user_query, final_answer, intent) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def add(self, session_id: str, seq: int, item: Dict, current_query: Optional[str] = None):
+        """Index one memory item (no-op unless it records a query or an answer)"""
+        row = self._row(session_id, seq, item, current_query)
+        if row is not None:
+            with self._lock, self.conn:
+                self._insert([row])
+
+    def index_session(self, session_id: str, items: List[Dict]):
+        """(Re)index every item of a session in one transaction"""
+        rows = []
+        current_query = None
+        for seq, item in enumerate(items):
+            current_query = query_from_item(item) or current_query
+            row = self._row(session_id, seq, item, current_query)
+            if row is not None:
+                rows.append(row)
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE session_id = ?", (session_id,))
+            self._insert(rows)
+
+    @staticmethod
+    def session_id_for(path: Path, memory_dir: str) -> str:
+        """Invert MemoryManager's <a>/<b>/<c>/session-<session_id>.json layout (ids may contain "/")"""
+        relative = path.relative_to(memory_dir).as_posix()
+        start = relative.find("session-")
+        while start != -1:
+            candidate = relative[start + len("session-"):-len(".json")]
+            parts = candidate.split("-")
+            if len(parts) >= 3 and relative == "/".join(parts[:3] + [f"session-{candidate}.json"]):
+                return candidate
+            start = relative.find("session-", start + 1)
+        return path.stem
+
+    def _changed_dirs(self, memory_dir: str) -> tuple:
+        """
+        Session files in directories whose mtime changed since the last back-fill,
+        plus the updated directory manifest. As in ConversationIndex, unchanged
+        directories are not listed and their files not stat'ed: MemoryManager
+        writes snapshots via rename, which bumps the directory mtime.
+        """
+        with self._lock:
+            known = {row["path"]: (row["mtime_ns"], row["listing"]) for row in self.conn.execute("SELECT * FROM dirs")}
+        manifest, candidates = {}, []
+        root = str(memory_dir)
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            entry = known.get(directory)
+            if entry is not None and entry[0] == mtime_ns:
+                dirs, files = json.loads(entry[1])
+            else:
+                dirs, files = [], []
+                with os.scandir(directory) as it:
+                    for e in it:
+                        if e.is_dir():
+                            if not (directory == root and e.name == "blobs"):
+                                dirs.append(e.name)
+                        elif e.name.startswith("session-") and e.name.endswith(".json"):
+                            files.append(e.name)
+                manifest[directory] = (mtime_ns, json.dumps([dirs, files]))
+                candidates.extend(Path(directory, name) for name in files)
+            stack.extend(os.path.join(directory, name) for name in dirs)
+        return candidates, manifest
+
+    def index_files(self, memory_dir: str) -> int:
+        """Back-fill session files that are new or changed since they were last indexed"""
+        try:
+            from modules.memory import load_payloads
+        except ImportError:
+            from memory import load_payloads
+
+        candidates, manifest = self._changed_dirs(memory_dir)
+        with self._lock:
+            known = {row["path"]: (row["size"], row["mtime_ns"]) for row in self.conn.execute("SELECT * FROM files")}
+        indexed = 0
+        for path in candidates:
+            stat = path.stat()
+            if known.get(str(path)) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            try:
+                items = [load_payloads(item, memory_dir) for item in json.loads(path.read_text(encoding="utf-8"))]
+            except Exception as e:
+                log("memory_index", f"⚠️ Skipping {path}: {e}")
+                continue
+            self.index_session(self.session_id_for(path, memory_dir), items)
+            with self._lock, self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                    (str(path), stat.st_size, stat.st_mtime_ns),
+                )
+            indexed += 1
+        with self._lock, self.conn:  # after the files: an interrupted back-fill rescans their directories
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dirs (path, mtime_ns, listing) VALUES (?, ?, ?)",
+                [(path, mtime_ns, listing) for path, (mtime_ns, listing) in manifest.items()],
+            )
+        if indexed:
+            log("memory_index", f"📇 Indexed {indexed} session file(s)")
+        return indexed
+
+    # === Reads ===
+    @staticmethod
+    def match_expression(query: str) -> Optional[str]:
+        """AND of quoted prefix terms, so user text can't inject FTS syntax"""
+        terms = re.findall(r"\w+", query.lower())
+        if not terms:
+            return None
+        return " AND ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        offset: int = 0,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> Dict:
+        """Ranked (bm25, then most recent) page of entries matching every query term, within [since, until)"""
+        expression = self.match_expression(query)
+        if expression is None:
+            return {"total": 0, "matches": []}
+        where = "entries_fts MATCH ? AND e.timestamp >= ? AND e.timestamp < ?"
+        params = (expression, since if since is not None else float("-inf"), until if until is not None else float("inf"))
+        with self._lock:
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid WHERE {where}", params
+            ).fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT e.session_id, e.timestamp, e.user_query, e.final_answer, e.intent "
+                "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                f"WHERE {where} ORDER BY bm25(entries_fts), e.timestamp DESC LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        return {"total": total, "matches": [dict(row) for row in rows]}
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+                "sessions": self.conn.execute("SELECT COUNT(DISTINCT session_id) FROM entries").fetchone()[0],
+                "files": self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0],
+            }
+
+
+_indexes: Dict[str, MemoryIndex] = {}
+
+
+def get_memory_index(path: str) -> MemoryIndex:
+    """One shared MemoryIndex (and connection) per database path"""
+    key = os.path.abspath(path)
+    if key not in _indexes:
+        _indexes[key] = MemoryIndex(key)
+    return _indexes[key]
+
+
+def _index_sizes() -> Dict:
+    return {(("path", path),): index.get_stats()["entries"] for path, index in list(_indexes.items())}
+
+
+registry.callback("memory_index_entries", "Rows in each open memory index database", _index_sizes)
@@ -0,0 +1,386 @@
+# modules/metrics.py
+
+"""
+In-process metrics registry with Prometheus text export
+Counters, gauges and histograms keyed by label values, plus callback metrics
+read at export time (index sizes, cache counters kept elsewhere). The agent
+process exposes everything through a periodic file dump (offline use), an
+optional HTTP scrape endpoint and the agent server's "metrics" method.
+
+MCP servers are short-lived subprocesses (one per tool call), so
+instrument_server() wraps their tools and folds each call into a small state
+file under the metrics directory; the agent process includes those files in
+its export as mcp_server_tool_* series.
+
+Importable both as modules.metrics and, from modules/mcp_server_memory.py, as
+a top-level module (no package imports here).
+"""
+
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import yaml
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _load_config() -> Dict:
+    try:
+        return yaml.safe_load(PROFILE_YAML.read_text()).get("metrics", {}) or {}
+    except Exception:
+        return {}
+
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self.values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[_labels(labels)] = value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Labels, List] = {}  # labels → [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            entry = self.values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def time(self, **labels):
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self, labels)
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        out = []
+        with self._lock:
+            for key, entry in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, entry):
+                    out.append((f"{self.name}_bucket", key + (("le", _format_value(bound)),), count))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), entry[-1]))
+                out.append((f"{self.name}_sum", key, entry[-2]))
+                out.append((f"{self.name}_count", key, entry[-1]))
+        return out
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _Callback:
+    """Metric whose value(s) are read at export time: fn() → number or {labels dict as tuple: number}"""
+
+    def __init__(self, name: str, help: str, fn: Callable, type: str):
+        self.name, self.help, self.fn, self.type = name, help, fn, type
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, _labels(dict(key)), v) for key, v in value.items()]
+        return [(self.name, (), value)]
+
+
+class Registry:
+    def __init__(self, state_dir: Optional[Union[str, Path]] = None):
+        config = _load_config()
+        self.enabled = config.get("enabled", True)
+        self.state_dir = Path(state_dir or ROOT / config.get("dir", "metrics"))
+        self.metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._dumper: Optional[threading.Thread] = None
+        self._http: Optional[ThreadingHTTPServer] = None
+
+    def _get(self, cls, name: str, help: str, *args):
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, *args)
+            return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def callback(self, name: str, help: str, fn: Callable, type: str = "gauge"):
+        """Register (or replace) a metric computed when exported"""
+        with self._lock:
+            self.metrics[name] = _Callback(name, help, fn, type)
+
+    # === Export ===
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self.metrics.values())
+        metrics += self._server_metrics()
+        lines = []
+        for metric in sorted(metrics, key=lambda m: m.name):
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: Optional[Union[str, Path]] = None) -> Path:
+        """Write render() atomically (default: <metrics dir>/agent.prom)"""
+        target = Path(path) if path else self.state_dir / "agent.prom"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, target)
+        return target
+
+    def start_exporters(self, dump_interval: Optional[float] = None, http_port: Optional[int] = None):
+        """Periodic file dump and/or HTTP /metrics endpoint, per the metrics config"""
+        config = _load_config()
+        if not self.enabled:
+            return
+        dump_interval = dump_interval if dump_interval is not None else config.get("dump_interval", 0)
+        http_port = http_port if http_port is not None else config.get("http_port")
+        if dump_interval and self._dumper is None:
+            def loop():
+                while True:
+                    time.sleep(dump_interval)
+                    try:
+                        self.dump()
+                    except Exception as e:
+                        print(f"⚠️ Metrics dump failed: {e}")
+            self._dumper = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+            self._dumper.start()
+        if http_port and self._http is None:
+            self._http = serve_http(self, http_port)
+
+    def stop_exporters(self):
+        if self._http is not None:
+            self._http.shutdown()
+            self._http = None
+
+    # === MCP server state files ===
+    def _server_metrics(self) -> List:
+        calls = Counter("mcp_server_tool_calls_total", "Tool invocations handled inside MCP server processes")
+        seconds = Histogram("mcp_server_tool_seconds", "Tool handler time inside MCP server processes")
+        found = False
+        for path in self.state_dir.glob("mcp_server_*.json"):
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            found = True
+            server = state.get("server", path.stem[len("mcp_server_"):])
+            for key, count in state.get("calls", {}).items():
+                tool, outcome = key.rsplit("|", 1)
+                calls.values[_labels({"server": server, "tool": tool, "outcome": outcome})] = count
+            for tool, entry in state.get("seconds", {}).items():
+                if len(entry) == len(seconds.buckets) + 2:
+                    seconds.values[_labels({"server": server, "tool": tool})] = entry
+        return [calls, seconds] if found else []
+
+    def record_server_call(self, server: str, tool: str, outcome: str, elapsed: float):
+        """Fold one MCP tool call into <metrics dir>/mcp_server_<server>.json (locked: servers run concurrently)"""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self.state_dir / f"mcp_server_{server}.json"
+        with _locked(self.state_dir / f".mcp_server_{server}.lock"):
+            try:
+                state = json.loads(path.read_text(encoding="utf-8"))
+            except Exception:
+                state = {"server": server, "calls": {}, "seconds": {}}
+            key = f"{tool}|{outcome}"
+            state["calls"][key] = state["calls"].get(key, 0) + 1
+            entry = state["seconds"].setdefault(tool, [0] * len(LATENCY_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if elapsed <= bound:
+                    entry[i] += 1
+            entry[-2] += elapsed
+            entry[-1] += 1
+            tmp = path.with_suffix(".json.tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, path)
+
+
+@contextmanager
+def _locked(path: Path):
+    """Exclusive lock on path: flock on POSIX, msvcrt.locking on Windows, none elsewhere"""
+    with open(path, "a+") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+        elif msvcrt is not None:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)  # retries for ~10s, then raises
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
+
+
+def serve_http(registry: Registry, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve GET /metrics on a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def instrument_server(mcp, server: str, registry: Optional["Registry"] = None):
+    """
+    Make mcp.tool() register tools wrapped with call counting and timing.
+    Call before the @mcp.tool() definitions. The wrapper keeps the tool's
+    name, docstring and signature (FastMCP reads them through __wrapped__).
+    Nothing is recorded while the app runs in-process (`mcp.in_process`, set
+    by core.session.load_in_process_app and modules.fast_path): the agent
+    counts those calls itself, and the locked state file rewrite would cost
+    far more than the call.
+    """
+    registry = registry or globals()["registry"]
+    if not registry.enabled:
+        return mcp
+    register_tool = mcp.tool
+
+    def record(name: str, outcome: str, start: float):
+        if getattr(mcp, "in_process", False):
+            return
+        try:
+            registry.record_server_call(server, name, outcome, time.perf_counter() - start)
+        except Exception:
+            pass  # metrics must never fail a tool call
+
+    def tool(*args, **kwargs):
+        decorator = register_tool(*args, **kwargs)
+
+        def wrap(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def timed(*a, **kw):
+                    start, outcome = time.perf_counter(), "error"
+                    try:
+                        result = await fn(*a, **kw)
+                        outcome = "ok"
+                        return result
+                    finally:
+                        record(fn.__name__, outcome, start)
+            else:
+                @functools.wraps(fn)
+                def timed(*a, **kw):
+                    start, outcome = time.perf_counter(), "error"
+                    try:
+                        result = fn(*a, **kw)
+                        outcome = "ok"
+                        return result
+                    finally:
+                        record(fn.__name__, outcome, start)
+            return decorator(timed)
+        return wrap
+
+    mcp.tool = tool
+    return mcp
+
+
+registry = Registry()
@@ -1,17 +1,27 @@
 import os
 import json
+import asyncio
 import yaml
 import requests
 from pathlib import Path
+from typing import Optional
 from google import genai
+from google.genai import types
 from dotenv import load_dotenv
 
+from modules.cassette import cassette
+from modules.metrics import registry
+from modules.tracing import tracer
+
 load_dotenv()
 
 ROOT = Path(__file__).parent.parent
 MODELS_JSON = ROOT / "config" / "models.json"
 PROFILE_YAML = ROOT / "config" / "profiles.yaml"
 
+llm_calls = registry.counter("llm_calls_total", "LLM calls by call site, model and outcome")
+llm_seconds = registry.histogram("llm_call_seconds", "LLM call latency by call site and model")
+
 class ModelManager:
     def __init__(self):
         self.config = json.loads(MODELS_JSON.read_text())
@@ -26,19 +36,34 @@ class ModelManager:
             api_key = os.getenv("GEMINI_API_KEY")
             self.client = genai.Client(api_key=api_key)
 
-    async def generate_text(self, prompt: str) -> str:
-        if self.model_type == "gemini":
-            return self._gemini_generate(prompt)
+    async def generate_text(self, prompt: str, temperature: Optional[float] = None, site: str = "other") -> str:
+        # One _<type>_generate method per backend (gemini, ollama; subclasses may add more).
+        # Clients are blocking — run them off the event loop so concurrent calls overlap
+        generate = getattr(self, f"_{self.model_type}_generate", None)
+        if generate is None:
+            raise NotImplementedError(f"Unsupported model type: {self.model_type}")
 
-        elif self.model_type == "ollama":
-            return self._ollama_generate(prompt)
-
-        raise NotImplementedError(f"Unsupported model type: {self.model_type}")
+        model = self.model_info["model"]
+        outcome = "error"
+        try:
+            with tracer.span("llm", model=model, site=site, prompt_chars=len(prompt)), \
+                    llm_seconds.time(site=site, model=model):
+                text = await cassette.call(
+                    "llm", f"llm:{site}",
+                    {"model": model, "site": site, "prompt": prompt, "temperature": temperature},
+                    lambda: asyncio.to_thread(generate, prompt, temperature),
+                )
+            outcome = "ok"
+            return text
+        finally:
+            llm_calls.inc(site=site, model=model, outcome=outcome)
 
-    def _gemini_generate(self, prompt: str) -> str:
+    def _gemini_generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+        config = types.GenerateContentConfig(temperature=temperature) if temperature is not None else None
         response = self.client.models.generate_content(
             model=self.model_info["model"],
-            contents=prompt
+            contents=prompt,
+            config=config
         )
 
         # ✅ Safely extract response text
@@ -50,10 +75,13 @@ class ModelManager:
             except Exception:
                 return str(response)
 
-    def _ollama_generate(self, prompt: str) -> str:
+    def _ollama_generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+        payload = {"model": self.model_info["model"], "prompt": prompt, "stream": False}
+        if temperature is not None:
+            payload["options"] = {"temperature": temperature}
         response = requests.post(
             self.model_info["url"]["generate"],
-            json={"model": self.model_info["model"], "prompt": prompt, "stream": False}
+            json=payload
         )
         response.raise_for_status()
         return response.json()["response"].strip()
@@ -5,6 +5,8 @@ from pydantic import BaseModel
 from modules.model_manager import ModelManager
 from modules.tools import load_prompt, extract_json_block
 from core.context import AgentContext
+from modules.tracing import tracer
+from modules.metrics import registry
 
 import json
 
@@ -19,6 +21,7 @@ except ImportError:
         print(f"[{now}] [{stage}] {msg}")
 
 model = ModelManager()
+perception_cache_lookups = registry.counter("perception_cache_lookups_total", "Per-session perception cache lookups by result")
 
 
 prompt_path = "prompts/perception_prompt.txt"
@@ -52,7 +55,7 @@ async def extract_perception(user_input: str, mcp_server_descriptions: dict) ->
     
 
     try:
-        raw = await model.generate_text(prompt)
+        raw = await model.generate_text(prompt, site="perception")
         raw = raw.strip()
         log("perception", f"Raw output: {raw}")
 
@@ -79,13 +82,40 @@ async def extract_perception(user_input: str, mcp_server_descriptions: dict) ->
         )
 
 
+def perception_cache_key(user_input: str, mcp_server_descriptions: Optional[dict]) -> tuple:
+    """
+    Perception only depends on the query text and the server catalog it chooses from.
+    """
+    return (user_input, tuple(sorted(mcp_server_descriptions or {})))
+
+
 async def run_perception(context: AgentContext, user_input: Optional[str] = None):
 
     """
     Clean wrapper to call perception from context.
+    Results are memoised per (input, server set) on the context so lifeline
+    retries and later steps don't pay for another LLM call.
     """
-    return await extract_perception(
-        user_input = user_input or context.user_input,
-        mcp_server_descriptions=context.mcp_server_descriptions
-    )
+    user_input = user_input or context.user_input
+    use_cache = context.agent_profile.strategy.cache_perception
+    key = perception_cache_key(user_input, context.mcp_server_descriptions)
+
+    if use_cache and key in context.perception_cache:
+        perception_cache_lookups.inc(result="hit")
+        log("perception", "♻️ Reusing cached perception for unchanged input")
+        return context.perception_cache[key]
+    if use_cache:
+        perception_cache_lookups.inc(result="miss")
+
+    with tracer.span("perception"):
+        perception = await extract_perception(
+            user_input=user_input,
+            mcp_server_descriptions=context.mcp_server_descriptions
+        )
+
+    # Don't pin the fallback result — a retry may well succeed
+    if use_cache and perception.intent != "unknown":
+        context.perception_cache[key] = perception
+
+    return perception
 
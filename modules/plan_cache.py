@@ -0,0 +1,281 @@
+# modules/plan_cache.py
+
+"""
+Compiled-plan cache keyed by query template
+Structurally identical questions ("ASCII values of INDIA ..." / "ASCII values of
+NEPAL ...") share one solve() plan. Queries are normalised into a template with
+typed slots (quoted strings, URLs, numbers, acronyms, proper nouns); successful
+plans are stored against that template and re-instantiated for new slot values
+by rewriting the matching string/number literals in the plan source.
+"""
+
+import io
+import json
+import re
+import time
+import tokenize
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+SOLVE_RE = re.compile(r"^\s*(async\s+)?def\s+solve\s*\(", re.MULTILINE)
+
+# Slot patterns, tried left to right at each position (earlier wins)
+SLOT_RE = re.compile(
+    r"""
+      "(?P<dq>[^"]+)"                              # "double quoted"
+    | '(?P<sq>[^']+)'                              # 'single quoted'
+    | (?P<url>https?://\S+)                        # URLs
+    | (?P<num>(?<![\w.])-?\d+(?:\.\d+)?(?![\w.]))  # numbers
+    | (?P<word>\b(?:[A-Z][A-Za-z0-9]+(?:-[A-Za-z0-9]+)*|[a-z]*\d[A-Za-z0-9]*)\b)  # acronyms, proper nouns, codes
+    """,
+    re.VERBOSE,
+)
+
+Slot = Tuple[str, str]  # (kind, value) with kind "str" or "num"
+
+
+class PlanCache:
+    """LRU cache of solve() plans keyed by normalised query template"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None, enabled: Optional[bool] = None):
+        config = self._load_config()
+        self.enabled = config.get("enabled", True) if enabled is None else enabled
+        self.path = Path(path or config.get("path", "plan_cache/plans.json"))
+        if not self.path.is_absolute():
+            self.path = ROOT / self.path
+        self.max_entries = max_entries or config.get("max_entries", 256)
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._served: Dict[str, str] = {}  # template key -> plan last returned by lookup()
+        self._dirty = False  # hit counts not yet on disk
+        self._load()
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("plan_cache", {}) or {}
+        except Exception:
+            return {}
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception as e:
+                log("plan_cache", f"⚠️ Could not load plan cache: {e}")
+                self.entries = {}
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.entries, indent=2), encoding="utf-8")
+            self._dirty = False
+        except Exception as e:
+            log("plan_cache", f"⚠️ Could not save plan cache: {e}")
+
+    def flush(self):
+        """Write hit counts and last-used times that lookups only kept in memory"""
+        if self._dirty:
+            self._save()
+
+    # === Templates ===
+    @staticmethod
+    def template(query: str) -> Tuple[str, List[Slot]]:
+        """Split a query into a normalised template key and its ordered slot values"""
+        text = re.sub(r"\s+", " ", query).strip().rstrip("?.! ")
+        slots: List[Slot] = []
+        parts = []
+        last = 0
+        first_letter = re.search(r"[A-Za-z]", text)
+        for m in SLOT_RE.finditer(text):
+            if m.group("word") and first_letter and m.start() == first_letter.start():
+                continue  # sentence-initial capital is not a proper noun
+            kind = "num" if m.group("num") else "str"
+            value = next(v for v in m.groupdict().values() if v)
+            parts.append(text[last:m.start()].lower())
+            parts.append(f"{{{kind}{len(slots)}}}")
+            slots.append((kind, value))
+            last = m.end()
+        parts.append(text[last:].lower())
+        return "".join(parts), slots
+
+    # === Plan source rewriting ===
+    @staticmethod
+    def _tokens(plan: str) -> List[tokenize.TokenInfo]:
+        return list(tokenize.generate_tokens(io.StringIO(plan).readline))
+
+    @staticmethod
+    def _is_docstring(tokens: List[tokenize.TokenInfo], i: int) -> bool:
+        before = {tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.NL, tokenize.COMMENT}
+        prev = next((t for t in reversed(tokens[:i]) if t.type not in {tokenize.NL, tokenize.COMMENT}), None)
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        return (prev is None or prev.type in before) and (nxt is None or nxt.type in {tokenize.NEWLINE, tokenize.ENDMARKER})
+
+    @classmethod
+    def _bound_slots(cls, plan: str, slots: List[Slot]) -> List[bool]:
+        """
+        Which slots the plan's code actually consumes (docstrings don't count).
+        A slot baked into a FINAL_ANSWER literal is never bound: reusing the plan
+        for another value would return the old answer.
+        """
+        tokens = cls._tokens(plan)
+        bound = [False] * len(slots)
+        baked = [False] * len(slots)
+        for i, tok in enumerate(tokens):
+            if tok.type == tokenize.STRING and not cls._is_docstring(tokens, i):
+                for j, (kind, value) in enumerate(slots):
+                    if kind == "str" and value in tok.string:
+                        bound[j] = True
+                        baked[j] = baked[j] or "FINAL_ANSWER" in tok.string
+            elif tok.type == tokenize.NUMBER:
+                for j, (kind, value) in enumerate(slots):
+                    if kind == "num" and tok.string == value:
+                        bound[j] = True
+        return [b and not k for b, k in zip(bound, baked)]
+
+    @classmethod
+    def _rewrite(cls, plan: str, old: List[Slot], new: List[Slot]) -> str:
+        """Substitute old slot values with new ones in string and number literals"""
+        lines = plan.splitlines(keepends=True)
+        offsets = [0]
+        for line in lines:
+            offsets.append(offsets[-1] + len(line))
+
+        edits = []
+        for tok in cls._tokens(plan):
+            replacement = tok.string
+            if tok.type == tokenize.STRING:
+                for (kind, value), (_, new_value) in zip(old, new):
+                    if kind == "str":
+                        replacement = replacement.replace(value, new_value)
+            elif tok.type == tokenize.NUMBER:
+                for (kind, value), (_, new_value) in zip(old, new):
+                    if kind == "num" and tok.string == value:
+                        replacement = new_value
+            if replacement != tok.string:
+                start = offsets[tok.start[0] - 1] + tok.start[1]
+                end = offsets[tok.end[0] - 1] + tok.end[1]
+                edits.append((start, end, replacement))
+
+        for start, end, replacement in reversed(edits):
+            plan = plan[:start] + replacement + plan[end:]
+        return plan
+
+    @staticmethod
+    def _distinct(slots: List[Slot]) -> bool:
+        """Slot values must not overlap, or substitution becomes ambiguous"""
+        values = [v for _, v in slots]
+        return all(a not in b for i, a in enumerate(values) for j, b in enumerate(values) if i != j)
+
+    @staticmethod
+    def _safe_value(value: str) -> bool:
+        return not re.search(r"[\"'\\{}\n]", value)
+
+    # === Public API ===
+    def lookup(self, query: str) -> Optional[str]:
+        """
+        Return a validated plan re-instantiated for query, or None on miss.
+        Bound slots are substituted; unbound slots must match the cached query exactly.
+        """
+        if not self.enabled:
+            return None
+
+        key, slots = self.template(query)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        old = [(kind, value) for kind, value, _ in entry["slots"]]
+        bound = [is_bound for _, _, is_bound in entry["slots"]]
+        frozen_match = all(b or o[1] == n[1] for o, n, b in zip(old, slots, bound))
+        if not frozen_match or not self._distinct(slots) or not all(self._safe_value(v) for _, v in slots):
+            self.misses += 1
+            return None
+
+        try:
+            plan = self._rewrite(
+                entry["plan"],
+                [o for o, b in zip(old, bound) if b],
+                [n for n, b in zip(slots, bound) if b],
+            )
+            compile(plan, "<cached_plan>", "exec")
+            if not SOLVE_RE.search(plan):
+                raise ValueError("no solve() after re-instantiation")
+        except Exception as e:
+            log("plan_cache", f"⚠️ Cached plan failed validation, dropping it: {e}")
+            self.invalidate(query)
+            self.misses += 1
+            return None
+
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_used"] = time.time()
+        self.hits += 1
+        self._served[key] = plan
+        self._dirty = True  # saved with the next store/invalidate, or by flush()
+        return plan
+
+    def store(self, query: str, plan: str) -> bool:
+        """Cache a plan that solved query; returns False if it can't be cached safely"""
+        if not self.enabled or not SOLVE_RE.search(plan):
+            return False
+
+        key, slots = self.template(query)
+        if not self._distinct(slots):
+            return False
+
+        try:
+            bound = self._bound_slots(plan, slots)
+        except (tokenize.TokenError, SyntaxError):
+            return False
+
+        self.entries[key] = {
+            "plan": plan,
+            "slots": [[kind, value, is_bound] for (kind, value), is_bound in zip(slots, bound)],
+            "hits": self.entries.get(key, {}).get("hits", 0),
+            "last_used": time.time(),
+        }
+        self._served.pop(key, None)
+        if len(self.entries) > self.max_entries:
+            oldest = sorted(self.entries, key=lambda k: self.entries[k].get("last_used", 0))
+            for stale in oldest[: len(self.entries) - self.max_entries]:
+                del self.entries[stale]
+        self._save()
+        log("plan_cache", f"💾 Cached plan for template: {key}")
+        return True
+
+    def invalidate(self, query: str, plan: Optional[str] = None):
+        """
+        Forget the plan for query's template (e.g. after it failed at runtime).
+        With plan given, only if it is the plan lookup() served for query: a freshly
+        generated plan failing says nothing about the cached one.
+        """
+        key, _ = self.template(query)
+        if plan is not None and self._served.get(key) != plan:
+            return
+        self._served.pop(key, None)
+        if self.entries.pop(key, None) is not None:
+            self._save()
+            log("plan_cache", f"🗑️ Invalidated cached plan for template: {key}")
+
+    def get_stats(self) -> Dict:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,176 @@
+# modules/prompt_builder.py
+
+"""
+Token-budgeted prompt assembly for the decision step
+Fills a decision prompt template with tool descriptions, the current input and
+past-conversation context while keeping the whole prompt under a token budget:
+  - templates are read once and re-read only when the file changes
+  - the current input (which carries FURTHER_PROCESSING_REQUIRED payloads such as
+    whole webpages) is cut in the middle, keeping the task at its head and the
+    instructions at its tail
+  - past conversations are ranked by word overlap with the current input, then
+    kept whole, reduced to their query line, or dropped as the budget runs out
+Tokens are estimated from characters (no tokenizer dependency); each build
+returns a report of the prompt's size that generate_plan logs.
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+PAST_HEADER = "📚 Relevant Past Conversations:"
+ENTRY_RE = re.compile(r"\n(?=\d+\. \[)")  # format_context entries start "1. [date]"
+WORD_RE = re.compile(r"\w{3,}")
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return int(len(text) / chars_per_token + 0.999) if text else 0
+
+
+class PromptBuilder:
+    """Builds decision prompts within a token budget and keeps per-call size stats"""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        input_tokens: Optional[int] = None,
+        past_context_tokens: Optional[int] = None,
+        chars_per_token: Optional[float] = None,
+    ):
+        config = self._load_config()
+        self.max_tokens = max_tokens or config.get("max_tokens", 8000)
+        self.input_tokens = input_tokens or config.get("input_tokens", 3000)
+        self.past_context_tokens = past_context_tokens or config.get("past_context_tokens", 800)
+        self.chars_per_token = chars_per_token or config.get("chars_per_token", 4.0)
+        self._templates: Dict[str, Tuple[int, str]] = {}  # path → (mtime_ns, text)
+        self.stats = {"calls": 0, "total_tokens": 0, "max_tokens": 0, "truncated_inputs": 0, "dropped_context": 0}
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("prompt", {}) or {}
+        except Exception:
+            return {}
+
+    def tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.chars_per_token)
+
+    def template(self, path: str) -> str:
+        """Prompt template, cached until the file's mtime changes"""
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = self._templates.get(path)
+        if cached is None or cached[0] != mtime_ns:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = (mtime_ns, f.read())
+            self._templates[path] = cached
+        return cached[1]
+
+    # === Fitting ===
+    def truncate_middle(self, text: str, max_tokens: int) -> str:
+        """Keep the head and the tail of text within max_tokens, marking the cut"""
+        max_chars = int(max_tokens * self.chars_per_token)
+        if len(text) <= max_chars:
+            return text
+        marker = "\n\n[... {} characters omitted ...]\n\n"
+        keep = max(max_chars - len(marker.format(len(text))), 0)
+        head = keep * 2 // 3
+        tail = keep - head
+        return text[:head] + marker.format(len(text) - keep) + (text[-tail:] if tail else "")
+
+    @staticmethod
+    def _words(text: str) -> set:
+        return set(WORD_RE.findall(text.lower()))
+
+    def fit_past_context(self, past_context: str, query: str, max_tokens: int) -> Tuple[str, int]:
+        """
+        Past-conversation entries ranked by word overlap with query and packed
+        into max_tokens: whole while they fit, then as their query line only.
+        Returns (context, entries dropped entirely).
+        """
+        body = past_context.strip()
+        if body.startswith(PAST_HEADER):
+            body = body[len(PAST_HEADER):]
+        body = body.strip().removesuffix("---").strip()
+        entries = [e.strip() for e in ENTRY_RE.split("\n" + body) if e.strip()]
+        if not entries:
+            return self.truncate_middle(past_context, max_tokens), 0
+
+        query_words = self._words(query)
+        ranked = sorted(
+            range(len(entries)),
+            key=lambda i: (-len(query_words & self._words(entries[i])), i),  # ties keep search order
+        )
+
+        used = self.tokens(PAST_HEADER) + 2
+        kept, dropped = [], 0
+        for i in ranked:
+            text = re.sub(r"^\d+\. ", "", entries[i])
+            summary = "\n".join(text.splitlines()[:2])  # "[date]" + "   Query: ..."
+            for candidate in (text, summary):
+                cost = self.tokens(candidate) + 1
+                if used + cost <= max_tokens:
+                    kept.append(candidate)
+                    used += cost
+                    break
+            else:
+                dropped += 1
+        if not kept:
+            return "", dropped
+        lines = [PAST_HEADER] + [f"\n{n}. {text}" for n, text in enumerate(kept, 1)] + ["\n---\n"]
+        return "\n".join(lines), dropped
+
+    def build(
+        self,
+        prompt_path: str,
+        user_input: str,
+        tool_descriptions: Optional[str],
+        past_context: Optional[str] = None,
+    ) -> Tuple[str, Dict]:
+        """Fill the template within the budget; returns (prompt, size report)"""
+        template = self.template(prompt_path)
+        fixed = self.tokens(template) + self.tokens(tool_descriptions or "")
+        available = max(self.max_tokens - fixed, 0)
+
+        fitted_input = self.truncate_middle(user_input, min(self.input_tokens, available))
+        input_tokens = self.tokens(fitted_input)
+
+        fitted_context, dropped = "", 0
+        if past_context:
+            context_budget = min(self.past_context_tokens, max(available - input_tokens, 0))
+            fitted_context, dropped = self.fit_past_context(past_context, user_input, context_budget)
+
+        if fitted_context:
+            user_input_with_context = f"{fitted_context}\n\n🎯 Current Query:\n{fitted_input}"
+        else:
+            user_input_with_context = fitted_input
+
+        prompt = template.format(
+            tool_descriptions=tool_descriptions,
+            user_input=user_input_with_context,
+        )
+
+        report = {
+            "tokens": self.tokens(prompt),
+            "template_tokens": self.tokens(template),
+            "tool_tokens": self.tokens(tool_descriptions or ""),
+            "input_tokens": input_tokens,
+            "context_tokens": self.tokens(fitted_context),
+            "input_truncated": fitted_input != user_input,
+            "context_dropped": dropped,
+        }
+        self.stats["calls"] += 1
+        self.stats["total_tokens"] += report["tokens"]
+        self.stats["max_tokens"] = max(self.stats["max_tokens"], report["tokens"])
+        self.stats["truncated_inputs"] += report["input_truncated"]
+        self.stats["dropped_context"] += dropped
+        return prompt, report
+
+    def get_stats(self) -> Dict:
+        calls = self.stats["calls"]
+        return {**self.stats, "mean_tokens": round(self.stats["total_tokens"] / calls) if calls else 0}
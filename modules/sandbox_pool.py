@@ -0,0 +1,299 @@
+# modules/sandbox_pool.py
+
+"""
+Process pool for solve() plans
+Keeps `workers` warm sandbox worker processes (modules/sandbox_worker.py) and
+runs each plan in one of them instead of exec-ing LLM-generated code in the
+agent's own process and event loop. A plan's mcp.call_tool calls come back
+over the worker's pipe and are made here, through the agent's dispatcher.
+
+Limits per plan: wall-clock seconds (the worker is killed and replaced), CPU
+seconds and address-space megabytes (enforced inside the worker). Cancelling
+the awaiting task (e.g. a losing speculative candidate) kills its worker too.
+Workers are reused across plans and recycled after max_plans_per_worker.
+
+A worker that can't be started is retried respawn_attempts times with
+exponential backoff. If start() fails, or the pool runs out of workers with
+none being started, run() raises instead of waiting and the pool is reset, so
+the caller can fall back and a later run() starts it afresh.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+WORKER_SCRIPT = Path(__file__).with_name("sandbox_worker.py")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+class SandboxWorker:
+    """One worker process and its pipes"""
+
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.plans = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    def send(self, message: Dict):
+        self.process.stdin.write(json.dumps(message, default=str).encode("utf-8") + b"\n")
+
+    async def receive(self) -> Dict:
+        line = await self.process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"sandbox worker exited (code {await self.process.wait()})")
+        return json.loads(line)
+
+    def kill(self):
+        if self.alive:
+            self.process.kill()
+
+
+class SandboxPool:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout_seconds: Optional[float] = None,
+        cpu_seconds: Optional[float] = None,
+        memory_mb: Optional[int] = None,
+        max_plans_per_worker: Optional[int] = None,
+    ):
+        config = self._load_config()
+        self.size = workers or config.get("workers", 2)
+        self.timeout_seconds = timeout_seconds or config.get("timeout_seconds", 60)
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else config.get("cpu_seconds", 30)
+        self.memory_mb = memory_mb if memory_mb is not None else config.get("memory_mb", 1024)
+        self.max_plans_per_worker = max_plans_per_worker or config.get("max_plans_per_worker", 100)
+        self.respawn_attempts = config.get("respawn_attempts", 3)
+        self.respawn_backoff_seconds = config.get("respawn_backoff_seconds", 0.5)
+        self.stats = {"plans": 0, "timeouts": 0, "cancelled": 0, "crashed": 0, "spawned": 0}
+        self._idle: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._workers: set = set()
+        self._replenishing: set = set()  # _replenish tasks still trying to start a worker
+        self._starting: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("sandbox", {}) or {}
+        except Exception:
+            return {}
+
+    # === Workers ===
+    async def _spawn(self) -> SandboxWorker:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, str(WORKER_SCRIPT), "--memory-mb", str(self.memory_mb or 0),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            limit=MAX_MESSAGE_BYTES,
+        )
+        worker = SandboxWorker(process)
+        self._workers.add(worker)
+        self.stats["spawned"] += 1
+        try:
+            ready = await worker.receive()
+            if ready.get("type") != "ready":
+                raise RuntimeError(f"sandbox worker sent {ready} instead of ready")
+        except BaseException:
+            worker.kill()
+            self._workers.discard(worker)
+            raise
+        return worker
+
+    async def _replenish(self):
+        idle = self._idle
+        for attempt in range(self.respawn_attempts):
+            if idle is not self._idle:
+                return  # the pool was closed or restarted meanwhile
+            try:
+                worker = await self._spawn()
+            except Exception as e:
+                log("sandbox", f"⚠️ Could not start a sandbox worker ({e}), attempt {attempt + 1}/{self.respawn_attempts}")
+                if attempt + 1 < self.respawn_attempts:
+                    await asyncio.sleep(self.respawn_backoff_seconds * 2 ** attempt)
+                continue
+            if idle is self._idle:
+                idle.put_nowait(worker)
+            else:
+                self._workers.discard(worker)
+                worker.kill()
+            return
+
+    def _retire(self, worker: SandboxWorker):
+        worker.kill()
+        if worker not in self._workers:
+            return  # from before a close() or restart: nothing to replace
+        self._workers.discard(worker)
+        if self._loop is not None and not self._loop.is_closed():
+            task = self._loop.create_task(self._replenish())
+            self._replenishing.add(task)
+            task.add_done_callback(self._replenishing.discard)
+
+    async def start(self):
+        """Start the warm workers (also done lazily by the first run()); raises if any fails"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._starting is None or self._starting.get_loop() is not loop:
+            self.shutdown()  # workers of a previous event loop can't be driven from this one
+            self._starting = loop.create_task(self._start(loop))
+        starting = self._starting
+        try:
+            await asyncio.shield(starting)  # concurrent callers wait for the same workers
+        finally:
+            if starting.done() and self._starting is starting:
+                self._starting = None
+
+    async def _start(self, loop: asyncio.AbstractEventLoop):
+        spawned = await asyncio.gather(*(self._spawn() for _ in range(self.size)), return_exceptions=True)
+        failed = [result for result in spawned if isinstance(result, BaseException)]
+        if failed:
+            for worker in spawned:
+                if isinstance(worker, SandboxWorker):
+                    worker.kill()
+                    self._workers.discard(worker)
+            raise RuntimeError(f"{len(failed)} of {self.size} sandbox workers failed to start: {failed[0]}")
+        idle = asyncio.Queue()
+        for worker in spawned:
+            idle.put_nowait(worker)
+        self._loop, self._idle = loop, idle
+        log("sandbox", f"🧪 {self.size} sandbox workers ready")
+
+    async def _acquire(self) -> SandboxWorker:
+        """An idle worker; raises (and resets the pool) once no worker is left or being started"""
+        idle = self._idle
+        while True:
+            if idle is not self._idle:
+                raise RuntimeError("sandbox pool was closed")
+            if idle.empty() and not self._workers and not self._replenishing:
+                self.shutdown()
+                raise RuntimeError("no sandbox workers left and none could be restarted")
+            try:
+                return await asyncio.wait_for(idle.get(), 1)
+            except asyncio.TimeoutError:
+                continue  # still busy or starting: check again
+
+    async def close(self):
+        """Let the workers exit (EOF on stdin) and wait for them; call before the event loop ends"""
+        workers = list(self._workers)
+        self._workers.clear()
+        self._loop = None
+        self._idle = None
+        self._starting = None
+        self._replenishing.clear()
+        for worker in workers:
+            if worker.alive:
+                worker.process.stdin.close()
+        for worker in workers:
+            try:
+                await asyncio.wait_for(worker.process.wait(), 2)
+            except asyncio.TimeoutError:
+                worker.kill()
+                await worker.process.wait()
+
+    def shutdown(self):
+        """Kill the workers without waiting"""
+        for worker in list(self._workers):
+            worker.kill()
+        self._workers.clear()
+        self._loop = None
+        self._idle = None
+        self._replenishing.clear()
+        if self._starting is not None and not self._starting.done():
+            self._starting.cancel()
+        self._starting = None
+
+    # === Plans ===
+    async def run(self, code: str, dispatcher: Any, max_tool_calls: int = 5) -> str:
+        """Run a solve() plan in a worker; returns what run_python_sandbox returns"""
+        await self.start()
+        idle = self._idle
+        worker = await self._acquire()
+        if not worker.alive:
+            self._retire(worker)
+            return await self.run(code, dispatcher, max_tool_calls)
+
+        self.stats["plans"] += 1
+        worker.plans += 1
+        keep = False
+        tool_tasks = set()
+        try:
+            worker.send({
+                "type": "run",
+                "code": code,
+                "tools": sorted(dispatcher.tool_map) if hasattr(dispatcher, "tool_map") else [],
+                "max_tool_calls": max_tool_calls,
+                "cpu_seconds": self.cpu_seconds,
+            })
+            deadline = time.monotonic() + self.timeout_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                message = await asyncio.wait_for(worker.receive(), remaining)
+                if message["type"] == "call_tool":
+                    task = asyncio.create_task(self._call_tool(worker, dispatcher, message))
+                    tool_tasks.add(task)
+                    task.add_done_callback(tool_tasks.discard)
+                elif message["type"] == "done":
+                    keep = worker.plans < self.max_plans_per_worker
+                    return message["result"]
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            log("sandbox", f"⏰ solve() exceeded {self.timeout_seconds}s — worker killed")
+            return f"[sandbox error: solve() exceeded the {self.timeout_seconds}s time limit]"
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            raise
+        except Exception as e:
+            self.stats["crashed"] += 1
+            log("sandbox", f"⚠️ Sandbox worker failed: {e}")
+            return f"[sandbox error: worker crashed ({e})]"
+        finally:
+            for task in tool_tasks:
+                task.cancel()
+            if keep and idle is not None and idle is self._idle:
+                idle.put_nowait(worker)
+            else:  # recycled, broken, or the pool was closed or restarted meanwhile
+                self._retire(worker)
+
+    async def _call_tool(self, worker: SandboxWorker, dispatcher: Any, message: Dict):
+        try:
+            result = await dispatcher.call_tool(message["tool"], message["arguments"])
+            reply = {"type": "tool_result", "id": message["id"], "result": result.model_dump(mode="json")}
+        except Exception as e:
+            reply = {"type": "tool_error", "id": message["id"], "error": str(e)}
+        if worker.alive:
+            try:
+                worker.send(reply)
+            except (ConnectionError, RuntimeError):
+                pass  # the worker was killed while the tool ran
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+        }
+
+
+sandbox_pool = SandboxPool()
@@ -0,0 +1,181 @@
+# modules/sandbox_worker.py
+
+"""
+Sandbox worker process
+Runs solve() plans for modules/sandbox_pool.py, one at a time, for as long as
+the pool keeps it. Newline-delimited JSON on stdin/stdout:
+
+  pool → worker   {"type": "run", "code", "tools", "max_tool_calls", "cpu_seconds"}
+                  {"type": "tool_result", "id", "result"}  /  {"type": "tool_error", "id", "error"}
+  worker → pool   {"type": "ready"}
+                  {"type": "call_tool", "id", "tool", "arguments"}   (mcp.call_tool inside a plan)
+                  {"type": "done", "result"}                          (same string run_python_sandbox returns)
+
+The protocol owns the original stdout; fd 1 is pointed at stderr so plan
+output (print, C extensions) cannot corrupt it. Memory is capped for the
+process's lifetime (RLIMIT_AS) and CPU time per plan (soft RLIMIT_CPU,
+surfaced as an exception through SIGXCPU). Wall-clock limits and
+cancellation are the pool's job: it kills the process.
+
+Run by the pool as: python modules/sandbox_worker.py [--memory-mb N]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import signal
+import sys
+import types
+from typing import Dict, Optional
+
+from mcp.types import CallToolResult
+
+
+class CpuLimitExceeded(Exception):
+    pass
+
+
+def _on_sigxcpu(signum, frame):
+    raise CpuLimitExceeded("solve() exceeded its CPU time limit")
+
+
+class Worker:
+    def __init__(self, reader: asyncio.StreamReader, out):
+        self.reader = reader
+        self.out = out
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.plan: Optional[asyncio.Task] = None
+
+    def send(self, message: Dict):
+        self.out.write(json.dumps(message, default=str).encode("utf-8") + b"\n")
+        self.out.flush()
+
+    async def call_tool(self, tool_name: str, arguments: dict) -> CallToolResult:
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.send({"type": "call_tool", "id": self.next_id, "tool": tool_name, "arguments": arguments})
+        return CallToolResult.model_validate(await future)
+
+    def sandbox_mcp(self, available_tools, max_tool_calls: int):
+        worker = self
+
+        class SandboxMCP:
+            def __init__(self):
+                self.call_count = 0
+                self.available_tools = set(available_tools)
+
+            async def call_tool(self, tool_name: str, input_dict: dict):
+                self.call_count += 1
+                if self.call_count > max_tool_calls:
+                    raise RuntimeError(f"Exceeded max tool calls ({max_tool_calls}) in solve() plan.")
+
+                # Validate tool exists
+                if self.available_tools and tool_name not in self.available_tools:
+                    available_list = ', '.join(sorted(list(self.available_tools)[:10]))
+                    raise ValueError(
+                        f"Tool '{tool_name}' not found on any server.\n"
+                        f"Available tools include: {available_list}...\n"
+                        f"Please use only tools from the Tool Catalog."
+                    )
+
+                # REAL tool call, made by the agent process
+                return await worker.call_tool(tool_name, input_dict)
+
+        return SandboxMCP()
+
+    async def run_plan(self, request: Dict) -> str:
+        # Fresh module scope per plan
+        sandbox = types.ModuleType("sandbox")
+        sandbox.mcp = self.sandbox_mcp(request.get("tools", []), request.get("max_tool_calls", 5))
+        sandbox.__dict__["json"] = json
+        sandbox.__dict__["re"] = re
+
+        cpu_seconds = request.get("cpu_seconds")
+        previous = resource.getrlimit(resource.RLIMIT_CPU)
+        if cpu_seconds:
+            used = resource.getrusage(resource.RUSAGE_SELF)
+            soft = int(used.ru_utime + used.ru_stime + cpu_seconds) + 1
+            hard = previous[1]
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)  # the soft limit may not exceed a finite hard one
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+        try:
+            exec(compile(request["code"], "<solve_plan>", "exec"), sandbox.__dict__)
+
+            solve_fn = sandbox.__dict__.get("solve")
+            if solve_fn is None:
+                raise ValueError("No solve() function found in plan.")
+
+            if asyncio.iscoroutinefunction(solve_fn):
+                result = await solve_fn()
+            else:
+                result = solve_fn()
+
+            # Clean result formatting
+            if isinstance(result, dict) and "result" in result:
+                return f"{result['result']}"
+            elif isinstance(result, dict):
+                return f"{json.dumps(result)}"
+            elif isinstance(result, list):
+                return f"{' '.join(str(r) for r in result)}"
+            else:
+                return f"{result}"
+        except BaseException as e:  # incl. MemoryError, RecursionError, SystemExit from the plan
+            print(f"[sandbox] ⚠️ Execution error: {e}", file=sys.stderr)
+            return f"[sandbox error: {str(e) or type(e).__name__}]"
+        finally:
+            if cpu_seconds:
+                resource.setrlimit(resource.RLIMIT_CPU, previous)
+
+    async def serve(self):
+        self.send({"type": "ready"})
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break  # pool closed our stdin
+            message = json.loads(line)
+            kind = message.get("type")
+            if kind == "run":  # the pool sends one plan at a time
+                self.plan = asyncio.create_task(self.run_plan(message))
+                self.plan.add_done_callback(self.finish)
+            elif kind in ("tool_result", "tool_error"):
+                future = self.pending.pop(message["id"], None)
+                if future is None or future.done():
+                    continue
+                if kind == "tool_result":
+                    future.set_result(message["result"])
+                else:
+                    future.set_exception(RuntimeError(message["error"]))
+
+    def finish(self, task: asyncio.Task):
+        self.pending.clear()
+        self.send({"type": "done", "result": task.result()})
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="solve() plan worker for the sandbox pool")
+    parser.add_argument("--memory-mb", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.memory_mb:
+        limit = args.memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+
+    out = os.fdopen(os.dup(1), "wb")  # protocol channel
+    os.dup2(2, 1)                     # anything else written to stdout lands on stderr
+    sys.stdout = sys.stderr
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=64 * 1024 * 1024)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    await Worker(reader, out).serve()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+# modules/tool_cache.py
+
+"""
+Tool result memoisation for MultiMCP
+A tool's results are reused for calls with the same arguments when the tool
+is declared cacheable, so retries and repeated queries don't respawn its
+server to recompute them. Cacheability comes from the `tool_cache.tools`
+section of profiles.yaml:
+
+  add: pure                       # deterministic: kept until evicted
+  search_stored_documents: 300    # idempotent read: kept for 300 seconds
+
+or, for tools not listed there, from MCP tool annotations where the server
+provides them (idempotentHint without openWorldHint: pure; readOnlyHint:
+`annotated_ttl` seconds). Results flagged isError are never stored. At most
+`max_entries` results are kept, least recently used evicted first.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from modules.metrics import registry
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+lookups = registry.counter("tool_cache_lookups_total", "Tool result cache lookups by tool and outcome (hit, miss)")
+
+# Optional logging fallback
+try:
+    from agent import log
+except ImportError:
+    import datetime
+    def log(stage: str, msg: str):
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        print(f"[{now}] [{stage}] {msg}")
+
+
+class ToolResultCache:
+    """LRU of tool results keyed by tool name and arguments"""
+
+    def __init__(self, max_entries: Optional[int] = None, enabled: Optional[bool] = None, tools: Optional[Dict] = None):
+        config = self._load_config()
+        self.enabled = config.get("enabled", True) if enabled is None else enabled
+        self.max_entries = max_entries or config.get("max_entries", 512)
+        self.annotated_ttl = config.get("annotated_ttl", 60)
+        self.tools: Dict[str, Any] = (config.get("tools", {}) or {}) if tools is None else tools
+        self.entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()  # key → (expires_at, result)
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("tool_cache", {}) or {}
+        except Exception:
+            return {}
+
+    # === Policy ===
+    def policy(self, tool_name: str, tool: Any = None) -> Tuple[bool, Optional[float]]:
+        """(cacheable, ttl seconds or None for no expiry)"""
+        declared = self.tools.get(tool_name)
+        if declared == "pure":
+            return True, None
+        if isinstance(declared, (int, float)) and not isinstance(declared, bool) and declared > 0:
+            return True, float(declared)
+        if declared is not None:
+            return False, None  # explicitly not cacheable (false, 0, ...)
+
+        annotations = getattr(tool, "annotations", None)  # MCP ToolAnnotations, on servers that declare them
+        if annotations is not None:
+            if getattr(annotations, "idempotentHint", False) and getattr(annotations, "openWorldHint", True) is False:
+                return True, None
+            if getattr(annotations, "readOnlyHint", False):
+                return True, float(self.annotated_ttl)
+        return False, None
+
+    @staticmethod
+    def _key(tool_name: str, arguments: dict) -> str:
+        return json.dumps([tool_name, arguments], sort_keys=True, ensure_ascii=False, default=str)
+
+    # === Lookup / store ===
+    def lookup(self, tool_name: str, arguments: dict, tool: Any = None) -> Optional[Any]:
+        """A copy of the cached result, or None"""
+        if not self.enabled or not self.policy(tool_name, tool)[0]:
+            return None
+        key = self._key(tool_name, arguments)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= time.monotonic():
+            del self.entries[key]
+            self.stats["expired"] += 1
+            entry = None
+        if entry is None:
+            self.stats["misses"] += 1
+            lookups.inc(tool=tool_name, outcome="miss")
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        lookups.inc(tool=tool_name, outcome="hit")
+        log("tool_cache", f"♻️ {tool_name} answered from cache")
+        return entry[1].model_copy(deep=True)
+
+    def store(self, tool_name: str, arguments: dict, result: Any, tool: Any = None):
+        cacheable, ttl = self.policy(tool_name, tool) if self.enabled else (False, None)
+        if not cacheable or getattr(result, "isError", False):
+            return
+        key = self._key(tool_name, arguments)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self.entries[key] = (expires_at, result.model_copy(deep=True))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "entries": len(self.entries)}
+
+
+tool_cache = ToolResultCache()
@@ -0,0 +1,240 @@
+# modules/tracing.py
+
+"""
+Lightweight latency tracing
+Spans with parent/child relations, carried through asyncio tasks and
+asyncio.to_thread workers by a context variable. A trace is opened per query
+(tracer.trace) and every span started inside it (perception, planning, LLM
+calls, sandbox runs, MCP spawn/initialize/call, embeddings, FAISS search)
+becomes part of it; spans started outside any trace are free no-ops.
+
+Finished traces can be summarised (time per span name) and exported as plain
+JSON or as Chrome trace-event files (chrome://tracing, ui.perfetto.dev).
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import yaml
+
+ROOT = Path(__file__).parent.parent
+PROFILE_YAML = ROOT / "config" / "profiles.yaml"
+
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "trace_id", "root", "start", "end", "lane", "attrs")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[int], attrs: Dict, root: bool = False):
+        self.name = name
+        self.root = root
+        self.span_id = next(_ids)
+        self.parent_id = parent_id
+        self.trace_id = trace_id
+        self.attrs = attrs
+        self.lane = _lane()
+        self.start = time.time()
+        self.end: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def set(self, **attrs):
+        """Attach attributes discovered while the span runs"""
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "trace_id": self.trace_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+        }
+
+
+def _lane():
+    """Concurrency lane of the caller: its asyncio task, else its thread"""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return ("task", id(task)) if task is not None else ("thread", threading.get_ident())
+
+
+class _NullSpan:
+    """Stand-in yielded when tracing is off or no trace is active"""
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict, root: bool):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.root = root
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        parent = _current.get()
+        if self.root:
+            self.span = Span(self.name, uuid.uuid4().hex[:12], parent.span_id if parent else None, self.attrs, root=True)
+        elif parent is None:
+            return NULL_SPAN
+        else:
+            self.span = Span(self.name, parent.trace_id, parent.span_id, self.attrs)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        self.span.end = time.time()
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        _current.reset(self.token)
+        self.tracer._finish(self.span, self.root)
+        return False
+
+
+class _NullContext:
+    def __enter__(self):
+        return NULL_SPAN
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+class Tracer:
+    """Collects spans per trace and keeps the most recent finished traces"""
+
+    def __init__(self, enabled: Optional[bool] = None, export: Optional[str] = None,
+                 export_dir: Optional[str] = None, max_traces: int = 64):
+        config = self._load_config()
+        self.enabled = config.get("enabled", True) if enabled is None else enabled
+        self.export = export if export is not None else config.get("export")  # None, "json" or "chrome"
+        self.export_dir = Path(export_dir or config.get("dir", "traces"))
+        self.max_traces = max_traces
+        self.traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_config() -> Dict:
+        try:
+            return yaml.safe_load(PROFILE_YAML.read_text()).get("tracing", {}) or {}
+        except Exception:
+            return {}
+
+    # === Recording ===
+    def trace(self, name: str, **attrs):
+        """Open a new trace (a root span); nested traces become their own trace"""
+        return _SpanContext(self, name, attrs, root=True) if self.enabled else _NULL_CONTEXT
+
+    def span(self, name: str, **attrs):
+        """Child span of the current one; a no-op outside a trace"""
+        if not self.enabled or _current.get() is None:
+            return _NULL_CONTEXT
+        return _SpanContext(self, name, attrs, root=False)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        return _current.get()
+
+    def _finish(self, span: Span, root: bool):
+        with self._lock:
+            spans = self.traces.setdefault(span.trace_id, [])
+            spans.append(span)
+            if root:
+                self.traces.move_to_end(span.trace_id)
+                while len(self.traces) > self.max_traces:
+                    self.traces.popitem(last=False)
+        if root and self.export:
+            self.export_trace(span.trace_id)
+
+    def spans(self, trace_id: str) -> List[Span]:
+        with self._lock:
+            return sorted(self.traces.get(trace_id, []), key=lambda s: s.start)
+
+    # === Reporting ===
+    def summary(self, trace_id: str) -> Dict:
+        """Root duration plus count and total seconds per span name (slowest first)"""
+        spans = self.spans(trace_id)
+        root = next((span for span in spans if span.root), None)
+        totals: Dict[str, Dict] = {}
+        for span in spans:
+            if span.root:
+                continue
+            entry = totals.setdefault(span.name, {"count": 0, "total_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += span.duration
+        for entry in totals.values():
+            entry["total_s"] = round(entry["total_s"], 3)
+        return {
+            "trace_id": trace_id,
+            "name": root.name if root else None,
+            "duration_s": round(root.duration, 3) if root else 0.0,
+            "spans": dict(sorted(totals.items(), key=lambda kv: -kv[1]["total_s"])),
+        }
+
+    def format_summary(self, trace_id: str) -> str:
+        summary = self.summary(trace_id)
+        parts = [f"{name} {entry['total_s']:.2f}s×{entry['count']}" for name, entry in summary["spans"].items()]
+        return f"{summary['name']} {summary['duration_s']:.2f}s: " + (", ".join(parts) or "no spans")
+
+    def to_chrome(self, trace_id: str) -> Dict:
+        """Chrome trace-event JSON: one complete ("X") event per span, one row per task/thread"""
+        spans = self.spans(trace_id)
+        lanes: Dict = {}
+        events = []
+        for span in spans:
+            tid = lanes.setdefault(span.lane, len(lanes) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ph": "X",
+                "ts": round(span.start * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"span_id": span.span_id, "parent_id": span.parent_id, **span.attrs},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace_id}}
+
+    def export_trace(self, trace_id: str, path: Optional[str] = None, fmt: Optional[str] = None) -> Path:
+        """Write a trace as "chrome" (default) or "json" (span list); returns the file path"""
+        fmt = fmt or self.export or "chrome"
+        if fmt == "chrome":
+            payload = self.to_chrome(trace_id)
+        else:
+            payload = {"trace_id": trace_id, "summary": self.summary(trace_id),
+                       "spans": [span.to_dict() for span in self.spans(trace_id)]}
+        target = Path(path) if path else self.export_dir / f"trace-{trace_id}.{fmt}.json"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(json.dumps(payload, default=str), encoding="utf-8")
+        return target
+
+
+tracer = Tracer()
@@ -0,0 +1,113 @@
+# test_agent_server.py
+
+"""
+Test suite for the multi-session agent server
+Run with: python test_agent_server.py
+"""
+
+import asyncio
+import json
+import time
+
+from agent_server import SERVER_BUSY, AgentServer, RpcError
+
+
+def make_runner(delay: float, log: list):
+    """Stand-in for agent.run_query: records (query, session memory id) and sleeps"""
+    async def run(query, state):
+        if state.session_id is None:
+            state.session_id = f"memory-{len(log)}"
+        log.append(("start", query, state.session_id))
+        await asyncio.sleep(delay)
+        log.append(("end", query, state.session_id))
+        return {"status": "answer", "answer": f"answer to {query}", "message": None}
+    return run
+
+
+def test_concurrency_and_isolation():
+    """Sessions run concurrently; queries of one session run in order on its own state"""
+    print("=" * 60)
+    print("TESTING CONCURRENT SESSIONS")
+    print("=" * 60)
+
+    async def scenario():
+        events = []
+        server = AgentServer(make_runner(0.2, events), max_concurrent=8, max_queued=8)
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(server.solve(f"q{i}", session=f"user{i}") for i in range(6)),
+            server.solve("follow-up", session="user0"),
+        )
+        return results, events, time.perf_counter() - start, server
+
+    results, events, elapsed, server = asyncio.run(scenario())
+    print(f"  7 queries in {elapsed:.2f}s, stats {server.get_stats()}")
+    assert elapsed < 0.6  # six sessions overlap; user0's follow-up waits for q0 only
+    assert results[6]["answer"] == "answer to follow-up"
+    user0 = [e for e in events if e[1] in ("q0", "follow-up")]
+    assert [e[:2] for e in user0] == [("start", "q0"), ("end", "q0"), ("start", "follow-up"), ("end", "follow-up")]
+    assert len({e[2] for e in user0}) == 1  # same memory session carried over
+    assert len({e[2] for e in events}) == 6
+
+
+def test_admission_control():
+    """Beyond max_concurrent + max_queued, requests fail fast with SERVER_BUSY"""
+    print("\n" + "=" * 60)
+    print("TESTING ADMISSION CONTROL")
+    print("=" * 60)
+
+    async def scenario():
+        server = AgentServer(make_runner(0.2, []), max_concurrent=2, max_queued=1)
+        outcomes = await asyncio.gather(*(server.solve(f"q{i}") for i in range(5)), return_exceptions=True)
+        return outcomes, server
+
+    outcomes, server = asyncio.run(scenario())
+    busy = [o for o in outcomes if isinstance(o, RpcError)]
+    print(f"  {len(outcomes) - len(busy)} served, {len(busy)} rejected")
+    assert len(busy) == 2 and all(o.code == SERVER_BUSY for o in busy)
+    assert server.get_stats()["completed"] == 3 and server.get_stats()["admitted"] == 0
+
+
+def test_json_rpc_over_tcp():
+    """Requests on one connection are answered as they finish, with JSON-RPC errors for bad input"""
+    print("\n" + "=" * 60)
+    print("TESTING JSON-RPC TRANSPORT")
+    print("=" * 60)
+
+    async def scenario():
+        server = AgentServer(make_runner(0.05, []), max_inflight_per_connection=2)
+        tcp = await asyncio.start_server(server.serve_connection, "127.0.0.1", 0)
+        port = tcp.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        requests = [
+            {"jsonrpc": "2.0", "id": 1, "method": "solve", "params": {"query": "hello", "session": "s"}},
+            {"jsonrpc": "2.0", "id": 2, "method": "solve", "params": {"query": ""}},
+            {"jsonrpc": "2.0", "id": 3, "method": "nope"},
+            {"jsonrpc": "2.0", "id": 4, "method": "stats"},
+        ]
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b"\n")
+        writer.write(b"{not json\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in range(5)]
+        writer.close()
+        tcp.close()
+        await tcp.wait_closed()
+        return responses
+
+    responses = asyncio.run(scenario())
+    by_id = {r["id"]: r for r in responses}
+    print(f"  Responses: {[(r['id'], 'error' in r) for r in responses]}")
+    assert by_id[1]["result"] == {"session": "s", "status": "answer", "answer": "answer to hello", "message": None}
+    assert by_id[2]["error"]["code"] == -32602
+    assert by_id[3]["error"]["code"] == -32601
+    assert by_id[4]["result"]["connections"] == 1
+    assert by_id[None]["error"]["code"] == -32700
+
+
+if __name__ == "__main__":
+    print("\n🧪 AGENT SERVER TEST SUITE\n")
+    test_concurrency_and_isolation()
+    test_admission_control()
+    test_json_rpc_over_tcp()
+    print("\n✅ ALL TESTS COMPLETED")
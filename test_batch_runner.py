@@ -0,0 +1,81 @@
+# test_batch_runner.py
+
+"""
+Test suite for the batch query runner
+Run with: python test_batch_runner.py
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from batch_runner import completed_ids, run_batch
+
+LINES = [
+    {"id": "a", "query": "What is 2 + 2?"},
+    {"id": "b", "query": "fail once"},
+    "bare string query",
+    {"id": "c", "text": "no query field"},
+    {"id": "d", "query": "What is the capital of France?"},
+]
+
+
+def write_input() -> Path:
+    path = Path(tempfile.mkdtemp()) / "queries.jsonl"
+    path.write_text("\n".join(json.dumps(line) for line in LINES) + "\n{torn", encoding="utf-8")
+    return path
+
+
+def make_runner(calls: list, failing: set):
+    async def run(query, state):
+        calls.append(query)
+        await asyncio.sleep(0.2)
+        if query in failing:
+            raise RuntimeError("model timeout")
+        return {"status": "answer", "answer": f"answer to {query}", "message": None, "steps": 1}
+    return run
+
+
+def test_batch_and_resume():
+    """Queries run concurrently into JSONL; a re-run only retries what has no result"""
+    print("=" * 60)
+    print("TESTING BATCH RUN AND RESUME")
+    print("=" * 60)
+
+    input_path = write_input()
+    output_path = input_path.with_suffix(".results.jsonl")
+
+    calls = []
+    start = time.perf_counter()
+    summary = asyncio.run(run_batch(input_path, output_path, make_runner(calls, {"fail once"}), concurrency=4))
+    elapsed = time.perf_counter() - start
+    print(f"  First run: {summary} in {elapsed:.2f}s")
+    assert summary["completed"] == 3 and summary["errors"] == 1
+    assert elapsed < 0.5  # four queries at once, not one after another
+
+    records = {r["id"]: r for r in map(json.loads, output_path.read_text(encoding="utf-8").splitlines())}
+    assert set(records) == {"a", "b", "3", "d"}
+    assert records["a"]["answer"] == "answer to What is 2 + 2?" and records["a"]["steps"] == 1
+    assert records["b"]["status"] == "error" and records["b"]["message"] == "model timeout"
+    assert all("elapsed_s" in r for r in records.values())
+
+    # Interrupted mid-write: the torn line is ignored, the error is retried
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "d", "sta')
+    calls.clear()
+    summary = asyncio.run(run_batch(input_path, output_path, make_runner(calls, set()), concurrency=4))
+    print(f"  Resumed: {summary}")
+    assert calls == ["fail once"] and summary["skipped"] == 3 and summary["completed"] == 1
+    assert completed_ids(output_path) == {"a", "b", "3", "d"}
+
+    summary = asyncio.run(run_batch(input_path, output_path, make_runner(calls, set()), resume=False))
+    assert summary["completed"] == 4
+    assert len(output_path.read_text(encoding="utf-8").splitlines()) == 4
+
+
+if __name__ == "__main__":
+    print("\n🧪 BATCH RUNNER TEST SUITE\n")
+    test_batch_and_resume()
+    print("\n✅ ALL TESTS COMPLETED")
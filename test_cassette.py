@@ -0,0 +1,152 @@
+# test_cassette.py
+
+"""
+Test suite for LLM / MCP record and replay
+Run with: python test_cassette.py
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from batch_runner import run_batch
+from core.session import MultiMCP
+from mcp_test_servers import echo_config
+from modules.cassette import Cassette, CassetteMiss, cassette
+from modules.model_manager import ModelManager
+
+
+class CountingModel(ModelManager):
+    """ModelManager backend answering locally and counting the calls that reach it"""
+
+    def __init__(self):
+        self.model_type = "counting"
+        self.model_info = {"model": "counting"}
+        self.calls = 0
+
+    def _counting_generate(self, prompt, temperature=None):
+        self.calls += 1
+        return f"answer #{self.calls} to {prompt}"
+
+
+def test_record_and_replay():
+    """A replayed session needs neither the model nor the MCP server process"""
+    print("=" * 60)
+    print("TESTING RECORD AND REPLAY")
+    print("=" * 60)
+
+    config = echo_config()
+    tape = Path(config["cwd"]) / "session.jsonl"
+    model = CountingModel()
+
+    async def session(config):
+        multi = MultiMCP([config])
+        await multi.initialize()
+        tool = await multi.call_tool("echo", {"text": "hi"})
+        plan = await model.generate_text("plan this", site="plan")
+        again = await model.generate_text("plan this", site="plan")
+        return [t.name for t in multi.get_all_tools()], tool.content[0].text, plan, again
+
+    try:
+        cassette.configure("record", tape)
+        recorded = asyncio.run(session(config))
+        assert cassette.get_stats()["recorded"] == 4  # tool list, tool call, two LLM calls
+        assert model.calls == 2
+
+        cassette.configure("replay", tape)
+        Path(config["script"]).unlink()  # nothing may be spawned
+        start = time.perf_counter()
+        replayed = asyncio.run(session(config))
+        elapsed = time.perf_counter() - start
+        stats = cassette.get_stats()
+    finally:
+        cassette.configure("off")
+
+    print(f"  Recorded: {recorded}")
+    print(f"  Replayed in {elapsed * 1000:.1f} ms: {stats}")
+    assert replayed == recorded == (["echo", "shout", "fail"], "hi", "answer #1 to plan this", "answer #2 to plan this")
+    assert model.calls == 2
+    assert stats["replayed"] == 4 and stats["drifted"] == 0 and stats["missed"] == 0
+    assert elapsed < 0.5
+
+
+def test_drift_and_strict():
+    """Unrecorded requests take the next recording of their group, or fail in strict mode"""
+    print("\n" + "=" * 60)
+    print("TESTING DRIFT HANDLING")
+    print("=" * 60)
+
+    tape = Path(tempfile.mkdtemp()) / "drift.jsonl"
+    recorder = Cassette(tape, mode="record")
+
+    async def live(value):
+        return value
+
+    async def record():
+        await recorder.call("llm", "llm:plan", {"prompt": "context A, query"}, lambda: live("plan A"))
+        await recorder.call("llm", "llm:plan", {"prompt": "context B, query"}, lambda: live("plan B"))
+
+    async def replay(player, prompts):
+        return [await player.call("llm", "llm:plan", {"prompt": p}, lambda: live("live!")) for p in prompts]
+
+    asyncio.run(record())
+    lenient = Cassette(tape, mode="replay")
+    answers = asyncio.run(replay(lenient, ["context B, query", "context C, query", "context B, query"]))
+    print(f"  Lenient replay: {answers} {lenient.get_stats()}")
+    assert answers == ["plan B", "plan A", "plan B"]
+    assert lenient.get_stats()["drifted"] == 1 and lenient.get_stats()["repeated"] == 1
+
+    strict = Cassette(tape, mode="replay", strict=True)
+    try:
+        asyncio.run(replay(strict, ["context C, query"]))
+        raise AssertionError("strict replay served a drifted request")
+    except CassetteMiss as e:
+        print(f"  Strict replay: {e}")
+
+
+
+def test_scoped_drift_in_concurrent_batches():
+    """A drifted request only falls back to recordings of its own query, whatever order queries replay in"""
+    print("\n" + "=" * 60)
+    print("TESTING SCOPED DRIFT WITH CONCURRENT QUERIES")
+    print("=" * 60)
+
+    work = Path(tempfile.mkdtemp())
+    tape = work / "batch.jsonl"
+    input_path = work / "queries.jsonl"
+    input_path.write_text("".join(f'{{"id": "{q}", "query": "{q}"}}\n' for q in "ABC"), encoding="utf-8")
+
+    def make_runner(context, delays):
+        async def live(query):
+            return f"plan for {query}"
+
+        async def run(query, state):
+            await asyncio.sleep(delays[query])
+            plan = await cassette.call("llm", "llm:plan", {"prompt": f"{context} {query}"}, lambda: live(query))
+            return {"status": "answer", "answer": plan, "message": None, "steps": 1}
+        return run
+
+    try:
+        cassette.configure("record", tape)
+        asyncio.run(run_batch(input_path, work / "recorded.jsonl", make_runner("history 1", {"A": 0, "B": 0, "C": 0}),
+                              concurrency=1))
+        cassette.configure("replay", tape)
+        asyncio.run(run_batch(input_path, work / "replayed.jsonl", make_runner("history 2", {"A": 0.2, "B": 0.1, "C": 0}),
+                              concurrency=3))  # C asks first, with a prompt that was never recorded
+        stats = cassette.get_stats()
+    finally:
+        cassette.configure("off")
+    answers = {r["id"]: r["answer"] for r in map(json.loads, (work / "replayed.jsonl").read_text().splitlines())}
+    print(f"  {answers} {stats}")
+    assert answers == {q: f"plan for {q}" for q in "ABC"}
+    assert stats["drifted"] == 3
+
+
+if __name__ == "__main__":
+    print("\n🧪 CASSETTE TEST SUITE\n")
+    test_record_and_replay()
+    test_drift_and_strict()
+    test_scoped_drift_in_concurrent_batches()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,125 @@
+# test_fast_path.py
+
+"""
+Test suite for the fast-path math router
+Run with: python test_fast_path.py
+"""
+
+import tempfile
+from pathlib import Path
+
+from modules.fast_path import FastPathRouter, PREVIOUS_RESULT
+from modules.metrics import registry
+
+
+def test_matching():
+    """Routable queries map to the right tool chain; everything else falls through"""
+    print("=" * 60)
+    print("TESTING FAST PATH MATCHING")
+    print("=" * 60)
+
+    router = FastPathRouter()
+    cases = {
+        "add 5 and 7": [("add", {"a": 5, "b": 7})],
+        "What is 2 to the power of 10?": [("power", {"a": 2, "b": 10})],
+        "subtract 3 from 10": [("subtract", {"a": 10, "b": 3})],
+        "factorial of 10": [("factorial", {"a": 10})],
+        "first 10 fibonacci numbers": [("fibonacci_numbers", {"n": 10})],
+        "Find the ASCII values of characters in INDIA and then return sum of exponentials of those values.": [
+            ("strings_to_chars_to_int", {"string": "INDIA"}),
+            ("int_list_to_exponential_sum", {"numbers": PREVIOUS_RESULT}),
+        ],
+    }
+    for query, expected in cases.items():
+        routed = router.match(query)
+        print(f"  Input:  {query}")
+        print(f"  Route:  {routed.steps if routed else None}\n")
+        assert routed is not None and routed.steps == expected
+
+    for query in [
+        "What is the relationship between Gensol and Go-Auto?",
+        "What is the log value of the amount that Anmol singh paid?",
+        "factorial of 100000",
+    ]:
+        print(f"  Input:  {query}")
+        print("  Route:  None (agent path)\n")
+        assert router.match(query) is None
+
+
+def test_execution():
+    """Routed chains run in-process against the real mcp_server_1 tools"""
+    print("\n" + "=" * 60)
+    print("TESTING FAST PATH EXECUTION")
+    print("=" * 60)
+
+    router = FastPathRouter()
+    assert router.answer("add 5 and 7") == "FINAL_ANSWER: 12"
+    assert router.answer("10!") == "FINAL_ANSWER: 3628800"
+    assert router.answer("ascii values of INDIA") == "FINAL_ANSWER: [73, 78, 68, 73, 65]"
+    # Failures fall back to the agent rather than raising
+    assert router.answer("divide 20 by 0") is None
+    print("  ✅ Execution results match")
+
+
+
+def test_no_server_state_file():
+    """Fast-path calls are local: they don't rewrite the math server's metrics state file"""
+    print("\n" + "=" * 60)
+    print("TESTING FAST PATH METRICS")
+    print("=" * 60)
+
+    state_dir, registry.state_dir = registry.state_dir, Path(tempfile.mkdtemp())
+    try:
+        assert FastPathRouter().answer("add 5 and 7") == "FINAL_ANSWER: 12"
+        written = sorted(path.name for path in registry.state_dir.iterdir())
+    finally:
+        registry.state_dir = state_dir
+    print(f"  Files written: {written}")
+    assert written == []
+
+
+def test_failed_route_searches_history():
+    """When a matched route fails, AgentLoop runs the history search the caller skipped before planning"""
+    print("\n" + "=" * 60)
+    print("TESTING FAST PATH FALLBACK CONTEXT")
+    print("=" * 60)
+
+    import asyncio
+    from types import SimpleNamespace
+    from unittest.mock import patch
+    from core import loop
+
+    class Planning(Exception):
+        pass
+
+    async def search_history():
+        searches.append(context.user_input)
+        return [{"query": "divide 20 by 4"}], "Past: divide 20 by 4 → 5"
+
+    async def run_perception(context, user_input):
+        raise Planning(context.past_context)
+
+    searches = []
+    context = SimpleNamespace(
+        user_input="divide 20 by 0",
+        dispatcher=None,
+        search_history=search_history,
+        agent_profile=SimpleNamespace(strategy=SimpleNamespace(fast_path=True, max_steps=1, max_lifelines_per_step=0)),
+    )
+    with patch.object(loop, "run_perception", run_perception), patch.object(loop, "ModelManager", lambda: None):
+        try:
+            asyncio.run(loop.AgentLoop(context)._run())
+        except Planning as planning:
+            past_context = str(planning)
+    print(f"  Planning saw: {past_context!r}")
+    assert searches == ["divide 20 by 0"]
+    assert past_context == "Past: divide 20 by 4 → 5"
+
+
+if __name__ == "__main__":
+    print("\n🧪 FAST PATH TEST SUITE\n")
+    test_matching()
+    test_execution()
+    test_no_server_state_file()
+    test_failed_route_searches_history()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,238 @@
+# test_history_pruning.py
+
+"""
+Test suite for date-range pruning, conversation index change detection,
+background indexing, filtered search and the index capacity policy
+Run with: python test_history_pruning.py
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from modules.conversation_index import ConversationIndex
+from modules.memory import MemoryItem, MemoryManager, day_dirs, writer
+
+
+class OfflineIndex(ConversationIndex):
+    """ConversationIndex with a local stand-in for the embedding server"""
+
+    def _get_embedding(self, text: str) -> np.ndarray:
+        return np.full(8, len(text), dtype=np.float32)
+
+
+class BagOfWordsIndex(ConversationIndex):
+    """Stand-in embedder whose similarity follows shared words"""
+
+    def _get_embedding(self, text: str) -> np.ndarray:
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().replace("?", " ").split():
+            vector[sum(map(ord, word)) % 64] += 1
+        return vector
+
+
+def session_items(queries, start: float):
+    items = []
+    for i, query in enumerate(queries):
+        items.append({"timestamp": start + i, "type": "run_metadata", "text": f"Started new session with input: {query}"})
+        items.append({"timestamp": start + i, "type": "tool_output",
+                      "tool_result": {"result": f"FINAL_ANSWER: about {query}"}})
+    return items
+
+
+def write_session(memory_dir: str, session_id: str, query: str):
+    manager = MemoryManager(session_id=session_id, memory_dir=memory_dir)
+    manager.index = None
+    manager.add(MemoryItem(timestamp=time.time(), type="run_metadata", text=f"Started new session with input: {query}"))
+    manager.add_tool_output("solve_sandbox", {}, {"result": f"FINAL_ANSWER: answer to {query}"}, success=True)
+    manager.close()
+    writer.sync()
+
+
+def test_day_dirs():
+    """Only day directories inside the range are visited, newest first"""
+    print("=" * 60)
+    print("TESTING DATE-RANGE PRUNING")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    for day in ("2024/12/31", "2025/01/15", "2025/02/01", "2025/02/28"):
+        os.makedirs(os.path.join(memory_dir, day))
+    os.makedirs(os.path.join(memory_dir, "blobs", "ab"))
+
+    days = [d.isoformat() for d, _ in day_dirs(memory_dir, date(2025, 1, 1), date(2025, 2, 10))]
+    print(f"  In range: {days}")
+    assert days == ["2025-02-01", "2025-01-15"]
+    assert len(list(day_dirs(memory_dir))) == 4
+
+
+def test_directory_manifest():
+    """Startup only reads directories that changed since the last scan"""
+    print("\n" + "=" * 60)
+    print("TESTING DIRECTORY MANIFEST")
+    print("=" * 60)
+
+    memory_dir, index_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    write_session(memory_dir, "2025/03/01/session-1740800000-aaa001", "first question")
+    write_session(memory_dir, "2025/03/02/session-1740900000-aaa002", "second question")
+
+    index = OfflineIndex(memory_dir=memory_dir, index_dir=index_dir)
+    index.index_all_conversations()
+    assert index.get_stats()["total_conversations"] == 2
+
+    reloaded = OfflineIndex(memory_dir=memory_dir, index_dir=index_dir)
+    assert reloaded._changed_session_files()[0] == []
+
+    write_session(memory_dir, "2025/03/02/session-1740900100-aaa003", "third question")
+    changed, _ = reloaded._changed_session_files()
+    print(f"  Changed after one new session: {[p.name for p in changed]}")
+    assert [p.name for p in changed] == ["session-1740900100-aaa003.json"]
+
+    reloaded.index_all_conversations()
+    assert reloaded.get_stats()["total_conversations"] == 3
+    assert Path(index_dir, "dir_manifest.json").exists()
+
+
+def test_stat_change_detection():
+    """Stat decides without reading; a touched but identical file is not re-indexed"""
+    print("\n" + "=" * 60)
+    print("TESTING STAT CHANGE DETECTION")
+    print("=" * 60)
+
+    memory_dir, index_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    write_session(memory_dir, "2025/03/03/session-1741000000-ccc001", "touched question")
+    index = OfflineIndex(memory_dir=memory_dir, index_dir=index_dir)
+    index.index_all_conversations()
+    path = next(Path(memory_dir).rglob("session-*.json"))
+    entry = index.cache[str(path)]
+    assert set(entry) == {"size", "mtime_ns", "hash"}
+
+    index.file_reads = 0
+    original_hash = index._file_hash
+    def counting_hash(filepath):
+        index.file_reads += 1
+        return original_hash(filepath)
+    index._file_hash = counting_hash
+
+    assert index._is_unchanged(path) and index.file_reads == 0
+    os.utime(path, ns=(entry["mtime_ns"] + 10**9, entry["mtime_ns"] + 10**9))
+    assert index._is_unchanged(path) and index.file_reads == 1
+    assert index.cache[str(path)]["mtime_ns"] == entry["mtime_ns"] + 10**9
+
+    # Caches written by older versions hold a bare md5 of the content
+    index.cache[str(path)] = hashlib.md5(path.read_bytes()).hexdigest()
+    assert index._is_unchanged(path)
+    print(f"  Upgraded entry: {index.cache[str(path)]}")
+
+
+def test_background_indexing():
+    """A finished run is searchable without a rescan, and a later rescan adds no duplicates"""
+    print("\n" + "=" * 60)
+    print("TESTING BACKGROUND INDEXING")
+    print("=" * 60)
+
+    memory_dir, index_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    write_session(memory_dir, "2025/03/04/session-1741100000-ddd001", "older question")
+    index = OfflineIndex(memory_dir=memory_dir, index_dir=index_dir)
+    index.start_background_scan()
+    index.wait()
+    assert index.get_stats()["total_conversations"] == 1
+
+    session_id = "2025/03/04/session-1741100100-ddd002"
+    manager = MemoryManager(session_id=session_id, memory_dir=memory_dir)
+    manager.index = None
+    manager.add(MemoryItem(timestamp=time.time(), type="run_metadata", text="Started new session with input: live question"))
+    manager.add_tool_output("solve_sandbox", {}, {"result": "FINAL_ANSWER: live answer"}, success=True)
+    index.index_session_in_background(manager)
+    index.wait()
+    assert index.get_stats()["total_conversations"] == 2
+    assert len(index.search("live question", exclude_session=session_id)) == 1
+
+    manager.close()
+    writer.sync()
+    rescanned = OfflineIndex(memory_dir=memory_dir, index_dir=index_dir)
+    rescanned.index_all_conversations()
+    print(f"  After rescan: {rescanned.get_stats()['total_conversations']} conversations")
+    assert rescanned.get_stats()["total_conversations"] == 2
+
+
+def test_filtered_search():
+    """Filters run inside FAISS: a dominant current session can't crowd out past hits"""
+    print("\n" + "=" * 60)
+    print("TESTING FILTERED SEARCH")
+    print("=" * 60)
+
+    index = BagOfWordsIndex(memory_dir=tempfile.mkdtemp(), index_dir=tempfile.mkdtemp(), min_similarity=0.3)
+    current = "2025/03/05/session-1741200000-eee001"
+    index.index_session_items(session_items([f"gensol revenue {i}" for i in range(8)], 1741200000), current)
+    index.index_session_items(session_items(["gensol revenue history"], 1700000000), "2023/11/14/session-1700000000-eee002")
+    index.index_session_items(session_items(["gensol revenue outlook", "weather in paris"], 1735000000),
+                              "2024/12/24/session-1735000000-eee003")
+
+    results = index.search("gensol revenue", exclude_session=current)
+    print(f"  Excluding the current session: {[r['query'] for r in results]}")
+    assert sorted(r["query"] for r in results) == ["gensol revenue history", "gensol revenue outlook"]
+    assert results[0]["similarity_score"] >= results[1]["similarity_score"] >= 0.3
+
+    assert [r["query"] for r in index.search("gensol revenue", exclude_session=current, since=1735000000)] == [
+        "gensol revenue outlook"]
+    assert index.search("gensol revenue", since=1741200000, until=1741200002, min_similarity=0.99) == []
+    assert len(index.search("gensol revenue")) == index.top_k
+
+    # Indexes saved by older versions (raw vectors, L2) are converted on load
+    legacy = faiss.IndexFlatL2(64)
+    legacy.add(np.stack([index._get_embedding(conv["text"]) for conv in index.metadata]))
+    faiss.write_index(legacy, str(index.index_file))
+    reloaded = BagOfWordsIndex(memory_dir=str(index.memory_dir), index_dir=str(index.index_dir), min_similarity=0.3)
+    assert reloaded.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert [r["query"] for r in reloaded.search("gensol revenue", exclude_session=current)] == [
+        r["query"] for r in results]
+
+
+def test_capacity_policy():
+    """Past max_entries the least recent / least used conversations are evicted; newer ones rank higher"""
+    print("\n" + "=" * 60)
+    print("TESTING CAPACITY POLICY")
+    print("=" * 60)
+
+    now = time.time()
+    index = BagOfWordsIndex(memory_dir=tempfile.mkdtemp(), index_dir=tempfile.mkdtemp(),
+                            min_similarity=0.3, max_entries=10, half_life_days=30, recency_weight=0.5)
+    old = now - 400 * 86400
+    index.index_session_items(session_items(["gensol useful"] + [f"old topic {i}" for i in range(4)], old),
+                              "2024/01/01/session-1704067200-fff001")
+    for _ in range(3):
+        assert index.search("gensol useful")[0]["query"] == "gensol useful"
+
+    index.index_session_items(session_items([f"new topic {i}" for i in range(8)], now), "2025/03/06/session-1741300000-fff002")
+    queries = {conv["query"] for conv in index.metadata}
+    print(f"  Kept {len(queries)}: useful={'gensol useful' in queries}")
+    assert len(index.metadata) == index.index.ntotal == 9
+    assert "gensol useful" in queries and not any(q.startswith("old topic") for q in queries)
+    assert index.search("gensol useful")[0]["query"] == "gensol useful"  # ids still line up after compaction
+
+    # Equal similarity: the recent conversation ranks first
+    ranking = BagOfWordsIndex(memory_dir=tempfile.mkdtemp(), index_dir=tempfile.mkdtemp(),
+                              min_similarity=0.3, half_life_days=30, recency_weight=0.5)
+    ranking.index_session_items(session_items(["paris weather"], old), "2024/01/01/session-1704067200-fff003")
+    ranking.index_session_items(session_items(["paris weather"], now), "2025/03/06/session-1741300000-fff004")
+    results = ranking.search("paris weather")
+    assert [r["timestamp"] for r in results] == [now, old]
+    assert results[0]["score"] > results[1]["score"] and results[0]["similarity_score"] == results[1]["similarity_score"]
+
+
+if __name__ == "__main__":
+    print("\n🧪 HISTORY PRUNING TEST SUITE\n")
+    test_day_dirs()
+    test_directory_manifest()
+    test_stat_change_detection()
+    test_background_indexing()
+    test_filtered_search()
+    test_capacity_policy()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,163 @@
+# test_in_process_mcp.py
+
+"""
+Test suite for in-process MCP servers
+Run with: python test_in_process_mcp.py
+"""
+
+import asyncio
+import os
+import textwrap
+import threading
+import time
+
+from core.session import MultiMCP, load_in_process_app
+from mcp_test_servers import echo_config, echo_server, write_server
+
+SLOW_SERVER = textwrap.dedent('''
+    import os
+    import time
+    from mcp.server.fastmcp import FastMCP
+    server = FastMCP("Slow")
+
+    @server.tool()
+    def whoami() -> int:
+        """Process id of the server"""
+        return os.getpid()
+
+    @server.tool()
+    def nap(seconds: float) -> str:
+        """Block for a while"""
+        time.sleep(seconds)
+        return "awake"
+
+    if __name__ == "__main__":
+        server.run(transport="stdio")
+''')
+
+CALLS = [("echo", {"text": "hi"}), ("shout", {"text": "hi"}), ("fail", {"text": "boom"})]
+
+
+def test_same_results_as_subprocess():
+    """Tool listings and call results (errors included) match the stdio path"""
+    print("=" * 60)
+    print("TESTING IN-PROCESS VS SUBPROCESS RESULTS")
+    print("=" * 60)
+
+    config = echo_config()
+
+    async def session(in_process):
+        multi = MultiMCP([dict(config, in_process=in_process)])
+        await multi.initialize()
+        start = time.perf_counter()
+        results = [(await multi.call_tool(tool, args)).model_dump(mode="json") for tool, args in CALLS]
+        elapsed = time.perf_counter() - start
+        tools = [tool.model_dump(mode="json") for tool in multi.get_all_tools()]
+        return bool(multi.apps), tools, results, elapsed
+
+    spawned = asyncio.run(session(False))
+    local = asyncio.run(session(True))
+    print(f"  subprocess: {spawned[3] * 1000:.1f} ms, in-process: {local[3] * 1000:.2f} ms for {len(CALLS)} calls")
+    print(f"  {local[2][2]}")
+    assert spawned[0] is False and local[0] is True
+    assert local[1] == spawned[1]
+    assert local[2] == spawned[2]
+    assert local[2][2]["isError"] is True and "boom" in local[2][2]["content"][0]["text"]
+    assert local[3] < spawned[3] / 10
+
+
+def test_fallback_to_subprocess():
+    """Non-Python, broken or unmarked servers are not imported"""
+    print("\n" + "=" * 60)
+    print("TESTING SUBPROCESS FALLBACK")
+    print("=" * 60)
+
+    work = write_server(echo_server()).parent
+    write_server("#!/bin/sh\n", "server.sh", work)
+    write_server("raise ImportError('missing dependency')\n", "broken.py", work)
+
+    assert load_in_process_app({"id": "sh", "script": "server.sh", "cwd": str(work), "in_process": True}) is None
+    assert load_in_process_app({"id": "broken", "script": "broken.py", "cwd": str(work), "in_process": True}) is None
+    assert load_in_process_app({"id": "echo", "script": "echo_server.py", "cwd": str(work)}) is None
+    config = {"id": "echo", "script": "echo_server.py", "cwd": str(work), "in_process": True}
+    assert load_in_process_app(config) is load_in_process_app(config)  # imported once
+
+
+
+def test_blocking_tools_leave_the_loop_free():
+    """A blocking tool runs off the event loop, and one that overruns its timeout becomes an error"""
+    print("\n" + "=" * 60)
+    print("TESTING BLOCKING IN-PROCESS TOOLS")
+    print("=" * 60)
+
+    work = write_server(SLOW_SERVER, "slow_server.py").parent
+
+    async def scenario():
+        config = {"id": "slow", "script": "slow_server.py", "cwd": str(work), "in_process": True, "in_process_timeout": 0.5}
+        multi = MultiMCP([config])
+        await multi.initialize()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            done = await multi.call_tool("nap", {"seconds": 0.3})
+            start = time.perf_counter()
+            late = await multi.call_tool("nap", {"seconds": 1.5})
+            waited = time.perf_counter() - start
+        finally:
+            task.cancel()
+        return bool(multi.apps), ticks, done, late, waited
+
+    loaded, ticks, done, late, waited = asyncio.run(scenario())
+    print(f"  loop ticks during calls: {ticks}, timed-out call returned after {waited:.2f}s: {late.content[0].text}")
+    assert loaded
+    assert ticks >= 10  # the loop kept running while nap() blocked
+    assert done.isError is False and done.content[0].text == "awake"
+    assert late.isError is True and "timed out" in late.content[0].text
+    assert waited < 1.0
+
+
+
+def test_saturated_server_uses_a_subprocess():
+    """A server whose threads are all held by hung tools gets its next calls in a subprocess"""
+    print("\n" + "=" * 60)
+    print("TESTING SATURATED IN-PROCESS SERVERS")
+    print("=" * 60)
+
+    work = write_server(SLOW_SERVER, "slow_server.py").parent
+
+    async def scenario():
+        config = {"id": "saturated", "script": "slow_server.py", "cwd": str(work), "in_process": True,
+                  "in_process_timeout": 0.3, "in_process_workers": 1}
+        multi = MultiMCP([config])
+        await multi.initialize()
+        local = await multi.call_tool("whoami", {})
+        hung = await multi.call_tool("nap", {"seconds": 2})  # times out, its thread keeps the only slot
+        spawned = await multi.call_tool("whoami", {})
+        threads = [t.name for t in threading.enumerate() if t.name.startswith("mcp-saturated")]
+        await asyncio.sleep(2)
+        again = await multi.call_tool("whoami", {})
+        return local, hung, spawned, again, threads
+
+    local, hung, spawned, again, threads = asyncio.run(scenario())
+    pids = [int(result.content[0].text) for result in (local, spawned, again)]
+    print(f"  pids: {pids} (test {os.getpid()}), threads: {threads}")
+    assert hung.isError and "timed out" in hung.content[0].text
+    assert pids[0] == os.getpid() and pids[1] != os.getpid()  # the second call ran in a server process
+    assert pids[2] == os.getpid()  # back in-process once the hung call finished
+    assert threads == ["mcp-saturated_0"]  # the server's own thread, not the default executor
+
+
+if __name__ == "__main__":
+    print("\n🧪 IN-PROCESS MCP TEST SUITE\n")
+    test_same_results_as_subprocess()
+    test_fallback_to_subprocess()
+    test_blocking_tools_leave_the_loop_free()
+    test_saturated_server_uses_a_subprocess()
+    print("\n✅ ALL TESTS COMPLETED")
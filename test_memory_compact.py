@@ -0,0 +1,150 @@
+# test_memory_compact.py
+
+"""
+Test suite for the compact session memory representation
+Run with: python test_memory_compact.py
+"""
+
+import json
+import os
+import tempfile
+
+from modules.memory import MemoryManager, load_payloads, writer
+
+SESSION_ID = "2025/11/21/session-1763700000-def456"
+
+PLAN = "async def solve():\n" + "".join(f"    x{i} = await mcp.call_tool('add', {{'input': {{'a': {i}, 'b': 1}}}})\n" for i in range(40)) + "    return 'FINAL_ANSWER: done'\n"
+
+
+def run_session(memory_dir: str, compact: bool, runs: int = 20) -> MemoryManager:
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=memory_dir)
+    manager.compact = compact
+    for i in range(runs):
+        manager.add_tool_output(
+            tool_name="solve_sandbox",
+            tool_args={"plan": PLAN},
+            tool_result={"result": f"FINAL_ANSWER: {i}"},
+            success=True,
+            tags=["sandbox"],
+        )
+    manager.close()
+    writer.sync()
+    return manager
+
+
+def test_spill_and_lazy_load():
+    """Large payloads are stored once by hash and loaded on demand"""
+    print("=" * 60)
+    print("TESTING PAYLOAD SPILLING")
+    print("=" * 60)
+
+    compact_dir, plain_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+    manager = run_session(compact_dir, compact=True)
+    plain = run_session(plain_dir, compact=False)
+
+    compact_size = os.path.getsize(manager.memory_path)
+    plain_size = os.path.getsize(plain.memory_path)
+    blobs = [f for _, _, files in os.walk(os.path.join(compact_dir, "blobs")) for f in files]
+    print(f"  Session file: {plain_size} → {compact_size} bytes, {len(blobs)} blob(s)")
+    assert compact_size < plain_size / 4
+    assert len(blobs) == 1  # 20 runs of the same plan share one blob
+
+    item = manager.items[0]
+    assert "$blob" in item.tool_args["plan"]
+    assert manager.payload(item, "tool_args")["plan"] == PLAN
+    assert manager.resolve(item).tool_args["plan"] == PLAN
+    assert item.tool_result == {"result": "FINAL_ANSWER: 0"}  # small values stay inline
+
+
+def test_readers_and_reload():
+    """Raw readers resolve references; reloading keeps them lazy and names interned"""
+    print("\n" + "=" * 60)
+    print("TESTING READERS AND RELOAD")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    manager = run_session(memory_dir, compact=True, runs=2)
+    with open(manager.memory_path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    assert load_payloads(raw[0], memory_dir)["tool_args"]["plan"] == PLAN
+
+    reloaded = MemoryManager(session_id=SESSION_ID, memory_dir=memory_dir)
+    assert "$blob" in reloaded.items[0].tool_args["plan"]
+    assert reloaded.items[0].tool_name is reloaded.items[1].tool_name
+    print(f"  Reloaded {len(reloaded.items)} items")
+
+
+
+def test_queued_payload_reads_do_not_wait():
+    """A payload still waiting for the writer is served from memory, without waiting on the queue"""
+    print("\n" + "=" * 60)
+    print("TESTING READS OF QUEUED PAYLOADS")
+    print("=" * 60)
+
+    import time
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=tempfile.mkdtemp())
+    manager.compact = True
+    writer.submit(time.sleep, 0.5)  # the writer is busy with someone else's work
+    manager.add_tool_output("solve_sandbox", {"plan": PLAN}, {"result": "ok"}, success=True)
+    start = time.perf_counter()
+    plan = manager.payload(manager.items[-1], "tool_args")["plan"]
+    elapsed = time.perf_counter() - start
+    print(f"  Read queued blob in {elapsed * 1000:.2f} ms")
+    assert plan == PLAN and elapsed < 0.1
+    writer.sync()
+    assert not manager.blobs._queued  # handed over to disk
+
+
+
+def test_spilled_text_is_a_preview():
+    """A large tool result lives in its blob only: the item's text keeps a short preview"""
+    print("\n" + "=" * 60)
+    print("TESTING TEXT PREVIEWS OF SPILLED RESULTS")
+    print("=" * 60)
+
+    page = "lorem ipsum " * 20000  # a 240 KB tool result, e.g. a converted web page
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=tempfile.mkdtemp())
+    manager.compact = True
+    manager.add_tool_output("convert_webpage_url_into_markdown", {"url": "https://example.com"}, {"markdown": page}, success=True)
+    manager.save()
+
+    size = os.path.getsize(manager.memory_path)
+    item = manager.items[-1]
+    print(f"  {len(page)} byte result → {size} byte session file, text: {item.text[:60]!r}...")
+    assert size < 4096
+    assert len(item.text) <= manager.text_preview_chars + 1 and item.text.startswith("Output of convert_webpage")
+    assert manager.payload(item, "tool_result")["markdown"] == page
+
+
+def test_failed_blob_writes_stay_inline():
+    """A payload whose blob can't be written stays readable and is stored inline in the session"""
+    print("\n" + "=" * 60)
+    print("TESTING FAILED BLOB WRITES")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=memory_dir)
+    manager.compact = True
+    open(os.path.join(memory_dir, "blobs"), "w").close()  # a file where the blob directory should be
+    manager.add_tool_output("solve_sandbox", {"plan": PLAN}, {"result": "ok"}, success=True)
+    manager.save()
+
+    item = manager.items[-1]
+    assert manager.payload(item, "tool_args")["plan"] == PLAN  # still served from memory
+    with open(manager.memory_path, "r", encoding="utf-8") as f:
+        stored = json.load(f)[-1]
+    print(f"  Failed blobs: {len(manager.blobs.failed)}, stored plan inline: {stored['tool_args']['plan'] == PLAN}")
+    assert stored["tool_args"]["plan"] == PLAN
+
+    reloaded = MemoryManager(session_id=SESSION_ID, memory_dir=memory_dir)
+    assert reloaded.payload(reloaded.items[-1], "tool_args")["plan"] == PLAN
+
+
+if __name__ == "__main__":
+    print("\n🧪 MEMORY COMPACTION TEST SUITE\n")
+    test_spill_and_lazy_load()
+    test_readers_and_reload()
+    test_queued_payload_reads_do_not_wait()
+    test_spilled_text_is_a_preview()
+    test_failed_blob_writes_stay_inline()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,156 @@
+# test_memory_index.py
+
+"""
+Test suite for the SQLite/FTS5 memory index
+Run with: python test_memory_index.py
+"""
+
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from modules.memory import MemoryItem, MemoryManager, writer
+from modules.memory_index import MemoryIndex
+
+CONVERSATIONS = [
+    ("How much Anmol singh paid for his DLF apartment via Capbridge?", "Anmol Singh paid 42.94 crore"),
+    ("What is the relationship between Gensol and Go-Auto?", "Go-Auto was a dealership linked to Gensol"),
+    ("Who is Anmol Singh?", "Anmol Singh is a promoter of Gensol"),
+]
+
+
+def record_session(memory_dir: str, session_id: str, index: bool = True) -> MemoryManager:
+    manager = MemoryManager(session_id=session_id, memory_dir=memory_dir)
+    if not index:
+        manager.index = None
+    for query, answer in CONVERSATIONS:
+        manager.add(MemoryItem(
+            timestamp=time.time(),
+            type="run_metadata",
+            text=f"Started new session with input: {query} at 2025-11-22T10:00:00.000000",
+            tags=["run_start"],
+        ))
+        manager.add_tool_output("solve_sandbox", {"plan": "..."}, {"result": f"FINAL_ANSWER: {answer}"}, success=True)
+    manager.close()
+    writer.sync()
+    return manager
+
+
+def test_live_indexing_and_search():
+    """MemoryManager writes are searchable, ranked and paginated"""
+    print("=" * 60)
+    print("TESTING LIVE INDEXING AND SEARCH")
+    print("=" * 60)
+
+    manager = record_session(tempfile.mkdtemp(), "2025/11/22/session-1763800000-aaa111")
+    index = manager.index
+
+    page = index.search("anmol singh", limit=1)
+    print(f"  'anmol singh': total={page['total']} first={page['matches'][0]['user_query']}")
+    assert page["total"] == 4  # two queries, each on its run_metadata and its answer row
+    assert len(page["matches"]) == 1
+
+    rest = index.search("anmol singh", limit=10, offset=1)
+    assert len(rest["matches"]) == 3
+
+    answer = index.search("dealership")["matches"][0]
+    assert answer["user_query"] == CONVERSATIONS[1][0]  # answers carry the query they answer
+    assert answer["session_id"] == manager.session_id
+    assert index.search('gens"*')["total"] == 3  # user text is quoted, prefix-matched
+    assert index.search("???")["total"] == 0
+
+
+def test_backfill():
+    """index_files back-fills sessions written without the index, once"""
+    print("\n" + "=" * 60)
+    print("TESTING BACKFILL")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    session_id = "2025/11/22/session-1763800001-bbb222"
+    manager = record_session(memory_dir, session_id, index=False)
+
+    index = MemoryIndex(f"{memory_dir}/backfill.sqlite3")
+    assert index.index_files(memory_dir) == 1
+    assert index.index_files(memory_dir) == 0  # unchanged file is skipped
+    print(f"  Stats: {index.get_stats()}")
+    assert index.get_stats()["entries"] == 6
+    assert index.search("capbridge")["matches"][0]["session_id"] == session_id
+
+    # Live rows and back-filled rows for the same item don't duplicate
+    manager.index = index
+    manager.add_final_answer("Capbridge handled the payment")
+    writer.sync()
+    index.index_session(session_id, [item.model_dump() for item in manager.items])
+    assert index.get_stats()["entries"] == 7
+
+
+
+def test_backfill_skips_unchanged_directories():
+    """A repeat back-fill lists no directory and stats no file unless something was written"""
+    print("\n" + "=" * 60)
+    print("TESTING BACKFILL DIRECTORY MANIFEST")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    record_session(memory_dir, "2025/11/22/session-1763800003-ddd444", index=False)
+    index = MemoryIndex(f"{memory_dir}/manifest.sqlite3")
+    assert index.index_files(memory_dir) == 1
+
+    scanned = []
+    real_scandir = os.scandir
+    def counting_scandir(path):
+        scanned.append(path)
+        return real_scandir(path)
+
+    with patch("os.scandir", counting_scandir):
+        assert index.index_files(memory_dir) == 0
+        print(f"  Unchanged tree: {len(scanned)} directories listed")
+        assert scanned in ([], [memory_dir])  # the index's own journal touches the root
+
+        record_session(memory_dir, "2025/11/23/session-1763900000-eee555", index=False)
+        scanned.clear()
+        assert index.index_files(memory_dir) == 1
+        print(f"  After a new day: {len(scanned)} directories listed")
+        print(f"  {[os.path.relpath(path, memory_dir) for path in scanned]}")
+        assert os.path.join(memory_dir, "2025", "11", "22") not in scanned
+
+
+def test_search_by_intent():
+    """Answers carry the perception intent of their query, live and when back-filled"""
+    print("\n" + "=" * 60)
+    print("TESTING INTENT SEARCH")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    manager = MemoryManager(session_id="2025/11/22/session-1763800002-ccc333", memory_dir=memory_dir)
+    for (query, answer), intent in zip(CONVERSATIONS, ["financial_lookup", "relationship_query", "unknown"]):
+        manager.add(MemoryItem(
+            timestamp=time.time(),
+            type="run_metadata",
+            text=f"Started new session with input: {query} at 2025-11-22T10:00:00.000000",
+        ))
+        manager.set_intent(intent)
+        manager.add_tool_output("solve_sandbox", {"plan": "..."}, {"result": f"FINAL_ANSWER: {answer}"}, success=True)
+    manager.close()
+    writer.sync()
+
+    live = manager.index.search("relationship_query")
+    print(f"  'relationship_query': {[(m['user_query'], m['intent']) for m in live['matches']]}")
+    assert live["total"] == 1 and live["matches"][0]["user_query"] == CONVERSATIONS[1][0]
+    assert manager.index.search("financial")["matches"][0]["final_answer"] == CONVERSATIONS[0][1]
+    assert manager.index.search("unknown")["total"] == 0  # no intent recorded, none indexed
+
+    backfilled = MemoryIndex(f"{memory_dir}/backfill.sqlite3")
+    backfilled.index_files(memory_dir)
+    assert backfilled.search("relationship_query")["matches"][0]["user_query"] == CONVERSATIONS[1][0]
+
+
+if __name__ == "__main__":
+    print("\n🧪 MEMORY INDEX TEST SUITE\n")
+    test_live_indexing_and_search()
+    test_backfill()
+    test_backfill_skips_unchanged_directories()
+    test_search_by_intent()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,172 @@
+# test_memory_journal.py
+
+"""
+Test suite for the append-only session memory journal
+Run with: python test_memory_journal.py
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from modules.memory import MemoryItem, MemoryManager, writer
+
+SESSION_ID = "2025/11/20/session-1763600000-abc123"
+
+
+def make_manager(memory_dir: str) -> MemoryManager:
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=memory_dir)
+    manager.flush_every = 4
+    manager.compact_every = 8
+    return manager
+
+
+def add_outputs(manager: MemoryManager, count: int, start: int = 0):
+    for i in range(start, start + count):
+        manager.add_tool_output(f"tool_{i}", {"i": i}, {"result": i}, success=True)
+
+
+def read_snapshot(manager: MemoryManager) -> list:
+    with open(manager.memory_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_batching_and_compaction():
+    """Items are journaled in batches and folded into the JSON snapshot on close"""
+    print("=" * 60)
+    print("TESTING JOURNAL BATCHING AND COMPACTION")
+    print("=" * 60)
+
+    manager = make_manager(tempfile.mkdtemp())
+    add_outputs(manager, 3)
+    assert not os.path.exists(manager.journal_path)  # still buffered
+
+    add_outputs(manager, 1, start=3)
+    writer.sync()
+    with open(manager.journal_path, "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 4
+    assert not os.path.exists(manager.memory_path)
+
+    add_outputs(manager, 4, start=4)  # reaches compact_every
+    writer.sync()
+    assert not os.path.exists(manager.journal_path)
+    assert len(read_snapshot(manager)) == 8
+
+    add_outputs(manager, 2, start=8)
+    manager.add_tool_success("tool_9", False)
+    manager.close()
+    writer.sync()
+    raw = read_snapshot(manager)
+    print(f"  Snapshot items: {len(raw)}")
+    assert len(raw) == 10 and raw[-1]["success"] is False
+    assert not os.path.exists(manager.journal_path)
+
+
+def test_crash_recovery():
+    """A torn tail is ignored and records already compacted are not duplicated"""
+    print("\n" + "=" * 60)
+    print("TESTING CRASH RECOVERY")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    manager = make_manager(memory_dir)
+    add_outputs(manager, 2)
+    manager.close()
+
+    add_outputs(manager, 4, start=2)  # flushed to the journal, never compacted
+    manager.add_tool_success("tool_1", False)
+    manager.flush()
+    writer.sync()
+    with open(manager.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 6, "item": {"timest')  # process died mid-write
+
+    recovered = make_manager(memory_dir)
+    names = [item.tool_name for item in recovered.get_session_items()]
+    print(f"  Recovered: {names}")
+    assert names == [f"tool_{i}" for i in range(6)]
+    assert recovered.items[1].success is False
+
+    # Crash after the snapshot was replaced but before the journal was removed
+    journal = open(recovered.journal_path, encoding="utf-8").read()
+    recovered.close()
+    writer.sync()
+    with open(recovered.journal_path, "w", encoding="utf-8") as f:
+        f.write(journal)
+    again = make_manager(memory_dir)
+    assert len(again.get_session_items()) == 6
+
+
+def test_append_cost():
+    """Adding an item neither rewrites the whole session nor waits on disk"""
+    print("\n" + "=" * 60)
+    print("TESTING APPEND COST")
+    print("=" * 60)
+
+    manager = MemoryManager(session_id=SESSION_ID, memory_dir=tempfile.mkdtemp())
+    manager.compact_every = 10_000
+    start = time.perf_counter()
+    for i in range(2000):
+        manager.add(MemoryItem(timestamp=time.time(), type="tool_call", text=f"call {i}", tool_name="add"))
+    elapsed = time.perf_counter() - start
+    manager.close()
+    writer.sync()
+    print(f"  2000 items: {elapsed * 1000:.1f} ms on the caller, writer: {writer.get_stats()}")
+    assert len(read_snapshot(manager)) == 2000
+
+
+def test_writer_ordering_and_shutdown():
+    """Writes land in submission order and shutdown drains the queue"""
+    print("\n" + "=" * 60)
+    print("TESTING WRITER ORDERING AND SHUTDOWN")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    manager = make_manager(memory_dir)
+    manager.flush_every = 1
+    for i in range(20):
+        add_outputs(manager, 1, start=i)
+        if i % 3 == 0:
+            manager.add_tool_success(f"tool_{i}", False)
+    manager.close()
+    writer.shutdown()
+    assert writer.get_stats()["queue_depth"] == 0
+
+    reloaded = make_manager(memory_dir)
+    assert [item.tool_name for item in reloaded.items] == [f"tool_{i}" for i in range(20)]
+    assert [item.success for item in reloaded.items] == [i % 3 != 0 for i in range(20)]
+
+
+
+def test_load_waits_only_for_its_session():
+    """Opening a session waits for that session's queued writes, not for other sessions'"""
+    print("\n" + "=" * 60)
+    print("TESTING PER-SESSION LOAD WAIT")
+    print("=" * 60)
+
+    memory_dir = tempfile.mkdtemp()
+    writer.submit(time.sleep, 0.5, key="another session")  # slow writes of a busy neighbour
+    start = time.perf_counter()
+    other = MemoryManager(session_id="2025/11/20/session-1763600001-fff000", memory_dir=memory_dir)
+    unrelated = time.perf_counter() - start
+
+    add_outputs(other, 1)
+    other.close()
+    writer.submit(time.sleep, 0.3, key=other.memory_path)  # its compaction is still behind this
+    start = time.perf_counter()
+    reopened = MemoryManager(session_id="2025/11/20/session-1763600001-fff000", memory_dir=memory_dir)
+    own = time.perf_counter() - start
+    print(f"  New session opened in {unrelated * 1000:.1f} ms, reopened session waited {own * 1000:.1f} ms")
+    assert unrelated < 0.1
+    assert own >= 0.2 and len(reopened.items) == 1
+    writer.sync()
+
+
+if __name__ == "__main__":
+    print("\n🧪 MEMORY JOURNAL TEST SUITE\n")
+    test_batching_and_compaction()
+    test_crash_recovery()
+    test_append_cost()
+    test_writer_ordering_and_shutdown()
+    test_load_waits_only_for_its_session()
+    print("\n✅ ALL TESTS COMPLETED")
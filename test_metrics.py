@@ -0,0 +1,194 @@
+# test_metrics.py
+
+"""
+Test suite for the metrics registry
+Run with: python test_metrics.py
+"""
+
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import textwrap
+import urllib.request
+from pathlib import Path
+
+from core.session import MultiMCP, tool_calls, tool_seconds
+from mcp_test_servers import MODULES_DIR, echo_config
+from modules.metrics import Registry, registry, serve_http
+
+
+
+def test_render_format():
+    """Counters, gauges and callbacks render as Prometheus text with sorted, escaped labels"""
+    print("=" * 60)
+    print("TESTING PROMETHEUS TEXT FORMAT")
+    print("=" * 60)
+
+    local = Registry(state_dir=tempfile.mkdtemp())
+    calls = local.counter("llm_calls_total", "LLM calls")
+    calls.inc(site="plan", model="m")
+    calls.inc(2, site="plan", model="m")
+    calls.inc(site="perception", model='say "hi"')
+    local.gauge("queue_depth", "Queue depth").set(4)
+    local.callback("index_entries", "Entries", lambda: 12)
+    local.callback("broken", "Raises", lambda: 1 / 0)
+    text = local.render()
+    print(text)
+
+    assert "# TYPE llm_calls_total counter" in text
+    assert 'llm_calls_total{model="m",site="plan"} 3' in text
+    assert 'llm_calls_total{model="say \\"hi\\"",site="perception"} 1' in text
+    assert "queue_depth 4" in text and "index_entries 12" in text
+    assert "broken" not in text  # a failing callback is skipped, not fatal
+    assert local.counter("llm_calls_total", "LLM calls") is calls
+
+
+def test_histogram_and_dump():
+    """Histogram buckets are cumulative; dump() writes the rendered text atomically"""
+    print("\n" + "=" * 60)
+    print("TESTING HISTOGRAM AND FILE DUMP")
+    print("=" * 60)
+
+    state_dir = Path(tempfile.mkdtemp())
+    local = Registry(state_dir=state_dir)
+    latency = local.histogram("call_seconds", "Call latency", buckets=(0.1, 1, 10))
+    for value in (0.05, 0.5, 0.5, 5, 50):
+        latency.observe(value, site="plan")
+    with latency.time(site="timed"):
+        pass
+
+    path = local.dump()
+    text = path.read_text(encoding="utf-8")
+    print(text)
+    assert path == state_dir / "agent.prom"
+    assert 'call_seconds_bucket{le="0.1",site="plan"}' not in text  # labels keep their order, le last
+    assert 'call_seconds_bucket{site="plan",le="0.1"} 1' in text
+    assert 'call_seconds_bucket{site="plan",le="1"} 3' in text
+    assert 'call_seconds_bucket{site="plan",le="10"} 4' in text
+    assert 'call_seconds_bucket{site="plan",le="+Inf"} 5' in text
+    assert 'call_seconds_sum{site="plan"} 56.05' in text
+    assert 'call_seconds_count{site="timed"} 1' in text
+    assert not list(state_dir.glob("*.tmp"))
+
+
+def test_http_endpoint():
+    """GET /metrics serves the current registry"""
+    print("\n" + "=" * 60)
+    print("TESTING HTTP ENDPOINT")
+    print("=" * 60)
+
+    local = Registry(state_dir=tempfile.mkdtemp())
+    local.counter("requests_total", "Requests").inc()
+    server = serve_http(local, 0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            body = response.read().decode("utf-8")
+            assert response.headers["Content-Type"].startswith("text/plain")
+        print(body)
+        assert "requests_total 1" in body
+    finally:
+        server.shutdown()
+
+
+def test_mcp_server_instrumentation():
+    """Tool calls are counted by the client (MultiMCP) and inside the short-lived server process"""
+    print("\n" + "=" * 60)
+    print("TESTING MCP TOOL METRICS")
+    print("=" * 60)
+
+    state_dir = Path(tempfile.mkdtemp()) / "metrics"
+    config = echo_config(metrics_dir=state_dir)
+
+    async def scenario():
+        multi = MultiMCP([config])
+        await multi.initialize()
+        assert sorted(multi.tool_map) == ["echo", "fail", "shout"]
+        await multi.call_tool("echo", {"text": "hi"})
+        await multi.call_tool("echo", {"text": "again"})
+        await multi.call_tool("fail", {"text": "boom"})
+
+    def client_counts():  # the process-wide registry may already hold calls from other tests
+        calls = {dict(key)["tool"] + "|" + dict(key)["outcome"]: n for key, n in tool_calls.values.items()
+                 if dict(key)["server"] == "echo"}
+        timed = {dict(key)["tool"]: entry[-1] for key, entry in tool_seconds.values.items() if dict(key)["server"] == "echo"}
+        return calls, timed
+
+    calls_before, timed_before = client_counts()
+    asyncio.run(scenario())
+    calls_after, timed_after = client_counts()
+    server_text = Registry(state_dir=state_dir).render()
+    print(server_text)
+
+    assert 'mcp_server_tool_calls_total{outcome="ok",server="echo",tool="echo"} 2' in server_text
+    assert 'mcp_server_tool_calls_total{outcome="error",server="echo",tool="fail"} 1' in server_text
+    assert 'mcp_server_tool_seconds_count{server="echo",tool="echo"} 2' in server_text
+    assert calls_after["echo|ok"] - calls_before.get("echo|ok", 0) == 2
+    assert calls_after["fail|tool_error"] - calls_before.get("fail|tool_error", 0) == 1
+    assert timed_after["echo"] - timed_before.get("echo", 0) == 2
+    assert "mcp_tool_calls_total{" in registry.render()
+
+
+
+def test_in_process_server_skips_state_file():
+    """An in-process server's calls are counted by the client only, with no locked state-file rewrite"""
+    print("\n" + "=" * 60)
+    print("TESTING IN-PROCESS SERVER METRICS")
+    print("=" * 60)
+
+    state_dir = Path(tempfile.mkdtemp()) / "metrics"
+    config = echo_config("echo_local", metrics_dir=state_dir, in_process=True)
+
+    async def scenario():
+        multi = MultiMCP([config])
+        await multi.initialize()
+        assert multi.apps
+        await multi.call_tool("echo", {"text": "hi"})
+        await multi.call_tool("echo", {"text": "again"})
+
+    def client_count():
+        return sum(n for key, n in tool_calls.values.items() if dict(key)["server"] == "echo_local")
+
+    before = client_count()
+    asyncio.run(scenario())
+    print(f"  Client-side calls: {client_count() - before}, state files: {list(state_dir.glob('*.json'))}")
+    assert client_count() - before == 2
+    assert not (state_dir / "mcp_server_echo.json").exists()
+
+
+
+def test_state_file_without_fcntl():
+    """Without fcntl (Windows) the metrics module still imports and records server calls"""
+    print("\n" + "=" * 60)
+    print("TESTING METRICS WITHOUT FCNTL")
+    print("=" * 60)
+
+    state_dir = Path(tempfile.mkdtemp())
+    script = textwrap.dedent(f'''
+        import sys
+        sys.modules["fcntl"] = None  # import fcntl now raises ImportError, as on Windows
+        sys.path.insert(0, {str(MODULES_DIR)!r})
+        import metrics
+        registry = metrics.Registry(state_dir={str(state_dir)!r})
+        registry.record_server_call("echo", "echo", "ok", 0.01)
+        registry.record_server_call("echo", "echo", "ok", 0.02)
+        print(metrics.fcntl)
+    ''')
+    completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+    print(f"  {completed.stdout.strip() or completed.stderr.strip()[-300:]}")
+    assert completed.returncode == 0 and completed.stdout.strip() == "None"
+    state = json.loads((state_dir / "mcp_server_echo.json").read_text(encoding="utf-8"))
+    assert state["calls"] == {"echo|ok": 2}
+
+
+if __name__ == "__main__":
+    print("\n🧪 METRICS TEST SUITE\n")
+    test_render_format()
+    test_histogram_and_dump()
+    test_http_endpoint()
+    test_mcp_server_instrumentation()
+    test_in_process_server_skips_state_file()
+    test_state_file_without_fcntl()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,102 @@
+# test_perception_cache.py
+
+"""
+Test suite for the per-session perception cache
+Run with: python test_perception_cache.py
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from modules import perception
+from modules.perception import perception_cache_key, run_perception
+
+SERVERS = {
+    "math": {"description": "Arithmetic tools"},
+    "documents": {"description": "Document search"},
+}
+
+
+class CountingModel:
+    """ModelManager stand-in answering perception prompts with a fixed reply"""
+
+    def __init__(self, reply: str):
+        self.reply = reply
+        self.calls = 0
+
+    async def generate_text(self, prompt: str, site: str = None) -> str:
+        self.calls += 1
+        return self.reply
+
+
+def make_context(servers: dict = SERVERS, cache: dict = None, enabled: bool = True):
+    return SimpleNamespace(
+        user_input="What is 2 + 2?",
+        mcp_server_descriptions=servers,
+        perception_cache={} if cache is None else cache,
+        agent_profile=SimpleNamespace(strategy=SimpleNamespace(cache_perception=enabled)),
+    )
+
+
+def test_cache_key():
+    """The key is the query plus the server set, independent of order and descriptions"""
+    print("=" * 60)
+    print("TESTING PERCEPTION CACHE KEY")
+    print("=" * 60)
+
+    key = perception_cache_key("What is 2 + 2?", SERVERS)
+    print(f"  {key}")
+    reordered = {"documents": {"description": "Other wording"}, "math": {}}
+    assert perception_cache_key("What is 2 + 2?", reordered) == key
+    assert perception_cache_key("What is 3 + 3?", SERVERS) != key
+    assert perception_cache_key("What is 2 + 2?", {"math": {}}) != key
+    assert perception_cache_key("What is 2 + 2?", None) == ("What is 2 + 2?", ())
+
+
+def test_cached_per_session():
+    """A repeated query costs one LLM call per session; a new server set asks again"""
+    print("\n" + "=" * 60)
+    print("TESTING PERCEPTION CACHE HITS")
+    print("=" * 60)
+
+    model = CountingModel(json.dumps({"intent": "arithmetic", "entities": ["2"], "selected_servers": ["math"]}))
+    session_cache = {}
+    with patch.object(perception, "model", model):
+        first = asyncio.run(run_perception(make_context(cache=session_cache)))
+        again = asyncio.run(run_perception(make_context(cache=session_cache)))
+        assert model.calls == 1 and again is first
+
+        asyncio.run(run_perception(make_context(servers={"math": {}}, cache=session_cache)))
+        assert model.calls == 2
+
+        asyncio.run(run_perception(make_context(enabled=False)))
+        asyncio.run(run_perception(make_context(enabled=False)))
+        assert model.calls == 4
+    print(f"  {model.calls} LLM calls, {len(session_cache)} cached perceptions")
+
+
+def test_unknown_intent_is_not_cached():
+    """The fallback perception after a failed LLM reply is retried, not pinned"""
+    print("\n" + "=" * 60)
+    print("TESTING UNKNOWN INTENT")
+    print("=" * 60)
+
+    model = CountingModel("not json at all")
+    context = make_context()
+    with patch.object(perception, "model", model):
+        result = asyncio.run(run_perception(context))
+        assert result.intent == "unknown"
+        assert result.selected_servers == list(SERVERS)
+        asyncio.run(run_perception(context))
+    print(f"  {model.calls} LLM calls, cache: {context.perception_cache}")
+    assert model.calls == 2 and context.perception_cache == {}
+
+
+if __name__ == "__main__":
+    print("\n🧪 PERCEPTION CACHE TEST SUITE\n")
+    test_cache_key()
+    test_cached_per_session()
+    test_unknown_intent_is_not_cached()
+    print("\n✅ ALL TESTS COMPLETED")
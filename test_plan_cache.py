@@ -0,0 +1,177 @@
+# test_plan_cache.py
+
+"""
+Test suite for the query-template plan cache
+Run with: python test_plan_cache.py
+"""
+
+import tempfile
+from pathlib import Path
+
+from modules.plan_cache import PlanCache
+
+ASCII_QUERY = "Find the ASCII values of characters in INDIA and then return sum of exponentials of those values."
+
+ASCII_PLAN = '''import json
+async def solve():
+    """Convert characters to ASCII values. Usage: input={"input": {"string": "INDIA"}} result = await mcp.call_tool('strings_to_chars_to_int', input)"""
+    input = {"input": {"string": "INDIA"}}
+    result = await mcp.call_tool('strings_to_chars_to_int', input)
+    numbers = json.loads(result.content[0].text)["result"]
+    input = {"input": {"numbers": numbers}}
+    result = await mcp.call_tool('int_list_to_exponential_sum', input)
+    final_result = json.loads(result.content[0].text)["result"]
+    return f"FINAL_ANSWER: {final_result}"
+'''
+
+
+def make_cache() -> PlanCache:
+    return PlanCache(path=str(Path(tempfile.mkdtemp()) / "plans.json"), enabled=True)
+
+
+def test_templates():
+    """Queries differing only in slot values share a template"""
+    print("=" * 60)
+    print("TESTING QUERY TEMPLATES")
+    print("=" * 60)
+
+    key1, slots1 = PlanCache.template(ASCII_QUERY)
+    key2, slots2 = PlanCache.template(ASCII_QUERY.replace("INDIA", "NEPAL"))
+    print(f"  Template: {key1}")
+    print(f"  Slots:    {slots1} / {slots2}\n")
+    assert key1 == key2
+    assert ("str", "INDIA") in slots1 and ("str", "NEPAL") in slots2
+
+
+def test_reinstantiation():
+    """A cached plan is rewritten for new slot values and survives a reload"""
+    print("\n" + "=" * 60)
+    print("TESTING PLAN RE-INSTANTIATION")
+    print("=" * 60)
+
+    cache = make_cache()
+    assert cache.store(ASCII_QUERY, ASCII_PLAN)
+
+    plan = PlanCache(path=str(cache.path), enabled=True).lookup(ASCII_QUERY.replace("INDIA", "NEPAL"))
+    print(plan)
+    assert plan is not None
+    assert '{"input": {"string": "NEPAL"}}' in plan and "INDIA" not in plan
+
+    # Slots the plan never consumed ("ASCII") must match exactly
+    assert cache.lookup(ASCII_QUERY.replace("ASCII", "UTF8")) is None
+
+
+def test_baked_answers_and_invalidation():
+    """Plans with the answer baked in only serve the exact query; failures evict"""
+    print("\n" + "=" * 60)
+    print("TESTING BAKED ANSWERS AND INVALIDATION")
+    print("=" * 60)
+
+    cache = make_cache()
+    baked = 'async def solve():\n    return "FINAL_ANSWER: France is in Europe"\n'
+    assert cache.store("Where is France", baked)
+    assert cache.lookup("Where is Japan") is None
+    assert cache.lookup("Where is France") == baked
+
+    cache.invalidate("Where is France")
+    assert cache.lookup("Where is France") is None
+    print(f"  Stats: {cache.get_stats()}")
+
+
+
+def test_hits_are_saved_lazily():
+    """Lookups keep hit counts in memory; they reach disk with the next store or flush()"""
+    print("\n" + "=" * 60)
+    print("TESTING DEFERRED HIT SAVES")
+    print("=" * 60)
+
+    cache = make_cache()
+    assert cache.store(ASCII_QUERY, ASCII_PLAN)
+    written = cache.path.stat().st_mtime_ns
+    for country in ["NEPAL", "CHINA", "SPAIN"]:
+        assert cache.lookup(ASCII_QUERY.replace("INDIA", country)) is not None
+    assert cache.path.stat().st_mtime_ns == written
+
+    cache.flush()
+    entry = next(iter(PlanCache(path=str(cache.path), enabled=True).entries.values()))
+    print(f"  On disk after flush: {entry['hits']} hits")
+    assert entry["hits"] == 3
+
+    # Relative paths from config live under the repo root, not the working directory
+    assert PlanCache(path="plan_cache/plans.json", enabled=False).path.is_absolute()
+
+
+def test_fresh_plan_failure_keeps_cached_plan():
+    """Only the plan the cache served is evicted when it fails; a freshly generated one is not"""
+    print("\n" + "=" * 60)
+    print("TESTING INVALIDATION OF SERVED PLANS ONLY")
+    print("=" * 60)
+
+    cache = make_cache()
+    assert cache.store(ASCII_QUERY, ASCII_PLAN)
+    fresh = ASCII_PLAN.replace("int_list_to_exponential_sum", "int_list_to_sum")
+    cache.invalidate(ASCII_QUERY, fresh)
+    served = cache.lookup(ASCII_QUERY)
+    assert served == ASCII_PLAN
+
+    cache.invalidate(ASCII_QUERY, served)
+    assert cache.lookup(ASCII_QUERY) is None
+    print(f"  Stats: {cache.get_stats()}")
+
+
+def test_speculation_keeps_further_processing_plans():
+    """A cached plan answering FURTHER_PROCESSING_REQUIRED is reused, not evicted (same policy as AgentLoop)"""
+    print("\n" + "=" * 60)
+    print("TESTING FURTHER_PROCESSING_REQUIRED PLANS IN SPECULATION")
+    print("=" * 60)
+
+    import asyncio
+    from core import strategy
+    from mcp.types import CallToolResult, TextContent
+    from modules.sandbox_pool import sandbox_pool
+
+    query = "Summarize the webpage about France"
+    plan = (
+        'async def solve():\n'
+        '    total = await mcp.call_tool("add", {"a": 1, "b": 2})\n'
+        '    return f"FURTHER_PROCESSING_REQUIRED: page text {total.content[0].text}"\n'
+    )
+    cache = make_cache()
+    assert cache.store(query, plan)
+
+    class Adder:
+        tool_map = {"add": {"config": {"id": "math"}}}
+
+        async def call_tool(self, tool_name, arguments):
+            return CallToolResult(content=[TextContent(type="text", text=str(arguments["a"] + arguments["b"]))])
+
+    shared, strategy.decision.plan_cache = strategy.decision.plan_cache, cache
+
+    async def speculate():
+        try:
+            return await strategy.run_speculative_plans(
+                k=3, user_input=query, perception=None, memory_items=[], tool_descriptions="",
+                step_num=1, max_steps=3, dispatcher=Adder(),
+            )
+        finally:
+            await sandbox_pool.close()
+
+    try:
+        chosen, result, tool_log = asyncio.run(speculate())
+    finally:
+        strategy.decision.plan_cache = shared
+    print(f"  {result}, {tool_log}")
+    assert chosen == plan and result == "FURTHER_PROCESSING_REQUIRED: page text 3"
+    assert [call["tool"] for call in tool_log] == ["add"]  # the winner's calls, for its memory item
+    assert cache.lookup(query) == plan
+
+
+if __name__ == "__main__":
+    print("\n🧪 PLAN CACHE TEST SUITE\n")
+    test_templates()
+    test_reinstantiation()
+    test_baked_answers_and_invalidation()
+    test_hits_are_saved_lazily()
+    test_fresh_plan_failure_keeps_cached_plan()
+    test_speculation_keeps_further_processing_plans()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,111 @@
+# test_prompt_builder.py
+
+"""
+Test suite for token-budgeted decision prompts
+Run with: python test_prompt_builder.py
+"""
+
+import os
+import tempfile
+
+from modules.prompt_builder import PromptBuilder
+
+TEMPLATE = "Tools:\n{tool_descriptions}\n\nInput:\n{user_input}\n"
+
+PAST_CONTEXT = "\n".join([
+    "📚 Relevant Past Conversations:\n",
+    "\n1. [2025-01-10 10:00:00]",
+    "   Query: What is the weather in Paris?",
+    "   Answer: Sunny, 21°C...",
+    "\n2. [2025-01-11 10:00:00]",
+    "   Query: How much did Anmol Singh pay for the DLF apartment?",
+    "   Answer: " + "Anmol Singh paid 42.94 crore via Capbridge. " * 5 + "...",
+    "\n---\n",
+])
+
+
+def write_template(text: str = TEMPLATE) -> str:
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def test_forwarded_payload_is_bounded():
+    """A huge FURTHER_PROCESSING_REQUIRED payload keeps its task head and instruction tail"""
+    print("=" * 60)
+    print("TESTING INPUT BUDGET")
+    print("=" * 60)
+
+    builder = PromptBuilder(max_tokens=2000, input_tokens=500, past_context_tokens=200)
+    user_input = (
+        "Original user task: Summarise the page\n\nYour last tool produced this result:\n\n"
+        + "lorem ipsum " * 20000
+        + "\n\nOtherwise, return the next FUNCTION_CALL."
+    )
+    prompt, report = builder.build(write_template(), user_input, "- fetch: fetch a page")
+    print(f"  Report: {report}")
+    assert report["input_truncated"] and report["input_tokens"] <= 500
+    assert report["tokens"] <= 2000
+    assert "Original user task: Summarise the page" in prompt
+    assert prompt.rstrip().endswith("return the next FUNCTION_CALL.")
+    assert "characters omitted" in prompt
+
+    short, report = builder.build(write_template(), "What is 2 + 2?", "- add")
+    assert not report["input_truncated"] and "What is 2 + 2?" in short
+
+
+def test_past_context_ranking():
+    """Past conversations are ranked by relevance, then summarised or dropped to fit"""
+    print("\n" + "=" * 60)
+    print("TESTING PAST CONTEXT")
+    print("=" * 60)
+
+    builder = PromptBuilder(max_tokens=4000, input_tokens=1000, past_context_tokens=1000)
+    query = "What did Anmol Singh pay for the apartment?"
+    prompt, report = builder.build(write_template(), query, "- search", past_context=PAST_CONTEXT)
+    assert prompt.index("Anmol Singh pay for the DLF") < prompt.index("weather in Paris")
+    assert report["context_dropped"] == 0
+
+    # Tight budget: the most relevant entry is kept, as its query line only
+    context, dropped = builder.fit_past_context(PAST_CONTEXT, query, 40)
+    print(f"  Fitted into 40 tokens:\n{context}")
+    assert "DLF apartment" in context and "Capbridge" not in context
+    assert "weather" not in context and dropped == 1
+    assert builder.fit_past_context(PAST_CONTEXT, query, 5) == ("", 2)
+
+
+def test_template_cache_and_stats():
+    """Templates are read once until they change; every call is counted"""
+    print("\n" + "=" * 60)
+    print("TESTING TEMPLATE CACHE")
+    print("=" * 60)
+
+    builder = PromptBuilder()
+    path = write_template()
+    builder.build(path, "first", "- a")
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Changed {tool_descriptions} {user_input}")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+    assert builder.build(path, "second", "- a")[0].startswith("Tools:")  # same mtime: cached
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    assert builder.build(path, "third", "- a")[0].startswith("Changed")
+
+    # The shipped decision prompts render through the builder
+    for name in ("decision_prompt_conservative.txt", "decision_prompt_exploratory_parallel.txt",
+                 "decision_prompt_exploratory_sequential.txt"):
+        prompt, report = builder.build(os.path.join("prompts", name), "What is 2 + 2?", "- add", PAST_CONTEXT)
+        assert "What is 2 + 2?" in prompt and report["tokens"] <= builder.max_tokens
+
+    stats = builder.get_stats()
+    print(f"  Stats: {stats}")
+    assert stats["calls"] == 6 and stats["mean_tokens"] > 0
+
+
+if __name__ == "__main__":
+    print("\n🧪 PROMPT BUILDER TEST SUITE\n")
+    test_forwarded_payload_is_bounded()
+    test_past_context_ranking()
+    test_template_cache_and_stats()
+    print("\n✅ ALL TESTS COMPLETED")
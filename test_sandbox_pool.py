@@ -0,0 +1,278 @@
+# test_sandbox_pool.py
+
+"""
+Test suite for the sandbox worker pool
+Run with: python test_sandbox_pool.py
+"""
+
+import asyncio
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+
+from mcp.types import CallToolResult, TextContent
+
+from modules import action, sandbox_pool
+from modules.sandbox_pool import SandboxPool
+
+
+class FakeDispatcher:
+    """Stands in for MultiMCP: answers tool calls in the agent process"""
+
+    def __init__(self):
+        self.tool_map = {"add": None, "slow": None}
+        self.calls = []
+
+    async def call_tool(self, tool_name, arguments):
+        self.calls.append((tool_name, arguments))
+        if tool_name == "slow":
+            await asyncio.sleep(0.2)
+        return CallToolResult(content=[TextContent(type="text", text=str(sum(arguments.values())))])
+
+
+TOOL_PLAN = '''
+import os
+async def solve():
+    print("plan output goes to stderr, not the protocol")
+    result = await mcp.call_tool("add", {"a": 2, "b": 3})
+    return {"result": f"{result.content[0].text} from {os.getpid()}"}
+'''
+
+PID_PLAN = '''
+import os
+def solve():
+    return os.getpid()
+'''
+
+
+def test_tool_calls_and_reuse():
+    """Tool calls are made through the dispatcher; warm workers are reused across plans"""
+    print("=" * 60)
+    print("TESTING TOOL CALLS AND WORKER REUSE")
+    print("=" * 60)
+
+    pool = SandboxPool(workers=1, timeout_seconds=10, cpu_seconds=5, memory_mb=1024)
+    dispatcher = FakeDispatcher()
+
+    async def scenario():
+        try:
+            first = await pool.run(TOOL_PLAN, dispatcher)
+            second = await pool.run(PID_PLAN, dispatcher)
+            unknown = await pool.run('async def solve():\n    return await mcp.call_tool("rm", {})', dispatcher)
+            return first, second, unknown
+        finally:
+            await pool.close()
+
+    first, second, unknown = asyncio.run(scenario())
+    print(f"  {first} | {second} | {unknown[:60]}")
+    assert first.startswith("5 from ")
+    assert first.split()[-1] == second  # same worker process
+    assert dispatcher.calls == [("add", {"a": 2, "b": 3})]
+    assert unknown.startswith("[sandbox error: Tool 'rm' not found")
+    assert pool.stats["spawned"] == 1
+
+
+def test_limits():
+    """Wall-clock, CPU and memory limits end the plan, not the agent"""
+    print("\n" + "=" * 60)
+    print("TESTING TIME, CPU AND MEMORY LIMITS")
+    print("=" * 60)
+
+    pool = SandboxPool(workers=1, timeout_seconds=4, cpu_seconds=30, memory_mb=512)
+    dispatcher = FakeDispatcher()
+
+    async def scenario():
+        try:
+            start = time.perf_counter()
+            hung = await pool.run("import time\ndef solve():\n    time.sleep(60)", dispatcher)
+            elapsed = time.perf_counter() - start
+            memory = await pool.run("def solve():\n    return len(bytearray(2 * 1024 ** 3))", dispatcher)
+            pool.cpu_seconds = 1
+            spin = await pool.run("def solve():\n    while True:\n        pass", dispatcher)
+            pool.cpu_seconds = 30
+            after = await pool.run("def solve():\n    return 'still serving'", dispatcher)
+            return hung, elapsed, memory, spin, after
+        finally:
+            await pool.close()
+
+    hung, elapsed, memory, spin, after = asyncio.run(scenario())
+    print(f"  {hung} ({elapsed:.2f}s)\n  {memory}\n  {spin}\n  {after}")
+    assert hung.startswith("[sandbox error: solve() exceeded") and elapsed < 6
+    assert memory == "[sandbox error: MemoryError]"
+    assert spin == "[sandbox error: solve() exceeded its CPU time limit]"
+    assert after == "still serving"
+    assert pool.stats["timeouts"] == 1 and pool.stats["spawned"] == 2  # the hung worker was replaced
+
+
+def test_cancellation():
+    """Cancelling a running plan kills its worker; the pool keeps serving"""
+    print("\n" + "=" * 60)
+    print("TESTING CANCELLATION")
+    print("=" * 60)
+
+    pool = SandboxPool(workers=1, timeout_seconds=10)
+    dispatcher = FakeDispatcher()
+
+    async def scenario():
+        try:
+            task = asyncio.create_task(pool.run(
+                'async def solve():\n    await mcp.call_tool("slow", {"a": 1})\n    while True:\n        pass',
+                dispatcher,
+            ))
+            await asyncio.sleep(1.0)
+            task.cancel()
+            try:
+                await task
+                raise AssertionError("cancelled plan completed")
+            except asyncio.CancelledError:
+                pass
+            return await pool.run(PID_PLAN, dispatcher)
+        finally:
+            await pool.close()
+
+    pid = asyncio.run(scenario())
+    print(f"  Next plan ran in replacement worker {pid}: {pool.get_stats()}")
+    assert pool.stats["cancelled"] == 1 and pool.stats["spawned"] == 2
+    assert dispatcher.calls == [("slow", {"a": 1})]
+
+
+
+def test_worker_start_failures():
+    """A pool that can't start workers raises instead of hanging, leaks none and recovers later"""
+    print("\n" + "=" * 60)
+    print("TESTING WORKER START FAILURES")
+    print("=" * 60)
+
+    broken = Path(tempfile.mkdtemp()) / "broken_worker.py"
+    broken.write_text("raise SystemExit(3)\n", encoding="utf-8")
+    good = sandbox_pool.WORKER_SCRIPT
+    pool = SandboxPool(workers=2, timeout_seconds=10)
+    pool.respawn_attempts, pool.respawn_backoff_seconds = 2, 0.05
+    dispatcher = FakeDispatcher()
+
+    async def scenario():
+        errors = []
+        try:
+            sandbox_pool.WORKER_SCRIPT = broken
+            for _ in range(2):  # the second run retries the start instead of waiting on a dead pool
+                try:
+                    await asyncio.wait_for(pool.run(PID_PLAN, dispatcher), 10)
+                except RuntimeError as e:
+                    errors.append(str(e))
+            leaked = len(pool._workers), pool._loop
+
+            sandbox_pool.WORKER_SCRIPT = good
+            first = await pool.run(PID_PLAN, dispatcher)
+            sandbox_pool.WORKER_SCRIPT = broken
+            for worker in list(pool._workers):
+                worker.kill()  # both workers die and can't be replaced
+            await asyncio.sleep(0.1)
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(pool.run(PID_PLAN, dispatcher), 10)
+            except RuntimeError as e:
+                errors.append(str(e))
+            return errors, leaked, first, time.perf_counter() - start
+        finally:
+            sandbox_pool.WORKER_SCRIPT = good
+            await pool.close()
+
+    errors, leaked, first, elapsed = asyncio.run(scenario())
+    for error in errors:
+        print(f"  {error}")
+    print(f"  Exhausted pool gave up after {elapsed:.2f}s: {pool.get_stats()}")
+    assert len(errors) == 3 and "failed to start" in errors[0] and "failed to start" in errors[1]
+    assert leaked == (0, None)
+    assert first.isdigit()  # the pool started once the worker script was fixed
+    assert "no sandbox workers left" in errors[2] and elapsed < 5
+
+
+
+def test_close_during_run():
+    """Closing the pool under a running plan ends that plan with an error, not an AttributeError"""
+    print("\n" + "=" * 60)
+    print("TESTING CLOSE DURING A RUNNING PLAN")
+    print("=" * 60)
+
+    pool = SandboxPool(workers=1, timeout_seconds=10)
+
+    async def scenario():
+        task = asyncio.create_task(pool.run("import time\ndef solve():\n    time.sleep(5)", FakeDispatcher()))
+        await asyncio.sleep(1.0)
+        pool.shutdown()
+        return await task
+
+    result = asyncio.run(scenario())
+    print(f"  {result}: {pool.get_stats()}")
+    assert result.startswith("[sandbox error: worker crashed")
+    assert pool.get_stats()["workers"] == 0  # the killed worker was not replaced into a closed pool
+
+
+def test_finite_cpu_hard_limit():
+    """Plans keep completing when the agent runs under a finite RLIMIT_CPU hard limit"""
+    print("\n" + "=" * 60)
+    print("TESTING A FINITE CPU HARD LIMIT")
+    print("=" * 60)
+
+    script = textwrap.dedent('''
+        import asyncio, resource, sys
+        sys.path.insert(0, sys.argv[1])
+        resource.setrlimit(resource.RLIMIT_CPU, (3600, 3600))
+        from modules.sandbox_pool import SandboxPool
+
+        async def main():
+            pool = SandboxPool(workers=1, timeout_seconds=10, cpu_seconds=5)
+            try:
+                return [await pool.run("def solve():\\n    return 'ok'", None) for _ in range(3)]
+            finally:
+                await pool.close()
+
+        print(asyncio.run(main()))
+    ''')
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", script, str(Path(__file__).parent.resolve())],
+                               capture_output=True, text=True, timeout=60)
+    elapsed = time.perf_counter() - start
+    print(f"  {completed.stdout.strip().splitlines()[-1]} in {elapsed:.2f}s")
+    assert completed.stdout.strip().splitlines()[-1] == "['ok', 'ok', 'ok']"
+    assert elapsed < 10  # each plan reports done instead of waiting out the wall-clock limit
+
+
+def test_unavailable_pool_does_not_run_inline():
+    """Without `fallback: inline`, a plan the pool can't take is an error, not an unlimited exec"""
+    print("\n" + "=" * 60)
+    print("TESTING POOL UNAVAILABLE FALLBACK")
+    print("=" * 60)
+
+    class DeadPool:
+        async def run(self, code, dispatcher, max_tool_calls=5):
+            raise RuntimeError("no sandbox workers left and none could be restarted")
+
+    plan = "import os\ndef solve():\n    return os.getpid()"
+    real_pool, fallback = action.sandbox_pool, action.SANDBOX_FALLBACK
+    action.sandbox_pool = DeadPool()
+    try:
+        action.SANDBOX_FALLBACK = "none"
+        refused = asyncio.run(action.run_python_sandbox(plan, FakeDispatcher()))
+        action.SANDBOX_FALLBACK = "inline"
+        inline = asyncio.run(action.run_python_sandbox(plan, FakeDispatcher()))
+    finally:
+        action.sandbox_pool, action.SANDBOX_FALLBACK = real_pool, fallback
+    print(f"  default: {refused}\n  opted in: {inline}")
+    assert refused.startswith("[sandbox error: sandbox pool unavailable")
+    assert inline == str(__import__("os").getpid())
+
+
+if __name__ == "__main__":
+    print("\n🧪 SANDBOX POOL TEST SUITE\n")
+    test_tool_calls_and_reuse()
+    test_limits()
+    test_cancellation()
+    test_worker_start_failures()
+    test_close_during_run()
+    test_finite_cpu_hard_limit()
+    test_unavailable_pool_does_not_run_inline()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,117 @@
+# test_speculation.py
+
+"""
+Test suite for speculative parallel planning
+Run with: python test_speculation.py
+"""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from core import strategy
+from modules.plan_cache import PlanCache
+
+
+def fake_candidates(outcomes: dict, cancelled: list):
+    """
+    generate_plan / run_python_sandbox stand-ins: the candidate with temperature t
+    sleeps outcomes[t][0] seconds in its "sandbox" and returns outcomes[t][1].
+    """
+
+    async def generate_plan(temperature, **kwargs):
+        assert kwargs["use_plan_cache"] is False
+        return f"async def solve():\n    return {temperature!r}\n"
+
+    async def run_python_sandbox(plan, dispatcher=None, tool_log=None):
+        temperature = float(plan.split("return ")[1])
+        delay, result = outcomes[temperature]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            cancelled.append(temperature)
+            raise
+        tool_log.append({"tool": f"t={temperature}"})
+        return result
+
+    return patch.multiple(
+        strategy, run_python_sandbox=run_python_sandbox,
+        decision=type("Decision", (), {
+            "generate_plan": staticmethod(generate_plan),
+            "plan_cache": PlanCache(path=str(Path(tempfile.mkdtemp()) / "plans.json"), enabled=False),
+        }),
+    )
+
+
+def speculate(k: int = 3):
+    return asyncio.run(strategy.run_speculative_plans(
+        k=k, user_input="What is 2 + 2?", perception=None, memory_items=[], tool_descriptions="",
+        step_num=1, max_steps=3, dispatcher=None,
+    ))
+
+
+def test_variants():
+    """Candidates spread temperature over 0.2–1.0 and cycle through the prompt variants"""
+    print("=" * 60)
+    print("TESTING SPECULATIVE VARIANTS")
+    print("=" * 60)
+
+    variants = strategy.speculative_variants(4)
+    print(f"  {variants}")
+    assert [t for _, t in variants] == [0.2, 0.47, 0.73, 1.0]
+    assert [p for p, _ in variants] == strategy.SPECULATIVE_PROMPTS + strategy.SPECULATIVE_PROMPTS[:1]
+    assert strategy.speculative_variants(1) == [(strategy.SPECULATIVE_PROMPTS[0], 0.2)]
+
+
+def test_first_answer_wins():
+    """The first candidate to answer is returned and the slower ones are cancelled"""
+    print("\n" + "=" * 60)
+    print("TESTING SPECULATIVE RACE")
+    print("=" * 60)
+
+    cancelled = []
+    outcomes = {
+        0.2: (5.0, "FINAL_ANSWER: slow"),
+        0.6: (0.05, "FINAL_ANSWER: 4"),
+        1.0: (5.0, "FINAL_ANSWER: slower"),
+    }
+    with fake_candidates(outcomes, cancelled):
+        plan, result, tool_log = speculate()
+    print(f"  Winner: {result}, cancelled: {sorted(cancelled)}")
+    assert result == "FINAL_ANSWER: 4" and "0.6" in plan
+    assert tool_log == [{"tool": "t=0.6"}]  # the winner's calls only
+    assert sorted(cancelled) == [0.2, 1.0]
+
+
+def test_fallbacks_without_an_answer():
+    """Without an answer FURTHER_PROCESSING_REQUIRED beats a sandbox error"""
+    print("\n" + "=" * 60)
+    print("TESTING SPECULATIVE FALLBACKS")
+    print("=" * 60)
+
+    cancelled = []
+    outcomes = {
+        0.2: (0.01, "[sandbox error: boom]"),
+        0.6: (0.05, "FURTHER_PROCESSING_REQUIRED: page text"),
+        1.0: (0.02, "[sandbox error: bang]"),
+    }
+    with fake_candidates(outcomes, cancelled):
+        _, result, _ = speculate()
+    print(f"  Chosen: {result}")
+    assert result == "FURTHER_PROCESSING_REQUIRED: page text"
+    assert cancelled == []
+
+    outcomes = {0.2: (0.02, "[sandbox error: boom]"), 1.0: (0.01, "[sandbox error: bang]")}
+    with fake_candidates(outcomes, cancelled):
+        _, result, _ = speculate(k=2)
+    print(f"  Chosen: {result}")
+    assert result == "[sandbox error: bang]"  # the first failure to come back
+
+
+if __name__ == "__main__":
+    print("\n🧪 SPECULATIVE PLANNING TEST SUITE\n")
+    test_variants()
+    test_first_answer_wins()
+    test_fallbacks_without_an_answer()
+    print("\n✅ ALL TESTS COMPLETED")
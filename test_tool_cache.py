@@ -0,0 +1,121 @@
+# test_tool_cache.py
+
+"""
+Test suite for tool result memoisation
+Run with: python test_tool_cache.py
+"""
+
+import asyncio
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from mcp.types import CallToolResult, TextContent
+
+from core.session import MultiMCP
+from modules.tool_cache import ToolResultCache, tool_cache
+
+COUNTER_SERVER = textwrap.dedent('''
+    from mcp.server.fastmcp import FastMCP
+    mcp = FastMCP("Counter")
+
+    @mcp.tool()
+    def square(x: int) -> int:
+        """Square a number"""
+        return x * x
+
+    @mcp.tool()
+    def fails(x: int) -> int:
+        """Always raises"""
+        raise ValueError("nope")
+
+    if __name__ == "__main__":
+        mcp.run(transport="stdio")
+''')
+
+
+def result(text, error=False):
+    return CallToolResult(content=[TextContent(type="text", text=text)], isError=error)
+
+
+def test_policy_ttl_and_lru():
+    """Declared tools and annotations decide cacheability; TTLs expire; the LRU stays bounded"""
+    print("=" * 60)
+    print("TESTING POLICY, TTL AND LRU")
+    print("=" * 60)
+
+    cache = ToolResultCache(max_entries=2, enabled=True, tools={"add": "pure", "search": 0.2, "shell": False})
+    read_only = SimpleNamespace(annotations=SimpleNamespace(readOnlyHint=True))
+    idempotent = SimpleNamespace(annotations=SimpleNamespace(idempotentHint=True, openWorldHint=False))
+    assert cache.policy("add") == (True, None)
+    assert cache.policy("search") == (True, 0.2)
+    assert cache.policy("shell", idempotent) == (False, None)  # profiles.yaml wins over annotations
+    assert cache.policy("fetch", read_only) == (True, float(cache.annotated_ttl))
+    assert cache.policy("lookup", idempotent) == (True, None)
+    assert cache.policy("unknown") == (False, None)
+
+    cache.store("add", {"a": 1, "b": 2}, result("3"))
+    cache.store("add", {"a": 9}, result("boom", error=True))  # errors are not memoised
+    cached = cache.lookup("add", {"b": 2, "a": 1})
+    assert cached.content[0].text == "3"
+    cached.content[0].text = "mutated"
+    assert cache.lookup("add", {"a": 1, "b": 2}).content[0].text == "3"  # callers get copies
+    assert cache.lookup("add", {"a": 9}) is None
+
+    cache.store("search", {"q": "x"}, result("hits"))
+    assert cache.lookup("search", {"q": "x"}) is not None
+    time.sleep(0.25)
+    assert cache.lookup("search", {"q": "x"}) is None
+
+    cache.store("add", {"a": 2}, result("2"))
+    cache.store("add", {"a": 3}, result("3"))
+    cache.store("add", {"a": 4}, result("4"))
+    stats = cache.get_stats()
+    print(f"  {stats}")
+    assert stats["entries"] == 2 and stats["expired"] == 1 and stats["evicted"] >= 1
+    assert cache.lookup("add", {"a": 2}) is None and cache.lookup("add", {"a": 4}) is not None
+
+
+def test_multimcp_memoisation():
+    """A repeated call to a pure tool is answered without spawning its server"""
+    print("\n" + "=" * 60)
+    print("TESTING MULTIMCP MEMOISATION")
+    print("=" * 60)
+
+    work = Path(tempfile.mkdtemp())
+    script = work / "counter_server.py"
+    script.write_text(COUNTER_SERVER, encoding="utf-8")
+    declared = dict(tool_cache.tools)
+    tool_cache.tools.update({"square": "pure", "fails": "pure"})
+
+    async def scenario():
+        multi = MultiMCP([{"id": "counter", "script": str(script), "cwd": str(work)}])
+        await multi.initialize()
+        first = await multi.call_tool("square", {"x": 7})
+        failed = await multi.call_tool("fails", {"x": 1})
+        script.unlink()  # from here on, nothing can be spawned
+        start = time.perf_counter()
+        second = await multi.call_tool("square", {"x": 7})
+        elapsed = time.perf_counter() - start
+        return first, failed, second, elapsed
+
+    try:
+        first, failed, second, elapsed = asyncio.run(scenario())
+        failed_cached = tool_cache.lookup("fails", {"x": 1})
+    finally:
+        tool_cache.tools.clear()
+        tool_cache.tools.update(declared)
+        tool_cache.clear()
+    print(f"  square(7) = {second.content[0].text}, cached call took {elapsed * 1000:.2f} ms")
+    assert first.content[0].text == second.content[0].text == "49"
+    assert failed.isError and failed_cached is None  # the failed call was not memoised
+    assert elapsed < 0.05
+
+
+if __name__ == "__main__":
+    print("\n🧪 TOOL CACHE TEST SUITE\n")
+    test_policy_ttl_and_lru()
+    test_multimcp_memoisation()
+    print("\n✅ ALL TESTS COMPLETED")
@@ -0,0 +1,94 @@
+# test_tracing.py
+
+"""
+Test suite for latency tracing
+Run with: python test_tracing.py
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from core.session import MultiMCP
+from mcp_test_servers import echo_config
+from modules.tracing import NULL_SPAN, Tracer, tracer
+
+
+def test_span_tree():
+    """Spans nest across tasks and worker threads; nothing is recorded outside a trace"""
+    print("=" * 60)
+    print("TESTING SPAN TREE")
+    print("=" * 60)
+
+    local = Tracer(enabled=True, export=None)
+
+    def blocking():
+        with local.span("embed"):
+            time.sleep(0.05)
+
+    async def step(n):
+        with local.span("plan", n=n):
+            await asyncio.sleep(0.05)
+            await asyncio.to_thread(blocking)
+
+    async def scenario():
+        with local.span("outside") as outside:
+            assert outside is NULL_SPAN
+        with local.trace("query") as root:
+            await asyncio.gather(step(1), step(2))
+        return root
+
+    root = asyncio.run(scenario())
+    spans = local.spans(root.trace_id)
+    by_name = {}
+    for span in spans:
+        by_name.setdefault(span.name, []).append(span)
+    assert [s.name for s in spans if s.root] == ["query"]
+    plans = {s.span_id for s in by_name["plan"]}
+    assert all(s.parent_id == root.span_id for s in by_name["plan"])
+    assert {s.parent_id for s in by_name["embed"]} == plans  # to_thread keeps the parent
+
+    summary = local.summary(root.trace_id)
+    print(f"  {local.format_summary(root.trace_id)}")
+    assert summary["spans"]["plan"]["count"] == 2 and summary["spans"]["embed"]["count"] == 2
+    assert 0.09 < summary["duration_s"] < 0.2  # the two steps overlapped
+
+    chrome = local.to_chrome(root.trace_id)
+    lanes = {e["tid"] for e in chrome["traceEvents"] if e["name"] == "plan"}
+    assert len(lanes) == 2 and all(e["ph"] == "X" for e in chrome["traceEvents"])
+
+    path = local.export_trace(root.trace_id, path=Path(tempfile.mkdtemp()) / "trace.json", fmt="json")
+    assert len(json.loads(path.read_text())["spans"]) == len(spans)
+
+
+def test_mcp_call_phases():
+    """A tool call is split into spawn, initialize and call"""
+    print("\n" + "=" * 60)
+    print("TESTING MCP CALL PHASES")
+    print("=" * 60)
+
+    config = echo_config()
+
+    async def scenario():
+        mcp = MultiMCP(server_configs=[config])
+        await mcp.initialize()
+        with tracer.trace("query") as root:
+            result = await mcp.call_tool("echo", {"text": "hi"})
+        return root, result
+
+    root, result = asyncio.run(scenario())
+    assert result.content[0].text == "hi"
+    summary = tracer.summary(root.trace_id)
+    print(f"  {tracer.format_summary(root.trace_id)}")
+    assert {"mcp.call_tool", "mcp.spawn", "mcp.initialize", "mcp.call"} <= set(summary["spans"])
+    phases = sum(summary["spans"][name]["total_s"] for name in ("mcp.spawn", "mcp.initialize", "mcp.call"))
+    assert phases <= summary["spans"]["mcp.call_tool"]["total_s"]
+
+
+if __name__ == "__main__":
+    print("\n🧪 TRACING TEST SUITE\n")
+    test_span_tree()
+    test_mcp_call_phases()
+    print("\n✅ ALL TESTS COMPLETED")